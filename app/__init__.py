@@ -1,4 +1,11 @@
-from flask import Flask , render_template
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from flask import Flask , render_template, request, g
+
+from app.utils import metrics
 
 def create_app():
     app = Flask(__name__)
@@ -8,6 +15,58 @@ def create_app():
     def home():
         return render_template('index.html')
 
+    @app.route('/health')
+    def health_check():
+        """Liveness probe: no imports, subprocesses or model loading"""
+        return {
+            'status': 'healthy',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'version': '1.0.0',
+            'firebase': 'enabled' if 'firebase_admin' in sys.modules else 'not loaded',
+            'model': 'available' if os.path.exists(app.config['MODEL_PATH']) else 'not found',
+            'python_version': sys.version
+        }, 200
+
+    @app.route('/ready')
+    def readiness_check():
+        """Readiness probe: 503 until this worker has loaded the default scoring model"""
+        from app.utils.model_registry import model_ready
+
+        if not app.config.get('MODEL_WARMUP', True):
+            # Models load on the first check instead
+            return {'status': 'ready', 'model': 'lazy'}, 200
+        if model_ready(app.config):
+            return {'status': 'ready', 'model': 'loaded', 'pid': os.getpid()}, 200
+        return {'status': 'loading', 'model': 'not loaded', 'pid': os.getpid()}, 503
+
+    metrics.configure(app.config.get('METRICS_ENABLED', False))
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Prometheus text exposition for this worker process"""
+        if not metrics.is_enabled():
+            return {'error': 'Metrics are disabled'}, 404
+        return metrics.render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    if metrics.is_enabled():
+        # Request hooks are only installed when metrics are on
+        @app.before_request
+        def start_request_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def record_request_time(response):
+            started = g.get('request_started')
+            if started is not None:
+                metrics.HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    # Route template, not the raw path, to keep label cardinality bounded
+                    endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                    method=request.method,
+                    status=response.status_code
+                )
+            return response
+
     from app.routes.upload import upload_routes
     from app.routes.monitoring import monitoring_routes
     from app.routes.auth import auth_bp
@@ -9,24 +9,150 @@ class Config:
     # Model path with fallback
     MODEL_PATH = os.environ.get('MODEL_PATH') or os.path.join(BASE_DIR, 'app', 'model', 'siamese_model.h5')
     
+    # Versioned Siamese models selectable by key (MODEL_VERSION picks the default)
+    MODEL_VERSIONS = {
+        'v1': os.path.join(BASE_DIR, 'app', 'model', 'v1', 'siamese_model.h5'),
+        'v2': os.path.join(BASE_DIR, 'app', 'model', 'v2', 'best_model.h5'),
+        'v3': os.path.join(BASE_DIR, 'app', 'model', 'v3', 'best_model.h5'),
+    }
+    MODEL_VERSION = os.environ.get('MODEL_VERSION') or None
+    
+    # Load models when a gunicorn worker boots instead of on the first request
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', 'true').lower() == 'true'
+    MODEL_WARMUP_VERSIONS = [v for v in os.environ.get('MODEL_WARMUP_VERSIONS', '').split(',') if v]
+    # Also load CodeBERT during warm-up (in the gunicorn master when preloading)
+    EMBEDDING_WARMUP = os.environ.get('EMBEDDING_WARMUP', 'false').lower() == 'true'
+    
+    # Number of file pairs sent to the Siamese model per batch
+    SCORING_BATCH_SIZE = int(os.environ.get('SCORING_BATCH_SIZE', 4096))
+    
+    # Pair scoring engine: 'numpy' (weights read from the .h5, no TensorFlow) or 'keras'
+    SCORING_ENGINE = os.environ.get('SCORING_ENGINE', 'numpy')
+    SCORING_THREADS = int(os.environ.get('SCORING_THREADS', 0))  # 0 = all cores
+    SCORING_MAX_BLOCK_BYTES = int(os.environ.get('SCORING_MAX_BLOCK_BYTES', 64 * 1024 * 1024))
+    
+    # Candidate pruning: 'exhaustive', 'ann', 'fingerprint' (only pairs sharing token
+    # fingerprints), or 'auto' (ANN from ANN_MIN_FILES files)
+    SCORING_CANDIDATES = os.environ.get('SCORING_CANDIDATES', 'auto')
+    ANN_MIN_FILES = int(os.environ.get('ANN_MIN_FILES', 500))
+    ANN_TOP_K = int(os.environ.get('ANN_TOP_K', 20))
+    ANN_NPROBE = int(os.environ.get('ANN_NPROBE', 8))
+    
+    # Winnowing token fingerprints (k-gram size, window, max share of files per fingerprint)
+    FINGERPRINT_ENABLED = os.environ.get('FINGERPRINT_ENABLED', 'true').lower() == 'true'
+    FINGERPRINT_K = int(os.environ.get('FINGERPRINT_K', 12))
+    FINGERPRINT_WINDOW = int(os.environ.get('FINGERPRINT_WINDOW', 8))
+    FINGERPRINT_MAX_DF = float(os.environ.get('FINGERPRINT_MAX_DF', 0.5))
+    
+    # AST structural similarity (subtree hashes cached by content hash, shared by all users)
+    STRUCTURE_ENABLED = os.environ.get('STRUCTURE_ENABLED', 'true').lower() == 'true'
+    STRUCTURE_MIN_NODES = int(os.environ.get('STRUCTURE_MIN_NODES', 4))
+    STRUCTURE_MAX_DF = float(os.environ.get('STRUCTURE_MAX_DF', 0.5))
+    
     # Firebase key path with fallback
     ACCOUNT_KEY_FIREBASE = os.environ.get('FIREBASE_KEY_PATH') or os.path.join(BASE_DIR, 'crud-833c1-firebase-adminsdk-e01ya-b83fe59025.json')
     
     # File upload settings
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 10 * 1024 * 1024))  # 10MB default
     
+    # ZIP ingestion limits (zip bomb protection) for the uncompressed .py members
+    ZIP_MAX_MEMBERS = int(os.environ.get('ZIP_MAX_MEMBERS', 5000))
+    ZIP_MAX_TOTAL_BYTES = int(os.environ.get('ZIP_MAX_TOTAL_BYTES', 100 * 1024 * 1024))
+    ZIP_MAX_RATIO = int(os.environ.get('ZIP_MAX_RATIO', 100))
+    
+    # Uploads whose content matches an existing file: 'skip' or 'keep'
+    UPLOAD_ON_DUPLICATE = os.environ.get('UPLOAD_ON_DUPLICATE', 'skip')
+    
+    # Embed new uploads in a background job so the next check hits the cache
+    EMBED_ON_UPLOAD = os.environ.get('EMBED_ON_UPLOAD', 'false').lower() == 'true'
+    
+    # Verified Firebase tokens cached per process (bounded LRU, never past token exp)
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1024))
+    AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))
+    
     # Upload folder - parent folder for all user uploads
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'uploads')
     
     # Embeddings folder - parent folder for all user embeddings
     EMBEDDINGS_FOLDER = os.environ.get('EMBEDDINGS_FOLDER') or os.path.join(BASE_DIR, 'embeddings')
     
+    # Results folder - persisted similarity result sets per user
+    RESULTS_FOLDER = os.environ.get('RESULTS_FOLDER') or os.path.join(BASE_DIR, 'results')
+    
+    # Content-addressed embedding cache shared by all users
+    EMBEDDING_CACHE_FOLDER = os.environ.get('EMBEDDING_CACHE_FOLDER') or os.path.join(EMBEDDINGS_FOLDER, 'cache')
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get('EMBEDDING_CACHE_MAX_ENTRIES', 50000))
+    STRUCTURE_CACHE_FOLDER = os.environ.get('STRUCTURE_CACHE_FOLDER') or os.path.join(EMBEDDINGS_FOLDER, 'structure')
+    STRUCTURE_CACHE_MAX_ENTRIES = int(os.environ.get('STRUCTURE_CACHE_MAX_ENTRIES', 50000))
+    
+    # Batched CodeBERT inference (token budget per padded batch, 0 threads = torch default)
+    EMBEDDING_BATCH_MODE = os.environ.get('EMBEDDING_BATCH_MODE', 'true').lower() == 'true'
+    EMBEDDING_MAX_BATCH_TOKENS = int(os.environ.get('EMBEDDING_MAX_BATCH_TOKENS', 8192))
+    TORCH_NUM_THREADS = int(os.environ.get('TORCH_NUM_THREADS', 0))
+    
+    # Sliding-window embedding for files longer than CodeBERT's 512-token limit
+    EMBEDDING_CHUNKING = os.environ.get('EMBEDDING_CHUNKING', 'false').lower() == 'true'
+    EMBEDDING_CHUNK_TOKENS = int(os.environ.get('EMBEDDING_CHUNK_TOKENS', 510))
+    EMBEDDING_CHUNK_OVERLAP = int(os.environ.get('EMBEDDING_CHUNK_OVERLAP', 128))
+    
+    # Embedding store dtype: float32, or float16 to halve disk and memory
+    EMBEDDING_STORE_DTYPE = os.environ.get('EMBEDDING_STORE_DTYPE', 'float32')
+    
+    # Background check jobs: 'memory' (per process) or 'redis' (shared between workers;
+    # needs the optional `redis` package, see requirements.txt). Finished jobs are
+    # dropped after JOB_TTL_SECONDS; the memory backend also keeps at most JOB_MAX_KEPT
+    JOB_BACKEND = os.environ.get('JOB_BACKEND', 'memory')
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 3600))
+    JOB_MAX_KEPT = int(os.environ.get('JOB_MAX_KEPT', 1000))
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Shared storage for uploads, embeddings and results: 'local' or 's3' (S3-compatible,
+    # e.g. MinIO); with 's3' the folders above are each host's read-through cache.
+    # 's3' needs the optional `boto3` package, see requirements.txt
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    STORAGE_S3_BUCKET = os.environ.get('STORAGE_S3_BUCKET', '')
+    STORAGE_S3_PREFIX = os.environ.get('STORAGE_S3_PREFIX', '')
+    STORAGE_S3_ENDPOINT_URL = os.environ.get('STORAGE_S3_ENDPOINT_URL') or None
+    STORAGE_S3_REGION = os.environ.get('STORAGE_S3_REGION') or None
+    
+    # Prometheus-style /metrics endpoint and per-stage timings (off = no instrumentation cost)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+    
+    # Export: CSV rows written per streamed chunk, PDF rows per detail table,
+    # and the default cap on detailed PDF rows (0 = all; the summary always covers every pair)
+    EXPORT_CSV_CHUNK_ROWS = int(os.environ.get('EXPORT_CSV_CHUNK_ROWS', '1000'))
+    EXPORT_PDF_CHUNK_ROWS = int(os.environ.get('EXPORT_PDF_CHUNK_ROWS', '200'))
+    EXPORT_PDF_MAX_ROWS = int(os.environ.get('EXPORT_PDF_MAX_ROWS', '2000'))
+    
+    # Rendered per-pair detailed reports (content-addressed disk cache) and the
+    # batch ZIP export: worker pool size, default threshold (%) and pair limit
+    REPORT_CACHE_FOLDER = os.environ.get('REPORT_CACHE_FOLDER') or os.path.join(RESULTS_FOLDER, 'reports')
+    REPORT_CACHE_MAX_ENTRIES = int(os.environ.get('REPORT_CACHE_MAX_ENTRIES', 5000))
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 4))
+    REPORT_BATCH_THRESHOLD = float(os.environ.get('REPORT_BATCH_THRESHOLD', 75))
+    REPORT_BATCH_MAX_PAIRS = int(os.environ.get('REPORT_BATCH_MAX_PAIRS', 500))
+    
+    # Results query API (/monitoring/results): default and maximum rows per page
+    RESULTS_PAGE_SIZE = int(os.environ.get('RESULTS_PAGE_SIZE', 50))
+    RESULTS_MAX_PAGE_SIZE = int(os.environ.get('RESULTS_MAX_PAGE_SIZE', 500))
+    
+    # Reference corpus (archived cohorts): corpus neighbours scored per new file
+    # and the number of IVF lists probed per query
+    CORPUS_TOP_K = int(os.environ.get('CORPUS_TOP_K', 20))
+    CORPUS_NPROBE = int(os.environ.get('CORPUS_NPROBE', 8))
+    
+    # Duplicate clustering: files linked by pairs at or above this similarity (%)
+    # form one cluster; files with identical content are always clustered
+    CLUSTER_THRESHOLD = float(os.environ.get('CLUSTER_THRESHOLD', 75))
+    
     # Firebase disable flag for testing
     DISABLE_FIREBASE = os.environ.get('DISABLE_FIREBASE', 'false').lower() == 'true'
     
     # Ensure directories exist
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(EMBEDDINGS_FOLDER, exist_ok=True)
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
     
     @staticmethod
     def get_user_folder(user_id):
@@ -39,7 +165,37 @@ class Config:
     
     @staticmethod
     def get_user_embeddings_path(user_id):
-        """Get user-specific embeddings JSON file path"""
+        """Get user-specific embeddings store base path (.npy matrix + .index.json)"""
+        if not user_id:
+            return None
+        return os.path.join(Config.EMBEDDINGS_FOLDER, f"embeddings_{user_id}")
+    
+    @staticmethod
+    def get_user_results_path(user_id):
+        """Get user-specific result set base path (.pairs.npy + .index.json)"""
+        if not user_id:
+            return None
+        return os.path.join(Config.RESULTS_FOLDER, f"results_{user_id}")
+    
+    @staticmethod
+    def get_user_fingerprints_path(user_id):
+        """Get user-specific winnowing fingerprint file path"""
+        if not user_id:
+            return None
+        return os.path.join(Config.EMBEDDINGS_FOLDER, f"fingerprints_{user_id}.npz")
+    
+    @staticmethod
+    def get_user_corpus_path(user_id):
+        """Get user-specific reference corpus embedding store base path"""
+        if not user_id:
+            return None
+        return os.path.join(Config.EMBEDDINGS_FOLDER, f"corpus_{user_id}")
+    
+    @staticmethod
+    def get_user_corpus_folder(user_id):
+        """Get user-specific folder holding the archived sources of the reference corpus"""
         if not user_id:
             return None
-        return os.path.join(Config.EMBEDDINGS_FOLDER, f"embeddings_{user_id}.json")
\ No newline at end of file
+        corpus_folder = os.path.join(Config.UPLOAD_FOLDER, f"corpus_{user_id}")
+        os.makedirs(corpus_folder, exist_ok=True)
+        return corpus_folder
\ No newline at end of file
@@ -1,185 +1,234 @@
-from flask import Blueprint, jsonify, request, make_response, send_file
+from flask import Blueprint, jsonify, request, Response, send_file, stream_with_context, current_app
 import csv
 import io
-import json
-from datetime import datetime
 import os
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+import tempfile
+import zipfile
+from datetime import datetime
+from app.config import Config
+from app.utils.auth_utils import current_user_id
+from app.utils.result_store import load_result_set
+from app.utils.storage import pull_store
+from app.utils.reports import ExportRows, iter_csv, iter_clusters_csv, build_results_pdf
+from app.utils.clusters import find_clusters
+from app.utils.detailed_report import REPORT_FORMATS, get_report_cache, render_user_pair, render_user_pairs
 
 export_bp = Blueprint('export', __name__)
 
-@export_bp.route('/csv', methods=['POST'])
+def get_export_rows():
+    """
+    Rows to export, sorted by similarity (descending).
+
+    Older clients POST the full result list as JSON; otherwise the export is
+    generated from the caller's stored result set so nothing has to round-trip
+    through the browser. Returns (rows, result_set, error_response); result_set
+    is None for a posted list.
+    """
+    data = request.get_json(silent=True) or {}
+    if 'results' in data:
+        results = data.get('results') or []
+        if not results:
+            return None, None, (jsonify({'error': 'No data to export'}), 400)
+        return ExportRows.from_list(results), None, None
+
+    _, result_set, error = get_user_result_set()
+    if error:
+        return None, None, error
+    return ExportRows.from_result_set(result_set), result_set, None
+
+def get_user_result_set():
+    """(user_id, stored result set, error_response) for the authenticated caller."""
+    user_id = current_user_id()
+    if not user_id:
+        return None, None, (jsonify({'error': 'Authentication required'}), 401)
+    results_path = Config.get_user_results_path(user_id)
+    pull_store('results', results_path + '.index.json')
+    result_set = load_result_set(results_path)
+    if result_set is None or len(result_set) == 0:
+        return user_id, None, (jsonify({'error': 'No results to export, run a plagiarism check first'}), 404)
+    return user_id, result_set, None
+
+def get_export_filter(default_top_n=None):
+    """top_n / threshold (similarity %) from the query string or JSON body."""
+    data = request.get_json(silent=True) or {}
+    top_n = request.args.get('top_n', data.get('top_n', default_top_n))
+    threshold = request.args.get('threshold', data.get('threshold'))
+    top_n = int(top_n) if top_n not in (None, '') else None
+    threshold = float(threshold) if threshold not in (None, '') else None
+    return top_n, threshold
+
+def export_filename(extension):
+    return f'plagiarism_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+@export_bp.route('/csv', methods=['GET', 'POST'])
 def export_csv():
     try:
-        # Get results data from request
-        data = request.get_json()
-        results = data.get('results', [])
-        
-        if not results:
-            return jsonify({'error': 'No data to export'}), 400
-        
-        # Create CSV content
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['File 1', 'File 2', 'Similarity (%)', 'Risk Level', 'Export Date'])
-        
-        # Write data rows
+        rows, _, error = get_export_rows()
+        if error:
+            return error
+        try:
+            top_n, threshold = get_export_filter()
+        except ValueError:
+            return jsonify({'error': 'top_n and threshold must be numbers'}), 400
+
+        stop = rows.select(top_n, threshold)
         export_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        for result in results:
-            similarity = float(result.get('similarity', 0))
-            risk_level = get_risk_level(similarity)
-            writer.writerow([
-                result.get('file_1', ''),
-                result.get('file_2', ''),
-                f"{similarity:.2f}",
-                risk_level,
-                export_date
-            ])
-        
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'text/csv'
-        response.headers['Content-Disposition'] = f'attachment; filename=plagiarism_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-        
+        chunk_rows = current_app.config.get('EXPORT_CSV_CHUNK_ROWS', 1000)
+
+        # Rows are written chunk by chunk while the response is being sent
+        response = Response(
+            stream_with_context(iter_csv(rows, stop, export_date, chunk_rows)), mimetype='text/csv'
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename={export_filename("csv")}'
         return response
-        
+
     except Exception as e:
+        current_app.logger.error(f"Error in export_csv: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@export_bp.route('/pdf', methods=['POST'])
+@export_bp.route('/pdf', methods=['GET', 'POST'])
 def export_pdf():
     try:
-        # Get results data from request
-        data = request.get_json()
-        results = data.get('results', [])
-        
-        if not results:
-            return jsonify({'error': 'No data to export'}), 400
-        
-        # Create PDF content
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=30,
-            alignment=1  # Center alignment
+        rows, result_set, error = get_export_rows()
+        if error:
+            return error
+        try:
+            top_n, threshold = get_export_filter(current_app.config.get('EXPORT_PDF_MAX_ROWS') or None)
+        except ValueError:
+            return jsonify({'error': 'top_n and threshold must be numbers'}), 400
+
+        stop = rows.select(top_n, threshold)
+        filters = []
+        if threshold is not None:
+            filters.append(f"similarity ≥ {threshold:g}%")
+        if top_n:
+            filters.append(f"top {top_n}")
+
+        # Duplicate clusters need the stored pair graph, so posted lists go without them
+        cluster_threshold = current_app.config.get('CLUSTER_THRESHOLD', 75)
+        clusters = find_clusters(result_set, cluster_threshold) if result_set is not None else None
+
+        # Large reports spill to disk instead of being held in memory
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        build_results_pdf(
+            output, rows, stop, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            filter_text=', '.join(filters),
+            chunk_rows=current_app.config.get('EXPORT_PDF_CHUNK_ROWS', 200),
+            clusters=clusters,
+            cluster_threshold=cluster_threshold
+        )
+        output.seek(0)
+        return send_file(
+            output, mimetype='application/pdf', as_attachment=True, download_name=export_filename('pdf')
         )
-        
-        # Title
-        title = Paragraph("CodeScan Plagiarism Detection Report", title_style)
-        story.append(title)
-        story.append(Spacer(1, 20))
-        
-        # Report info
-        info_style = styles['Normal']
+
+    except Exception as e:
+        current_app.logger.error(f"Error in export_pdf: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@export_bp.route('/clusters', methods=['GET', 'POST'])
+def export_clusters():
+    """CSV of duplicate clusters (one row per member file) at ?threshold (default CLUSTER_THRESHOLD)."""
+    try:
+        _, result_set, error = get_user_result_set()
+        if error:
+            return error
+        try:
+            _, threshold = get_export_filter()
+        except ValueError:
+            return jsonify({'error': 'top_n and threshold must be numbers'}), 400
+        if threshold is None:
+            threshold = current_app.config.get('CLUSTER_THRESHOLD', 75)
+
+        clusters = find_clusters(result_set, threshold)
         export_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        info = Paragraph(f"Generated on: {export_date}<br/>Total Comparisons: {len(results)}", info_style)
-        story.append(info)
-        story.append(Spacer(1, 20))
-        
-        # Summary statistics
-        high_risk = len([r for r in results if float(r.get('similarity', 0)) >= 75])
-        medium_risk = len([r for r in results if 50 <= float(r.get('similarity', 0)) < 75])
-        low_risk = len([r for r in results if float(r.get('similarity', 0)) < 50])
-        
-        summary_data = [
-            ['Risk Level', 'Count', 'Percentage'],
-            ['High Risk (≥75%)', str(high_risk), f"{(high_risk/len(results)*100):.1f}%"],
-            ['Medium Risk (50-74%)', str(medium_risk), f"{(medium_risk/len(results)*100):.1f}%"],
-            ['Low Risk (<50%)', str(low_risk), f"{(low_risk/len(results)*100):.1f}%"]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[2*inch, 1*inch, 1.5*inch])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(Paragraph("Summary", styles['Heading2']))
-        story.append(summary_table)
-        story.append(Spacer(1, 20))
-        
-        # Detailed results table
-        story.append(Paragraph("Detailed Results", styles['Heading2']))
-        story.append(Spacer(1, 10))
-        
-        # Prepare table data
-        table_data = [['File 1', 'File 2', 'Similarity (%)', 'Risk Level']]
-        
-        for result in results:
-            similarity = float(result.get('similarity', 0))
-            risk_level = get_risk_level(similarity)
-            table_data.append([
-                result.get('file_1', '')[:30] + ('...' if len(result.get('file_1', '')) > 30 else ''),
-                result.get('file_2', '')[:30] + ('...' if len(result.get('file_2', '')) > 30 else ''),
-                f"{similarity:.2f}%",
-                risk_level
-            ])
-        
-        # Create table
-        table = Table(table_data, colWidths=[2*inch, 2*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        # Add color coding for risk levels
-        for i, result in enumerate(results, 1):
-            similarity = float(result.get('similarity', 0))
-            if similarity >= 75:
-                table.setStyle(TableStyle([('BACKGROUND', (0, i), (-1, i), colors.lightcoral)]))
-            elif similarity >= 50:
-                table.setStyle(TableStyle([('BACKGROUND', (0, i), (-1, i), colors.lightyellow)]))
-            else:
-                table.setStyle(TableStyle([('BACKGROUND', (0, i), (-1, i), colors.lightgreen)]))
-        
-        story.append(table)
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Create response
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=plagiarism_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-        
+        response = Response(stream_with_context(iter_clusters_csv(clusters, export_date)), mimetype='text/csv')
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename=duplicate_clusters_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        )
         return response
-        
+
     except Exception as e:
+        current_app.logger.error(f"Error in export_clusters: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def get_risk_level(similarity):
-    """Get risk level based on similarity percentage"""
-    if similarity >= 75:
-        return "High Risk"
-    elif similarity >= 50:
-        return "Medium Risk"
-    else:
-        return "Low Risk"
\ No newline at end of file
+def get_report_format():
+    fmt = request.args.get('format', 'pdf').lower()
+    return fmt if fmt in REPORT_FORMATS else None
+
+@export_bp.route('/detailed-report/<int:index>', methods=['GET', 'POST'])
+def export_detailed_report(index):
+    """Side-by-side report for one pair (?format=pdf|html), served from the render cache when possible."""
+    try:
+        fmt = get_report_format()
+        if fmt is None:
+            return jsonify({'error': f"format must be one of: {', '.join(REPORT_FORMATS)}"}), 400
+        user_id, result_set, error = get_user_result_set()
+        if error:
+            return error
+        if index < 0 or index >= len(result_set):
+            return jsonify({'error': 'Invalid index'}), 400
+
+        path = render_user_pair(get_report_cache(current_app.config), user_id, result_set, index, fmt)
+        # HTML opens in the browser, PDF downloads
+        return send_file(
+            path, mimetype=REPORT_FORMATS[fmt], as_attachment=fmt == 'pdf',
+            download_name=f'detailed_comparison_{index}.{fmt}'
+        )
+
+    except Exception as e:
+        current_app.logger.error(f"Error in export_detailed_report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@export_bp.route('/detailed-reports', methods=['GET', 'POST'])
+def export_detailed_reports():
+    """ZIP with a detailed report for every pair at or above the threshold (default REPORT_BATCH_THRESHOLD)."""
+    try:
+        fmt = get_report_format()
+        if fmt is None:
+            return jsonify({'error': f"format must be one of: {', '.join(REPORT_FORMATS)}"}), 400
+        user_id, result_set, error = get_user_result_set()
+        if error:
+            return error
+        config = current_app.config
+        try:
+            top_n, threshold = get_export_filter(config['REPORT_BATCH_MAX_PAIRS'] or None)
+        except ValueError:
+            return jsonify({'error': 'top_n and threshold must be numbers'}), 400
+        if threshold is None:
+            threshold = config['REPORT_BATCH_THRESHOLD']
+        # Never render more than the configured limit in one request
+        if config['REPORT_BATCH_MAX_PAIRS']:
+            top_n = min(top_n or config['REPORT_BATCH_MAX_PAIRS'], config['REPORT_BATCH_MAX_PAIRS'])
+
+        stop = ExportRows.from_result_set(result_set).select(top_n, threshold)
+        if stop == 0:
+            return jsonify({'error': f'No pairs with similarity ≥ {threshold:g}%'}), 404
+
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        index_csv = io.StringIO()
+        writer = csv.writer(index_csv)
+        writer.writerow(['Rank', 'File 1', 'File 2', 'Similarity (%)', 'Report'])
+        # PDFs are already compressed; only HTML is worth deflating
+        compression = zipfile.ZIP_STORED if fmt == 'pdf' else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(output, 'w', compression) as archive:
+            reports = render_user_pairs(
+                current_app._get_current_object(), get_report_cache(config), user_id, result_set,
+                range(stop), fmt, workers=config.get('REPORT_WORKERS', 4)
+            )
+            for index, path in reports:
+                row = result_set.row(index)
+                stems = [os.path.splitext(row[key])[0].replace('/', '_') for key in ('file_1', 'file_2')]
+                name = f"{index + 1:04d}_{stems[0]}__{stems[1]}.{fmt}"
+                archive.write(path, name)
+                writer.writerow([index + 1, row['file_1'], row['file_2'], f"{row['similarity']:.2f}", name])
+            archive.writestr('index.csv', index_csv.getvalue())
+        output.seek(0)
+        return send_file(
+            output, mimetype='application/zip', as_attachment=True,
+            download_name=f'detailed_reports_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+        )
+
+    except Exception as e:
+        current_app.logger.error(f"Error in export_detailed_reports: {str(e)}")
+        return jsonify({'error': str(e)}), 500
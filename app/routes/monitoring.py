@@ -1,9 +1,27 @@
-from flask import Blueprint, jsonify, render_template, request, current_app
+from flask import Blueprint, jsonify, render_template, request, current_app, g
 import os
+import json
+import base64
+import numpy as np
 from app.utils.embedding import extract_and_save_embeddings
 from app.routes.upload import get_user_id, get_user_upload_folder
+from app.utils.auth_utils import login_required
 from app.config import Config
-from app.utils.compare import check_plagiarism_from_json
+from app.utils.compare import score_embeddings
+from app.utils.result_store import load_result_set, delete_result_set
+from app.utils.model_registry import registry
+from app.utils.embedding_store import delete_embedding_store
+from app.utils.jobs import get_job_manager, public_job
+from app.utils.metrics import timed
+from app.utils.matching import find_matching_blocks
+from app.utils.fingerprint import FingerprintSet, build_fingerprints
+from app.utils.structure import build_structures
+from app.utils.corpus import Corpus, archive_snapshot, remove_label, source_path
+from app.utils.clusters import find_clusters
+from app.utils.storage import (
+    sync_user_uploads, pull_store, publish_store, pull_file, publish_file, delete_file, delete_store,
+    get_storage, user_uploads_prefix
+)
     
 
 monitoring_routes = Blueprint('monitoring', __name__)
@@ -17,8 +35,7 @@ def monitoring_page():
         return render_template('monitoring.html', files=[])
     
     # Filter out macOS metadata files (._) and get only .py files
-    files = [f for f in os.listdir(user_folder) 
-             if f.endswith('.py') and not f.startswith('._')]
+    files = list_user_files(get_user_id())
     return render_template('monitoring.html', files=files)
 
 @monitoring_routes.route('/files', methods=['GET'])
@@ -28,49 +45,300 @@ def list_uploaded_files():
     if not user_folder:
         return jsonify({'files': []})
     
-    files = [f for f in os.listdir(user_folder) 
-             if f.endswith('.py') and not f.startswith('._')]
-    return jsonify({'files': files})
+    return jsonify({'files': list_user_files(get_user_id())})
+
+def list_user_files(user_id):
+    """Uploaded .py files (without macOS ._ metadata), listed in batches from the storage backend"""
+    prefix = user_uploads_prefix(user_id)
+    return [obj.key[len(prefix):]
+            for batch in get_storage('uploads').list(prefix)
+            for obj in batch
+            if obj.key.endswith('.py') and not obj.key[len(prefix):].startswith('._')]
+
+def run_plagiarism_check(job, user_id, user_folder, use_corpus=False):
+    """Job body: extract embeddings then score all pairs (plus new x corpus pairs), reporting progress"""
+    # Binary embedding store for this user (.npy matrix + .index.json)
+    embeddings_path = Config.get_user_embeddings_path(user_id)
+    results_path = Config.get_user_results_path(user_id)
+    fingerprints_path = Config.get_user_fingerprints_path(user_id)
+    config = current_app.config
+
+    # Local mirror of the shared storage: uploads plus reusable fingerprints/results
+    sync_user_uploads(user_id)
+    pull_file('embeddings', fingerprints_path)
+    pull_store('results', results_path + '.index.json')
+
+    corpus = None
+    if use_corpus:
+        corpus = Corpus.load(user_id)
+        if corpus is None:
+            raise ValueError('The reference corpus is empty, archive a cohort first')
+
+    # Cheap token fingerprints first; unchanged files are reused by content hash
+    fingerprints = None
+    if config.get('FINGERPRINT_ENABLED', True):
+        job.progress(0.0, 'fingerprinting')
+        fingerprints = build_fingerprints(
+            user_folder, fingerprints_path,
+            k=config.get('FINGERPRINT_K', 12), window=config.get('FINGERPRINT_WINDOW', 8),
+            progress=lambda f: job.progress(0.05 * f, 'fingerprinting')
+        )
+
+    structures = None
+    if config.get('STRUCTURE_ENABLED', True):
+        job.progress(0.05, 'parsing')
+        structures = build_structures(
+            user_folder, config,
+            progress=lambda f: job.progress(0.05 + 0.05 * f, 'parsing')
+        )
+
+    job.progress(0.1, 'embedding')
+    extract_and_save_embeddings(
+        user_folder, embeddings_path, user_id=user_id,
+        progress=lambda f: job.progress(0.1 + 0.5 * f, 'embedding')
+    )
+
+    job.progress(0.6, 'scoring')
+    result_set = score_embeddings(
+        embeddings_path,
+        results_path=results_path,
+        progress=lambda f: job.progress(0.6 + 0.4 * f, 'scoring'),
+        fingerprints=fingerprints,
+        structures=structures,
+        corpus=corpus
+    )
+    publish_file('embeddings', fingerprints_path)
+    publish_store('results', results_path + '.index.json')
+    # Only a summary goes into the job; pairs are paged from /monitoring/results
+    return {
+        'result_id': result_set.result_id,
+        'pair_count': len(result_set),
+        'file_count': len(result_set.file_names),
+        'high_similarity_count': result_set.count_at_least(75),
+        'corpus_file_count': len(corpus) if corpus is not None else 0,
+        'cluster_count': len(find_clusters(result_set, config.get('CLUSTER_THRESHOLD', 75))),
+    }
 
 @monitoring_routes.route('/check', methods=['POST'])
+@login_required
 def check():
-    user_id = get_user_id()
-    user_folder = get_user_upload_folder()
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
     
-    if not user_folder or not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
+    # {"corpus": true} also scores the uploads against the archived reference corpus
+    data = request.get_json(silent=True) or {}
+    use_corpus = bool(data.get('corpus')) or request.args.get('corpus', '').lower() in ('1', 'true')
     
     try:
-        # Get the correct embeddings path (from EMBEDDINGS_FOLDER, not EMBEDDINGS_PATH)
-        json_output_path = os.path.join(current_app.config['EMBEDDINGS_FOLDER'], f"embeddings_{user_id}.json")
+        # Run the check in the background; an already running check is reused
+        job, created = get_job_manager().submit(
+            user_id, 'check', run_plagiarism_check, user_id, user_folder, use_corpus=use_corpus
+        )
+        return jsonify({'job': public_job(job), 'created': created}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def get_user_job(job_id, user_id):
+    job = get_job_manager().get(job_id)
+    if job is None or job['user_id'] != user_id:
+        return None
+    return job
+
+@monitoring_routes.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def job_status(job_id):
+    user_id = g.user_id
+    
+    job = get_user_job(job_id, user_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job': public_job(job)})
+
+@monitoring_routes.route('/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def job_result(job_id):
+    user_id = g.user_id
+    
+    job = get_user_job(job_id, user_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error'], 'job': public_job(job)}), 500
+    if job['status'] != 'finished':
+        return jsonify({'error': f"Job is {job['status']}", 'job': public_job(job)}), 409
+    return jsonify(job['result'])
+
+@monitoring_routes.route('/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    user_id = g.user_id
+    
+    if get_user_job(job_id, user_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job = get_job_manager().cancel(job_id)
+    return jsonify({'job': public_job(job)})
+
+def encode_cursor(result_id, position):
+    raw = json.dumps({'r': result_id, 'p': position}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(result_id, position) from a cursor issued by query_results; ValueError if malformed."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        position = int(data['p'])
+    except (TypeError, KeyError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if position < 0:
+        raise ValueError('Invalid cursor')
+    return data['r'], position
+
+@monitoring_routes.route('/results', methods=['GET'])
+@login_required
+def query_results():
+    """
+    One page of the stored result set, most similar first (?order=asc for least similar first).
+
+    Filters: threshold (minimum similarity %), file (pairs involving that file)
+    and top_k (the k most similar pairs of every file, or of `file`). Pages are
+    sliced from the stored sort indexes, so a response only ever holds `limit`
+    rows. Each row carries its `index` for /monitoring/details/<index>.
+    """
+    user_id = g.user_id
+    args = request.args
+    config = current_app.config
+    
+    try:
+        limit = min(int(args.get('limit', config.get('RESULTS_PAGE_SIZE', 50))),
+                    config.get('RESULTS_MAX_PAGE_SIZE', 500))
+        threshold = float(args['threshold']) if args.get('threshold') else None
+        top_k = int(args['top_k']) if args.get('top_k') else None
+    except ValueError:
+        return jsonify({'error': 'limit, threshold and top_k must be numbers'}), 400
+    order = args.get('order', 'desc')
+    if limit < 1 or (top_k is not None and top_k < 1) or order not in ('asc', 'desc'):
+        return jsonify({'error': 'limit and top_k must be positive, order must be asc or desc'}), 400
+    
+    try:
+        results_path = Config.get_user_results_path(user_id)
+        pull_store('results', results_path + '.index.json')
+        result_set = load_result_set(results_path)
+        if result_set is None:
+            return jsonify({'error': 'No results yet, run a plagiarism check first'}), 404
         
-        print(f"User folder: {user_folder}")
-        print(f"JSON output path: {json_output_path}")
+        start = 0
+        if args.get('cursor'):
+            try:
+                cursor_id, start = decode_cursor(args['cursor'])
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            if cursor_id != result_set.result_id:
+                return jsonify({'error': 'Results changed since this cursor was issued, reload the first page'}), 409
+        
+        # Ranks are positions in the score-sorted pair array, so a threshold is a rank cut-off
+        stop = result_set.count_at_least(threshold) if threshold is not None else len(result_set)
+        file_name = args.get('file')
+        if file_name:
+            position = result_set.file_position(file_name)
+            if position is None:
+                return jsonify({'error': 'File not found in results'}), 404
+            ranks = result_set.file_ranks(position)
+            ranks = ranks[:int(np.searchsorted(ranks, stop))][:top_k]
+        elif top_k:
+            ranks = result_set.top_k_ranks(top_k)
+            ranks = ranks[:int(np.searchsorted(ranks, stop))]
+        else:
+            ranks = range(stop)
+        if order == 'asc':
+            ranks = ranks[::-1]
+        
+        items = []
+        for rank in ranks[start:start + limit]:
+            row = result_set.row(int(rank))
+            row['index'] = int(rank)
+            items.append(row)
+        next_start = start + len(items)
+        
+        return jsonify({
+            'result_id': result_set.result_id,
+            'pair_count': len(result_set),
+            'file_count': len(result_set.file_names),
+            'total': len(ranks),
+            'items': items,
+            'next_cursor': encode_cursor(result_set.result_id, next_start) if next_start < len(ranks) else None
+        })
+    
+    except Exception as e:
+        current_app.logger.error(f"Error in query_results: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        extract_and_save_embeddings(user_folder, json_output_path, user_id=user_id)
+@monitoring_routes.route('/clusters', methods=['GET'])
+@login_required
+def query_clusters():
+    """
+    Groups of near-duplicate submissions in the stored result set, largest first.
 
-        results = check_plagiarism_from_json(json_output_path)
-        return jsonify({'results': results})
+    Files are linked by pairs with similarity >= threshold (default
+    CLUSTER_THRESHOLD) and by identical content; ?min_size drops smaller groups.
+    """
+    try:
+        threshold = float(request.args.get('threshold') or current_app.config.get('CLUSTER_THRESHOLD', 75))
+        min_size = int(request.args.get('min_size') or 2)
+    except ValueError:
+        return jsonify({'error': 'threshold and min_size must be numbers'}), 400
+    
+    try:
+        results_path = Config.get_user_results_path(g.user_id)
+        pull_store('results', results_path + '.index.json')
+        result_set = load_result_set(results_path)
+        if result_set is None:
+            return jsonify({'error': 'No results yet, run a plagiarism check first'}), 404
+        
+        clusters = find_clusters(result_set, threshold, min_size=min_size)
+        return jsonify({
+            'result_id': result_set.result_id,
+            'threshold': threshold,
+            'file_count': len(result_set.file_names),
+            'clustered_file_count': sum(cluster['size'] for cluster in clusters),
+            'cluster_count': len(clusters),
+            'clusters': clusters
+        })
+    
     except Exception as e:
+        current_app.logger.error(f"Error in query_clusters: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @monitoring_routes.route('/details/<int:index>', methods=['GET'])
+@login_required
 def get_comparison_details(index):
-    user_folder = get_user_upload_folder()
-    user_id = get_user_id()
-    
-    if not user_folder or not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
     
     try:
-        # Fix: Use EMBEDDINGS_FOLDER instead of EMBEDDINGS_PATH
-        json_output_path = os.path.join(current_app.config['EMBEDDINGS_FOLDER'], f"embeddings_{user_id}.json")
-        results = check_plagiarism_from_json(json_output_path)
+        # Read the pair from the stored result set instead of rescoring
+        results_path = Config.get_user_results_path(user_id)
+        pull_store('results', results_path + '.index.json')
+        result_set = load_result_set(results_path)
+        if result_set is None:
+            # Nothing stored yet (or invalidated by an upload): score once and persist
+            embeddings_path = Config.get_user_embeddings_path(user_id)
+            fingerprints_path = Config.get_user_fingerprints_path(user_id)
+            sync_user_uploads(user_id)
+            pull_store('embeddings', embeddings_path + '.index.json')
+            pull_file('embeddings', fingerprints_path)
+            result_set = score_embeddings(
+                embeddings_path,
+                results_path=results_path,
+                fingerprints=FingerprintSet.load(fingerprints_path),
+                structures=build_structures(user_folder, current_app.config)
+                if current_app.config.get('STRUCTURE_ENABLED', True) else None
+            )
+            publish_store('results', results_path + '.index.json')
         
-        if index < 0 or index >= len(results):
+        if index < 0 or index >= len(result_set):
             return jsonify({'error': 'Invalid index'}), 400
             
-        result = results[index]
+        result = result_set.row(index)
         file1 = result['file_1']
         file2 = result['file_2']
         
@@ -94,8 +362,11 @@ def get_comparison_details(index):
             
             return content
             
-        content_1 = read_file_with_fallback(os.path.join(user_folder, file1))
-        content_2 = read_file_with_fallback(os.path.join(user_folder, file2))
+        path_1, path_2 = source_path(user_id, file1), source_path(user_id, file2)
+        pull_file('uploads', path_1)
+        pull_file('uploads', path_2)
+        content_1 = read_file_with_fallback(path_1)
+        content_2 = read_file_with_fallback(path_2)
             
         # Analyze matching blocks
         matching_blocks = analyze_matching_blocks(content_1, content_2)
@@ -113,15 +384,76 @@ def get_comparison_details(index):
         current_app.logger.error(f"Error in get_comparison_details: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@monitoring_routes.route('/corpus', methods=['GET'])
+@login_required
+def corpus_status():
+    """Archived reference corpus of the current user: file count per label"""
+    try:
+        corpus = Corpus.load(g.user_id)
+        if corpus is None:
+            return jsonify({'file_count': 0, 'labels': []})
+        return jsonify({
+            'file_count': len(corpus),
+            'labels': [{'label': label, 'file_count': count} for label, count in sorted(corpus.labels().items())],
+            'model_tag': corpus.model_tag,
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error in corpus_status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@monitoring_routes.route('/corpus', methods=['POST'])
+@login_required
+def archive_to_corpus():
+    """Archive the current uploads into the reference corpus under {"label": ...} (replaces that label)"""
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        if not list_user_files(user_id):
+            return jsonify({'error': 'No uploaded files to archive'}), 400
+        # Archive exactly what is uploaded now (embeddings come from the cache when unchanged)
+        sync_user_uploads(user_id)
+        embeddings_path = Config.get_user_embeddings_path(user_id)
+        extract_and_save_embeddings(user_folder, embeddings_path, user_id=user_id)
+        archived = archive_snapshot(user_id, data.get('label'), embeddings_path)
+        corpus = Corpus.load(user_id)
+        return jsonify({'archived': archived, 'file_count': len(corpus) if corpus is not None else 0})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in archive_to_corpus: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@monitoring_routes.route('/corpus/<label>', methods=['DELETE'])
+@login_required
+def delete_corpus_label(label):
+    try:
+        removed = remove_label(g.user_id, label)
+        if not removed:
+            return jsonify({'error': 'Label not found in corpus'}), 404
+        return jsonify({'removed': removed})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Error in delete_corpus_label: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@monitoring_routes.route('/models', methods=['GET'])
+def model_status():
+    """Model yang sudah dimuat di worker ini beserta waktu load dan memori"""
+    return jsonify(registry.stats())
+
 @monitoring_routes.route('/file/<path:filename>', methods=['GET'])
+@login_required
 def get_file_content(filename):
-    user_folder = get_user_upload_folder()
-    
-    if not user_folder:
-        return jsonify({'error': 'Authentication required'}), 401
-    
     try:
-        file_path = os.path.join(user_folder, filename)
+        # Archived corpus files are addressed as corpus/<label>/<file>
+        try:
+            file_path = source_path(g.user_id, filename)
+        except ValueError:
+            return jsonify({'error': 'File not found'}), 404
+        pull_file('uploads', file_path)
         
         if not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
@@ -148,12 +480,10 @@ def get_file_content(filename):
         return jsonify({'error': str(e)}), 500
 
 @monitoring_routes.route('/reset', methods=['POST'])
+@login_required
 def reset():
-    user_folder = get_user_upload_folder()
-    user_id = get_user_id()
-    
-    if not user_folder or not user_id:
-        return jsonify({'error': 'Authentication required'}), 401
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
     
     try:
         # Clean macOS metadata files first
@@ -165,10 +495,20 @@ def reset():
             if os.path.isfile(file_path):
                 os.remove(file_path)
 
-        # Fix: Use EMBEDDINGS_FOLDER instead of EMBEDDINGS_PATH
-        json_output_path = os.path.join(current_app.config['EMBEDDINGS_FOLDER'], f"embeddings_{user_id}.json")
-        if os.path.exists(json_output_path):
-            os.remove(json_output_path)
+        # Remove the embedding store (and any legacy JSON file) and stored results
+        embeddings_path = Config.get_user_embeddings_path(user_id)
+        results_path = Config.get_user_results_path(user_id)
+        delete_embedding_store(embeddings_path)
+        delete_result_set(results_path)
+        fingerprints_path = Config.get_user_fingerprints_path(user_id)
+        if os.path.exists(fingerprints_path):
+            os.remove(fingerprints_path)
+
+        # Same for the shared storage, so other hosts drop their copies on the next sync
+        get_storage('uploads').delete_prefix(user_uploads_prefix(user_id))
+        delete_store('embeddings', embeddings_path + '.index.json')
+        delete_store('results', results_path + '.index.json')
+        delete_file('embeddings', fingerprints_path)
 
         return jsonify({'message': 'Your files and embeddings have been reset.'}), 200
     except Exception as e:
@@ -185,26 +525,7 @@ def clean_macos_metadata_files(folder_path):
             except Exception as e:
                 current_app.logger.warning(f"Failed to remove metadata file {filename}: {str(e)}")
 
+@timed('analyze_matching_blocks')
 def analyze_matching_blocks(content_1, content_2):
     """Find matching blocks between two code contents"""
-    lines1 = content_1.split('\n')
-    lines2 = content_2.split('\n')
-    matching_blocks = []
-    
-    # Simple line-by-line matching for demonstration
-    for i, line1 in enumerate(lines1):
-        line1_stripped = line1.strip()
-        if not line1_stripped or line1_stripped.startswith('#'):
-            continue  # Skip empty lines and comments
-            
-        for j, line2 in enumerate(lines2):
-            line2_stripped = line2.strip()
-            if line2_stripped and line1_stripped == line2_stripped and len(line1_stripped) > 5:
-                matching_blocks.append({
-                    'file1_line': i,  
-                    'file2_line': j,
-                    'length': 1,
-                    'content': line1_stripped
-                })
-    
-    return matching_blocks
\ No newline at end of file
+    return find_matching_blocks(content_1, content_2)
@@ -1,27 +1,22 @@
-from flask import Blueprint, request, jsonify, current_app, render_template, session
+from flask import Blueprint, request, jsonify, current_app, render_template, session, g
 import os
 import zipfile
-import shutil
+from pathlib import Path
 from werkzeug.utils import secure_filename
-import firebase_admin.auth as auth
+from app.config import Config
+from app.utils.result_store import delete_result_set
+from app.utils.ingest import UploadIndex, ZipLimitError, ingest_zip
+from app.utils.embedding import embed_files
+from app.utils.jobs import get_job_manager
+from app.utils.auth_utils import current_user_id, login_required
+from app.utils.storage import sync_user_uploads, publish_uploads, delete_store
+from app.utils.metrics import FILES_UPLOADED
 
 upload_routes = Blueprint('upload', __name__)
 
 def get_user_id():
-    """Get current user ID from session or token"""
-    # Check if user is authenticated
-    token = request.cookies.get('token') or request.headers.get('Authorization', '').replace('Bearer ', '')
-    
-    if not token:
-        return None
-        
-    try:
-        # Verify the Firebase token
-        decoded_token = auth.verify_id_token(token)
-        return decoded_token['uid']
-    except Exception as e:
-        print(f"Error verifying token: {e}")
-        return None
+    """Get current user ID from the (cached) Firebase token"""
+    return current_user_id()
 
 def get_user_upload_folder():
     """Get the upload folder specific to the current user"""
@@ -31,7 +26,6 @@ def get_user_upload_folder():
         return None
     
     # Use the helper from Config
-    from app.config import Config
     return Config.get_user_folder(user_id)
 
 @upload_routes.route('/', methods=['GET'])
@@ -43,16 +37,16 @@ def upload_page():
         # User not authenticated, redirect to login
         return render_template('upload.html', files=[], error="Please log in to upload files")
     
+    sync_user_uploads(get_user_id())
     files = [f for f in os.listdir(user_folder) if f.endswith('.py')]
     return render_template('upload.html', files=files)
 
 @upload_routes.route('/', methods=['POST'])
+@login_required
 def upload_file():
     # Get user-specific upload folder
-    user_folder = get_user_upload_folder()
-    
-    if not user_folder:
-        return jsonify({'error': 'Authentication required'}), 401
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
 
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -63,73 +57,138 @@ def upload_file():
 
     filename = secure_filename(file.filename)
     file_extension = os.path.splitext(filename)[1].lower()
-
-    if file_extension == '.zip':
-        return handle_zip_upload(file, user_folder)
-    elif file_extension == '.py':
-        return handle_python_file_upload(file, filename, user_folder)
-    else:
+    if file_extension not in ('.zip', '.py'):
         return jsonify({'error': 'Only Python (.py) or ZIP files are allowed'}), 400
 
-def handle_zip_upload(file, upload_folder):
-    temp_zip_path = os.path.join(upload_folder, 'temp.zip')
-    temp_extract_dir = os.path.join(upload_folder, 'temp_extract')
-    python_files_count = 0
-
+    manifest = []
+    # Pull uploads from other hosts first so names and duplicates are resolved against them
+    sync_user_uploads(user_id)
+    with UploadIndex.open(user_folder) as index:
+        if file_extension == '.zip':
+            response = handle_zip_upload(file, index, manifest)
+        else:
+            response = handle_python_file_upload(file, filename, index, manifest)
+
+    if response[1] == 200:
+        after_upload(user_id, user_folder, manifest)
+    return response
+
+@upload_routes.route('/bulk', methods=['POST'])
+@login_required
+def bulk_upload():
+    """Upload many .py/.zip parts in one request; returns a per-file manifest"""
+    user_id = g.user_id
+    user_folder = Config.get_user_folder(user_id)
+
+    parts = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not parts:
+        return jsonify({'error': 'No files in request'}), 400
+
+    on_duplicate = get_duplicate_policy()
+    manifest = []
+    # Pull uploads from other hosts first so names and duplicates are resolved against them
+    sync_user_uploads(user_id)
+    with UploadIndex.open(user_folder) as index:
+        for part in parts:
+            filename = secure_filename(part.filename)
+            extension = os.path.splitext(filename)[1].lower()
+            if extension == '.py':
+                manifest.append(index.add(filename, part.read(), on_duplicate=on_duplicate))
+            elif extension == '.zip':
+                try:
+                    entries = ingest_zip(part.stream, index, on_duplicate=on_duplicate, **zip_limits())
+                    for entry in entries:
+                        entry['archive'] = filename
+                    manifest.extend(entries)
+                except (ZipLimitError, zipfile.BadZipFile) as e:
+                    manifest.append(rejected_entry(part.filename, f'ZIP rejected: {str(e)}'))
+            else:
+                manifest.append(rejected_entry(part.filename, 'Only Python (.py) or ZIP files are allowed'))
+
+    summary = {status: sum(1 for e in manifest if e['status'] == status)
+               for status in ('duplicate', 'rejected')}
+    # With on_duplicate=keep a duplicate is written too; count what actually landed on disk
+    summary['stored'] = sum(1 for e in manifest if e.get('stored_name'))
+    summary['duplicate_kept'] = sum(1 for e in manifest if e['status'] == 'duplicate' and e.get('stored_name'))
+    after_upload(user_id, user_folder, manifest)
+    status_code = 400 if summary['rejected'] == len(manifest) else 200
+    return jsonify({'manifest': manifest, **summary}), status_code
+
+def get_duplicate_policy():
+    """'skip' (default) leaves files with already uploaded content out; 'keep' stores them too"""
+    policy = request.form.get('on_duplicate') or current_app.config.get('UPLOAD_ON_DUPLICATE', 'skip')
+    return policy if policy in ('skip', 'keep') else 'skip'
+
+def zip_limits():
+    config = current_app.config
+    return {
+        'max_members': config.get('ZIP_MAX_MEMBERS', 5000),
+        'max_total_bytes': config.get('ZIP_MAX_TOTAL_BYTES', 100 * 1024 * 1024),
+        'max_ratio': config.get('ZIP_MAX_RATIO', 100),
+    }
+
+def rejected_entry(filename, error):
+    return {'original_name': filename, 'stored_name': None, 'content_hash': None,
+            'size': None, 'status': 'rejected', 'duplicate_of': None, 'error': error}
+
+def after_upload(user_id, user_folder, manifest):
+    """Invalidate stored results and optionally pre-embed the files that were stored"""
+    stored = [e['stored_name'] for e in manifest if e['stored_name']]
+    if not stored:
+        return
+    FILES_UPLOADED.inc(len(stored))
+    publish_uploads(user_id, stored + [UploadIndex.FILE_NAME])
+    saved = [os.path.join(user_folder, name) for name in stored]
+    # New files make the stored similarity results stale
+    results_path = Config.get_user_results_path(user_id)
+    delete_result_set(results_path)
+    delete_store('results', results_path + '.index.json')
+    if current_app.config.get('EMBED_ON_UPLOAD'):
+        # Warm the embedding cache now so the next check only scores;
+        # if a warm-up job is already running the check embeds the rest
+        get_job_manager().submit(user_id, 'embed', run_embedding_warmup, saved)
+
+def handle_zip_upload(file, index, manifest):
     try:
-        file.save(temp_zip_path)
-        os.makedirs(temp_extract_dir, exist_ok=True)
-        with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_extract_dir)
-
-        python_files_count = move_python_files_from_dir(temp_extract_dir, upload_folder)
+        # Stream members straight from the upload; only .py files are written, once
+        entries = ingest_zip(file.stream, index, on_duplicate=get_duplicate_policy(), **zip_limits())
+        manifest.extend(entries)
+        python_files_count = sum(1 for e in entries if e.get('stored_name'))
+        duplicates = sum(1 for e in entries if e['status'] == 'duplicate')
 
-        if os.path.exists(temp_zip_path):
-            os.remove(temp_zip_path)
-        if os.path.exists(temp_extract_dir):
-            shutil.rmtree(temp_extract_dir)
-
-        if python_files_count == 0:
+        if not entries:
             return jsonify({'error': 'No Python files found in the ZIP archive'}), 400
 
+        message = f'ZIP file processed successfully. {python_files_count} Python files extracted.'
+        if duplicates:
+            message += f' {duplicates} duplicate files detected.'
         return jsonify({
-            'message': f'ZIP file processed successfully. {python_files_count} Python files extracted.',
-            'files_count': python_files_count
+            'message': message,
+            'files_count': python_files_count,
+            'manifest': entries
         }), 200
 
+    except ZipLimitError as e:
+        return jsonify({'error': f'ZIP rejected: {str(e)}'}), 400
     except zipfile.BadZipFile:
         return jsonify({'error': 'Invalid ZIP file'}), 400
     except Exception as e:
         return jsonify({'error': f'Error processing ZIP: {str(e)}'}), 500
 
-def move_python_files_from_dir(src_dir, dest_dir):
-    python_files_count = 0
-    for root, _, files in os.walk(src_dir):
-        for f in files:
-            if f.endswith('.py'):
-                python_files_count += 1
-                original_name = os.path.join(root, f)
-                dest_name = os.path.join(dest_dir, f)
-                counter = 1
-                while os.path.exists(dest_name):
-                    name_parts = os.path.splitext(f)
-                    dest_name = os.path.join(
-                        dest_dir,
-                        f"{name_parts[0]}_{counter}{name_parts[1]}"
-                    )
-                    counter += 1
-                shutil.copy2(original_name, dest_name)
-    return python_files_count
-
-def handle_python_file_upload(file, filename, upload_folder):
-    save_path = os.path.join(upload_folder, filename)
-    counter = 1
-    while os.path.exists(save_path):
-        name_parts = os.path.splitext(filename)
-        save_path = os.path.join(
-            upload_folder,
-            f"{name_parts[0]}_{counter}{name_parts[1]}"
-        )
-        counter += 1
-    file.save(save_path)
-    return jsonify({'message': f'{os.path.basename(save_path)} uploaded successfully'}), 200
\ No newline at end of file
+def handle_python_file_upload(file, filename, index, manifest):
+    entry = index.add(filename, file.read(), on_duplicate=get_duplicate_policy())
+    manifest.append(entry)
+    if entry['stored_name'] is None:
+        return jsonify({
+            'message': f"{filename} has the same content as {entry['duplicate_of']} and was not stored",
+            'manifest': [entry]
+        }), 200
+    return jsonify({'message': f"{entry['stored_name']} uploaded successfully", 'manifest': [entry]}), 200
+
+def run_embedding_warmup(job, paths):
+    """Job body: embed freshly uploaded files into the shared embedding cache"""
+    embedded, _ = embed_files(
+        [Path(p) for p in paths if os.path.exists(p)],
+        progress=lambda f: job.progress(f, 'embedding')
+    )
+    return {'embedded': len(embedded)}
@@ -0,0 +1,174 @@
+import math
+
+import numpy as np
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """
+    Index ANN sederhana (inverted file) dengan NumPy murni.
+
+    Vektor dikelompokkan dengan k-means ke `n_lists` centroid; query hanya
+    dibandingkan dengan anggota `n_probe` list terdekat, sehingga biaya per
+    query ~ N * n_probe / n_lists, bukan N. metric='cosine' memakai dot product
+    vektor ter-normalisasi (spherical k-means), metric='l2' jarak euclidean.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, iterations=10, metric='cosine', seed=0):
+        if metric not in ('cosine', 'l2'):
+            raise ValueError(f"Unsupported ANN metric: {metric}")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.metric = metric
+        self.seed = seed
+        self.vectors = None
+        self.centroids = None
+        self.list_order = None
+        self.list_offsets = None
+
+    def _prepare(self, vectors):
+        if self.metric == 'cosine':
+            return _normalize(vectors)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _similarity(self, queries, targets, target_sq=None):
+        """Skor 'lebih besar = lebih dekat'; untuk l2: 2 q.x - |x|^2 (urutan sama dengan -|q-x|^2)."""
+        sims = queries @ targets.T
+        if self.metric == 'l2':
+            sims = 2.0 * sims - target_sq
+        return sims
+
+    def fit(self, vectors):
+        self.vectors = self._prepare(vectors)
+        n = self.vectors.shape[0]
+        n_lists = self.n_lists or max(1, int(math.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(self.seed)
+
+        centroids = self.vectors[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = self._assign(centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.vectors)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # List kosong diisi ulang dengan titik acak agar semua centroid terpakai
+                sums[empty] = self.vectors[rng.choice(n, int(empty.sum()), replace=False)]
+                counts[empty] = 1
+            centroids = _normalize(sums) if self.metric == 'cosine' else sums / counts[:, None]
+
+        self.centroids = centroids.astype(np.float32)
+        assign = self._assign(self.centroids)
+        self.list_order = np.argsort(assign, kind='stable').astype(np.int32)
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists))))
+        return self
+
+    def save(self, f):
+        """Tulis index yang sudah di-fit ke file object (.npz) agar tidak perlu k-means ulang."""
+        np.savez(
+            f, vectors=self.vectors, centroids=self.centroids,
+            list_order=self.list_order, list_offsets=self.list_offsets,
+            metric=np.array(self.metric), params=np.array([self.n_probe, self.iterations, self.seed]),
+        )
+
+    @classmethod
+    def load(cls, f):
+        with np.load(f, allow_pickle=False) as data:
+            n_probe, iterations, seed = (int(v) for v in data["params"])
+            index = cls(n_probe=n_probe, iterations=iterations, metric=str(data["metric"]), seed=seed)
+            index.vectors = data["vectors"]
+            index.centroids = data["centroids"]
+            index.list_order = data["list_order"]
+            index.list_offsets = data["list_offsets"]
+        index.n_lists = index.centroids.shape[0]
+        return index
+
+    def _assign(self, centroids, block=4096):
+        centroid_sq = (centroids ** 2).sum(axis=1)
+        assign = np.empty(self.vectors.shape[0], dtype=np.int64)
+        for start in range(0, self.vectors.shape[0], block):
+            sims = self._similarity(self.vectors[start:start + block], centroids, centroid_sq)
+            assign[start:start + block] = np.argmax(sims, axis=1)
+        return assign
+
+    def search(self, queries, k, query_ids=None):
+        """
+        Top-k tetangga untuk setiap query. `query_ids` (indeks query di index
+        ini) membuat query tidak mengembalikan dirinya sendiri.
+        Returns (indices, similarities), masing-masing (Q x k); slot kosong = -1 / -inf.
+
+        Dikerjakan per list, bukan per query: semua query yang mem-probe list
+        yang sama dihitung dalam satu perkalian matriks, lalu digabung ke top-k.
+        """
+        queries = self._prepare(queries)
+        n_queries = queries.shape[0]
+        n_probe = min(self.n_probe, self.centroids.shape[0])
+        indices = np.full((n_queries, k), -1, dtype=np.int32)
+        sims = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        if n_queries == 0 or k == 0:
+            return indices, sims
+
+        centroid_sq = (self.centroids ** 2).sum(axis=1)
+        probes = np.argpartition(
+            -self._similarity(queries, self.centroids, centroid_sq), n_probe - 1, axis=1
+        )[:, :n_probe]
+        vector_sq = (self.vectors ** 2).sum(axis=1)
+
+        # Query dikelompokkan per list yang di-probe
+        probe_lists = probes.reshape(-1)
+        probe_queries = np.repeat(np.arange(n_queries), n_probe)
+        order = np.argsort(probe_lists, kind='stable')
+        bounds = np.searchsorted(probe_lists[order], np.arange(self.centroids.shape[0] + 1))
+
+        for c in range(self.centroids.shape[0]):
+            members = self.list_order[self.list_offsets[c]:self.list_offsets[c + 1]]
+            q_ids = probe_queries[order[bounds[c]:bounds[c + 1]]]
+            if members.size == 0 or q_ids.size == 0:
+                continue
+            scores = self._similarity(queries[q_ids], self.vectors[members], vector_sq[members])
+            if query_ids is not None:
+                scores[query_ids[q_ids][:, None] == members[None, :]] = -np.inf
+
+            merged_idx = np.concatenate([indices[q_ids], np.broadcast_to(members, scores.shape)], axis=1)
+            merged_sim = np.concatenate([sims[q_ids], scores.astype(np.float32)], axis=1)
+            top = np.argpartition(-merged_sim, k - 1, axis=1)[:, :k]
+            indices[q_ids] = np.take_along_axis(merged_idx, top, axis=1)
+            sims[q_ids] = np.take_along_axis(merged_sim, top, axis=1)
+
+        # Urutkan per baris (terdekat dulu); slot -inf ditandai kosong
+        best = np.argsort(-sims, axis=1, kind='stable')
+        indices = np.take_along_axis(indices, best, axis=1)
+        sims = np.take_along_axis(sims, best, axis=1)
+        indices[~np.isfinite(sims)] = -1
+        return indices, sims
+
+
+def candidate_pairs(vectors, k=20, n_probe=8, n_lists=None, metric='cosine', seed=0):
+    """
+    Pasangan kandidat (left < right) dari graf k-NN semua file.
+    Setiap file menyumbang pasangan dengan k tetangga terdekatnya; pasangan
+    dideduplikasi dan dikembalikan dalam urutan (left, right) naik.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n = vectors.shape[0]
+    if n < 2:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+
+    index = IVFIndex(n_lists=n_lists, n_probe=n_probe, metric=metric, seed=seed).fit(vectors)
+    neighbours, _ = index.search(vectors, min(k, n - 1), query_ids=np.arange(n))
+
+    rows = np.repeat(np.arange(n, dtype=np.int64), neighbours.shape[1])
+    cols = neighbours.reshape(-1).astype(np.int64)
+    valid = cols >= 0
+    rows, cols = rows[valid], cols[valid]
+    left, right = np.minimum(rows, cols), np.maximum(rows, cols)
+    keys = np.unique(left * n + right)
+    return (keys // n).astype(np.int32), (keys % n).astype(np.int32)
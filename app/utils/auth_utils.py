@@ -0,0 +1,128 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, jsonify, current_app
+import firebase_admin.auth as auth
+
+# Penanda "belum dihitung" di g, karena None berarti "tidak login"
+_UNSET = object()
+
+
+class TokenCache:
+    """
+    Cache LRU token Firebase yang sudah diverifikasi, per proses.
+
+    Entry kedaluwarsa pada min(waktu simpan + ttl, exp token - leeway),
+    sehingga token yang expired tidak pernah dilayani dari cache. Key-nya
+    hash SHA-256 token, bukan token mentah.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=300, leeway_seconds=5):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.leeway_seconds = leeway_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, decoded):
+        expires_at = time.time() + self.ttl_seconds
+        if 'exp' in decoded:
+            expires_at = min(expires_at, float(decoded['exp']) - self.leeway_seconds)
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[self._key(token)] = (decoded, expires_at)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """TokenCache per proses, dibuat dari config app saat pertama dipakai."""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                config = current_app.config
+                _token_cache = TokenCache(
+                    max_entries=config.get('AUTH_TOKEN_CACHE_SIZE', 1024),
+                    ttl_seconds=config.get('AUTH_TOKEN_CACHE_TTL', 300),
+                )
+    return _token_cache
+
+
+def get_request_token():
+    """Token dari cookie `token` atau header Authorization: Bearer."""
+    return request.cookies.get('token') or request.headers.get('Authorization', '').replace('Bearer ', '')
+
+
+def verify_token(token):
+    """Decoded token (dari cache jika masih berlaku), atau None jika tidak valid."""
+    cache = get_token_cache()
+    decoded = cache.get(token)
+    if decoded is not None:
+        return decoded
+    try:
+        decoded = auth.verify_id_token(token)
+    except Exception as e:
+        current_app.logger.warning(f"Error verifying token: {e}")
+        return None
+    cache.put(token, decoded)
+    return decoded
+
+
+def current_user_id():
+    """
+    UID user untuk request ini. Diverifikasi sekali per request (disimpan di
+    g.user_id / g.user) dan sekali per token per masa berlaku lewat TokenCache.
+    """
+    user_id = g.get('user_id', _UNSET)
+    if user_id is not _UNSET:
+        return user_id
+
+    token = get_request_token()
+    decoded = verify_token(token) if token else None
+    g.user = decoded
+    g.user_id = decoded['uid'] if decoded else None
+    return g.user_id
+
+
+def login_required(view):
+    """Decorator route JSON: isi g.user_id atau balas 401."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user_id():
+            return jsonify({'error': 'Authentication required'}), 401
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,88 @@
+import numpy as np
+
+from app.utils.metrics import timed
+
+
+def exact_duplicate_groups(content_hashes):
+    """Grup indeks file dengan content hash sama (hanya grup >= 2 file), urut indeks."""
+    groups = {}
+    for i, source_hash in enumerate(content_hashes):
+        if source_hash:
+            groups.setdefault(source_hash, []).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+@timed("clustering")
+def find_clusters(result_set, threshold, min_size=2):
+    """
+    Kelompokkan file yang saling terhubung oleh pasangan dengan similarity
+    (persen) >= `threshold`, ditambah file dengan isi identik (exact duplicate,
+    dari content hash saat scoring). Komponen terhubung dihitung dengan
+    scipy.sparse.csgraph pada graf sparse dari prefix pasangan terurut di
+    atas threshold, jadi tidak pernah butuh matriks N x N.
+
+    Returns list dict cluster, terbesar dulu: files, size, exact_duplicates
+    (grup nama file identik di dalam cluster), pair_count, max_similarity,
+    mean_similarity (pasangan di atas threshold dalam cluster).
+    """
+    # scipy hanya dibutuhkan saat clustering; jangan ikut dimuat saat startup
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n = len(result_set.file_names)
+    if n == 0:
+        return []
+    stop = result_set.count_at_least(threshold)
+    pairs = result_set.pairs[:stop]
+    left = np.asarray(pairs["left"], dtype=np.int64)
+    right = np.asarray(pairs["right"], dtype=np.int64)
+    similarity = np.asarray(pairs["score"], dtype=np.float64) * 100
+
+    exact = result_set.info.get("exact_duplicates") or []
+    # Anggota grup identik dihubungkan berantai ke anggota pertamanya
+    exact_left = [group[0] for group in exact for _ in group[1:]]
+    exact_right = [member for group in exact for member in group[1:]]
+    rows = np.concatenate([left, exact_left]).astype(np.int64)
+    cols = np.concatenate([right, exact_right]).astype(np.int64)
+    graph = coo_matrix((np.ones(rows.shape[0], dtype=np.int8), (rows, cols)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    sizes = np.bincount(labels, minlength=n)
+    components = np.flatnonzero(sizes >= max(min_size, 2))
+    if components.size == 0:
+        return []
+
+    edge_labels = labels[left]
+    pair_counts = np.bincount(edge_labels, minlength=n)
+    similarity_sums = np.bincount(edge_labels, weights=similarity, minlength=n)
+    # Pasangan terurut menurun: kemunculan pertama per komponen = similarity tertinggi
+    first_labels, first_edges = np.unique(edge_labels, return_index=True)
+    max_similarity = np.zeros(n)
+    max_similarity[first_labels] = similarity[first_edges]
+
+    exact_by_component = {}
+    for group in exact:
+        exact_by_component.setdefault(int(labels[group[0]]), []).append(
+            [result_set.file_names[i] for i in group]
+        )
+        # Isi identik = similarity 100%, juga jika pasangannya tidak ikut di-skor
+        max_similarity[labels[group[0]]] = 100.0
+
+    members = np.argsort(labels, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    clusters = []
+    for component in components:
+        files = members[offsets[component]:offsets[component + 1]]
+        count = int(pair_counts[component])
+        clusters.append({
+            "files": [result_set.file_names[i] for i in files],
+            "size": int(sizes[component]),
+            "exact_duplicates": exact_by_component.get(int(component), []),
+            "pair_count": count,
+            "max_similarity": float(max_similarity[component]),
+            "mean_similarity": float(similarity_sums[component] / count) if count else 100.0,
+        })
+    clusters.sort(key=lambda cluster: (-cluster["size"], -cluster["max_similarity"]))
+    for number, cluster in enumerate(clusters, 1):
+        cluster["id"] = number
+    return clusters
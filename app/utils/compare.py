@@ -1,77 +1,260 @@
-import json
+import os
 import numpy as np
-import tensorflow as tf
-from tensorflow import keras
-from itertools import combinations
 from flask import current_app
+from app.utils.model_registry import get_model, model_signature
+from app.utils.embedding_store import load_embedding_store
+from app.utils.result_store import ResultSet, load_result_set, save_result_set
+from app.utils.ann_index import candidate_pairs
+from app.utils.clusters import exact_duplicate_groups
+from app.utils.fingerprint import lookup_overlaps
+from app.utils.metrics import timed, PAIRS_SCORED
 
-@tf.keras.utils.register_keras_serializable()
-def euclidean_distance(vects):
-    diff = tf.abs(vects[0] - vects[1])
-    return tf.reduce_sum(diff, axis=1, keepdims=True) / tf.cast(tf.shape(vects[0])[-1], tf.float32)
+_euclidean_distance = None
+
+def get_euclidean_distance():
+    """
+    Fungsi jarak custom untuk layer Lambda model Keras. Didefinisikan (dan
+    didaftarkan ke Keras) saat pertama dibutuhkan, agar import modul ini
+    tidak ikut memuat TensorFlow; engine NumPy tidak pernah memanggilnya.
+    """
+    global _euclidean_distance
+    if _euclidean_distance is None:
+        import tensorflow as tf
+
+        @tf.keras.utils.register_keras_serializable()
+        def euclidean_distance(vects):
+            diff = tf.abs(vects[0] - vects[1])
+            return tf.reduce_sum(diff, axis=1, keepdims=True) / tf.cast(tf.shape(vects[0])[-1], tf.float32)
+
+        _euclidean_distance = euclidean_distance
+    return _euclidean_distance
 
 def load_embeddings(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Handle both old and new format (with metadata)
-    if "embeddings" in data:
-        # New format with metadata
-        embeddings_data = data["embeddings"]
+    """
+    Muat embedding dari store biner (.npy + index); path JSON lama tetap
+    diterima dan dimigrasikan sekali ke format biner.
+    Returns (matriks N x dim, daftar nama file).
+    """
+    snapshot = load_embedding_store(path)
+    return snapshot.matrix, snapshot.file_names
+
+def score_pairs(model, embeddings, batch_size=4096, progress=None, pairs=None):
+    """
+    Skor semua pasangan (i < j) dengan model Siamese dalam batch besar.
+
+    Indeks pasangan dibangun sekali dengan np.triu_indices (urutannya sama
+    dengan itertools.combinations), lalu embedding dikirim ke model per
+    potongan `batch_size` pasangan, bukan satu pasangan per panggilan.
+    `pairs=(left, right)` membatasi scoring ke pasangan kandidat saja.
+    `progress(fraction)` dipanggil setelah setiap potongan (opsional).
+    Returns (left, right, scores) sebagai array NumPy.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    left, right = pairs if pairs is not None else np.triu_indices(matrix.shape[0], k=1)
+    scores = np.empty(left.shape[0], dtype=np.float32)
+    batch_size = max(1, int(batch_size))
+
+    for start in range(0, left.shape[0], batch_size):
+        stop = start + batch_size
+        # Panggil model langsung; predict() menambah overhead per panggilan
+        outputs = model(
+            [matrix[left[start:stop]], matrix[right[start:stop]]],
+            training=False
+        )
+        scores[start:stop] = np.asarray(outputs, dtype=np.float32).reshape(-1)
+        if progress is not None:
+            progress(min(stop, left.shape[0]) / left.shape[0])
+
+    return left, right, scores
+
+def candidate_strategy(file_count, config, fingerprints=None):
+    """
+    Strategi pemilihan pasangan untuk scoring: 'exhaustive', 'fingerprint'
+    atau 'ann:k<K>:p<P>'.
+    SCORING_CANDIDATES: 'exhaustive', 'ann', 'fingerprint' (hanya pasangan yang
+    berbagi fingerprint token), atau 'auto' (ANN mulai ANN_MIN_FILES file).
+    String ini ikut disimpan di signature result set.
+    """
+    mode = config.get('SCORING_CANDIDATES', 'auto')
+    if mode == 'fingerprint' and fingerprints is not None:
+        return 'fingerprint'
+    if mode in ('exhaustive', 'fingerprint') or (mode == 'auto' and file_count < config.get('ANN_MIN_FILES', 500)):
+        return 'exhaustive'
+    return f"ann:k{config.get('ANN_TOP_K', 20)}:p{config.get('ANN_NPROBE', 8)}"
+
+def merge_pairs(pairs_a, pairs_b, n):
+    """Gabungan dua himpunan pasangan (left, right) tanpa duplikat, terurut."""
+    keys = np.union1d(
+        pairs_a[0].astype(np.int64) * n + pairs_a[1],
+        pairs_b[0].astype(np.int64) * n + pairs_b[1]
+    )
+    return (keys // n).astype(np.int32), (keys % n).astype(np.int32)
+
+def score_corpus_edges(matrix, corpus, model_version, config):
+    """
+    Skor submission baru (`matrix`) terhadap korpus referensi: hanya k
+    tetangga korpus per file (index IVF di ruang scoring), tidak pernah
+    korpus x korpus. Returns (indeks file korpus yang terlibat, left, right,
+    scores); right = posisi di daftar indeks korpus tersebut.
+    """
+    engine = config.get('SCORING_ENGINE', 'numpy')
+    model = get_model(model_version, engine=engine)
+    # Ruang kandidat sama dengan strategi ANN di dalam kohort
+    if engine == 'numpy':
+        transform, metric = model.tower, 'l2'
+    else:
+        transform, metric = (lambda vectors: vectors), 'cosine'
+    matrix = np.asarray(matrix, dtype=np.float32)
+    corpus_ids, left, right = corpus.candidates(
+        transform(matrix), transform, metric,
+        space=f"{model_signature(model_version)}|{engine}",
+        k=config.get('CORPUS_TOP_K', 20),
+        n_probe=config.get('CORPUS_NPROBE', 8)
+    )
+    # Satu matriks [baru; korpus yang terlibat] agar bisa memakai jalur scoring pasangan yang sama
+    combined = np.concatenate([matrix, np.asarray(corpus.snapshot.matrix[corpus_ids], dtype=np.float32)])
+    right = right + matrix.shape[0]
+    if engine == 'numpy':
+        scores = model.score_pairs(combined, left, right)
     else:
-        # Old format without metadata
-        embeddings_data = data
-    
-    file_names = list(embeddings_data.keys())
-    embeddings = []
-    
-    for f in file_names:
-        if isinstance(embeddings_data[f], dict) and "embedding" in embeddings_data[f]:
-            # New format where each file has a dict with "embedding" key
-            embeddings.append(np.array(embeddings_data[f]["embedding"]))
-        else:
-            # Old format where each file maps directly to its embedding
-            embeddings.append(np.array(embeddings_data[f]))
-    
-    return embeddings, file_names
-
-def check_plagiarism_from_json(json_path):
-    try:
-        # Load model with custom configuration
-        model = tf.keras.models.load_model(
-            current_app.config['MODEL_PATH'],
-            custom_objects={
-                'euclidean_distance': euclidean_distance,
-                'InputLayer': tf.keras.layers.InputLayer
-            },
-            compile=False,
-            safe_mode=False
+        left, right, scores = score_pairs(
+            model, combined, batch_size=config.get('SCORING_BATCH_SIZE', 4096), pairs=(left, right)
         )
+    PAIRS_SCORED.inc(len(scores))
+    return corpus_ids, left, right - matrix.shape[0], scores
+
+def score_embeddings(embeddings_path, results_path=None, model_version=None, progress=None,
+                     fingerprints=None, structures=None, corpus=None):
+    """
+    Skor semua pasangan dari snapshot embedding dan kembalikan ResultSet.
+
+    Untuk kohort besar hanya pasangan kandidat ANN yang di-skor (lihat
+    candidate_strategy); pasangan lain dianggap tidak mirip dan tidak masuk hasil.
+    Jika `results_path` diberikan, hasil disimpan di sana dan dipakai ulang
+    selama snapshot embedding, model (path + mtime) dan strategi tidak berubah.
+
+    `fingerprints` (FingerprintSet, opsional) menambahkan skor overlap token
+    per pasangan di samping skor neural dan dapat membatasi pasangan kandidat;
+    `structures` (StructureSet, opsional) menambahkan skor struktur AST.
+    `corpus` (Corpus, opsional) menambahkan pasangan file baru x korpus
+    referensi (lihat score_corpus_edges); skor overlap/struktur pasangan
+    korpus kosong (NaN). Grup file dengan isi identik (content hash sama)
+    disimpan di info "exact_duplicates" untuk clustering (lihat find_clusters).
+    """
+    config = current_app.config
+    model_version = model_version or config.get('MODEL_VERSION')
+    snapshot = load_embedding_store(embeddings_path)
+    strategy = candidate_strategy(len(snapshot.file_names), config, fingerprints)
+    signature = f"{model_signature(model_version)}|{strategy}"
+    if fingerprints is not None:
+        signature += f"|fp:{fingerprints.snapshot_id}"
+    if structures is not None:
+        signature += f"|ast:{structures.snapshot_id}"
+    if corpus is not None:
+        if corpus.model_tag != snapshot.metadata.get('model_tag'):
+            raise ValueError("The reference corpus was embedded with a different model; archive it again")
+        signature += f"|corpus:{corpus.snapshot_id}:k{config.get('CORPUS_TOP_K', 20)}:p{config.get('CORPUS_NPROBE', 8)}"
+
+    if results_path:
+        stored = load_result_set(results_path)
+        if stored is not None and stored.is_current(snapshot.snapshot_id, signature):
+            return stored
+
+    file_names = snapshot.file_names
+    content_hashes = [record.get('content_hash') for record in snapshot.files]
+    overlap_pairs = None
+    if fingerprints is not None:
+        overlap_pairs = fingerprints.pair_overlaps(file_names, max_df=config.get('FINGERPRINT_MAX_DF', 0.5))
+
+    if len(file_names) < 2:
+        left = right = np.empty(0, dtype=np.int64)
+        scores = np.empty(0, dtype=np.float32)
+    else:
+        with timed('pair_scoring'):
+            engine = config.get('SCORING_ENGINE', 'numpy')
+            # Model di-cache per worker; load ulang hanya jika file .h5 berubah
+            model = get_model(model_version, engine=engine)
+            if strategy == 'fingerprint':
+                # Hanya pasangan yang berbagi fingerprint token yang dikirim ke model
+                pairs = overlap_pairs[:2]
+            elif strategy != 'exhaustive':
+                # Kohort besar: hanya pasangan tetangga ANN yang dikirim ke model Siamese
+                # Engine NumPy: cari tetangga L2 di ruang output tower; head memakai
+                # rata-rata jarak L1 antar tower, jadi tetangga L2 hanya aproksimasi
+                # pasangan dengan skor tertinggi. Engine lain: cosine pada embedding
+                if engine == 'numpy':
+                    vectors, metric = model.tower(snapshot.matrix), 'l2'
+                else:
+                    vectors, metric = snapshot.matrix, 'cosine'
+                pairs = candidate_pairs(
+                    vectors,
+                    k=config.get('ANN_TOP_K', 20),
+                    n_probe=config.get('ANN_NPROBE', 8),
+                    metric=metric
+                )
+                if overlap_pairs is not None:
+                    # Pasangan dengan overlap token selalu ikut, walau bukan tetangga ANN
+                    pairs = merge_pairs(pairs, overlap_pairs[:2], len(file_names))
+            if strategy != 'exhaustive':
+                left, right = pairs
+                if engine == 'numpy':
+                    scores = model.score_pairs(snapshot.matrix, left, right, progress=progress)
+                else:
+                    left, right, scores = score_pairs(
+                        model, snapshot.matrix,
+                        batch_size=config.get('SCORING_BATCH_SIZE', 4096),
+                        progress=progress,
+                        pairs=pairs
+                    )
+            elif engine == 'numpy':
+                # Fast path tanpa TensorFlow: tower sekali per file + kernel L1 blockwise
+                left, right, scores = model.score_all_pairs(
+                    snapshot.matrix,
+                    max_block_bytes=config.get('SCORING_MAX_BLOCK_BYTES', 64 * 1024 * 1024),
+                    threads=config.get('SCORING_THREADS') or os.cpu_count(),
+                    progress=progress
+                )
+            else:
+                left, right, scores = score_pairs(
+                    model,
+                    snapshot.matrix,
+                    batch_size=config.get('SCORING_BATCH_SIZE', 4096),
+                    progress=progress
+                )
+        PAIRS_SCORED.inc(len(scores))
+
+    overlaps = None
+    if overlap_pairs is not None:
+        overlaps = lookup_overlaps(left, right, len(file_names), *overlap_pairs)
+
+    structure = None
+    if structures is not None:
+        structure = lookup_overlaps(
+            left, right, len(file_names),
+            *structures.pair_overlaps(file_names, max_df=config.get('STRUCTURE_MAX_DF', 0.5))
+        )
+        # Pasangan dengan file yang gagal di-parse tidak punya skor struktur
+        parsed = structures.parsed(file_names)
+        structure[~(parsed[left] & parsed[right])] = np.nan
+
+    if corpus is not None and file_names:
+        with timed('corpus_scoring'):
+            corpus_ids, corpus_left, corpus_right, corpus_scores = score_corpus_edges(
+                snapshot.matrix, corpus, model_version, config
+            )
+        missing = np.full(len(corpus_scores), np.nan, dtype=np.float32)
+        left = np.concatenate([left, corpus_left]).astype(np.int32)
+        right = np.concatenate([right, corpus_right + len(file_names)]).astype(np.int32)
+        scores = np.concatenate([scores, corpus_scores]).astype(np.float32)
+        overlaps = np.concatenate([overlaps, missing]) if overlaps is not None else None
+        structure = np.concatenate([structure, missing]) if structure is not None else None
+        file_names = file_names + corpus.display_names(corpus_ids)
+        content_hashes = content_hashes + corpus.content_hashes(corpus_ids)
 
-        embeddings, file_names = load_embeddings(json_path)
-        
-        results = []
-        for i, j in combinations(range(len(file_names)), 2):
-            emb1 = np.expand_dims(embeddings[i], axis=0)
-            emb2 = np.expand_dims(embeddings[j], axis=0)
-            
-            # Make prediction
-            pred = model.predict(
-                [emb1, emb2], 
-                verbose=0,
-                batch_size=1
-            )[0][0]
-            
-            similarity_score = float(pred * 100)
-            results.append({
-                'file_1': file_names[i],
-                'file_2': file_names[j],
-                'similarity': similarity_score
-            })
-
-        results = sorted(results, key=lambda x: float(x['similarity']), reverse=True)
-        return results
-        
-    except Exception as e:
-        current_app.logger.error(f"Plagiarism check failed: {str(e)}")
-        raise RuntimeError(f"Failed to check plagiarism: {str(e)}")
\ No newline at end of file
+    exact_duplicates = exact_duplicate_groups(content_hashes)
+    if results_path:
+        return save_result_set(results_path, file_names, left, right, scores,
+                               snapshot.snapshot_id, signature, overlaps=overlaps, structure=structure,
+                               exact_duplicates=exact_duplicates)
+    return ResultSet.from_arrays(file_names, left, right, scores, overlaps=overlaps, structure=structure,
+                                 info={"result_id": None, "exact_duplicates": exact_duplicates})
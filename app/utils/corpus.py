@@ -0,0 +1,231 @@
+import os
+import glob
+import shutil
+import hashlib
+import datetime
+
+import numpy as np
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+from app.config import Config
+from app.utils.ann_index import IVFIndex
+from app.utils.embedding_store import (
+    INDEX_SUFFIX, atomic_write, delete_embedding_store, load_embedding_store, save_embedding_store,
+)
+from app.utils.metrics import timed
+from app.utils.storage import (
+    delete_store, get_storage, publish_file, publish_store, pull_file, pull_store,
+)
+
+# Nama file korpus di result set: "corpus/<label>/<file>". Nama upload tidak
+# pernah memuat '/' (secure_filename), jadi prefix ini tidak bisa bentrok.
+CORPUS_PREFIX = "corpus/"
+
+
+def is_corpus_name(name):
+    return name.startswith(CORPUS_PREFIX)
+
+
+def source_path(user_id, name):
+    """Path lokal source untuk nama file di result set (upload user atau file korpus)."""
+    if is_corpus_name(name):
+        folder = Config.get_user_corpus_folder(user_id)
+        path = os.path.normpath(os.path.join(folder, name[len(CORPUS_PREFIX):]))
+        if not path.startswith(folder + os.sep):
+            raise ValueError(f"Invalid corpus file name: {name}")
+        return path
+    return os.path.join(Config.get_user_folder(user_id), name)
+
+
+def corpus_label(label):
+    """Label arsip (mis. '2024-ganjil') yang aman dipakai sebagai nama folder."""
+    label = secure_filename(label or "")
+    if not label:
+        raise ValueError("A corpus label is required (e.g. '2024-odd-semester')")
+    return label
+
+
+class Corpus:
+    """
+    Korpus referensi user: file dari kohort/semester sebelumnya yang disimpan
+    sebagai embedding store biasa (matriks mmap + index JSON, key '<label>/<file>').
+    Submission baru hanya dibandingkan ke korpus lewat index kandidat IVF;
+    pasangan korpus x korpus tidak pernah di-skor.
+    """
+
+    def __init__(self, base_path, snapshot):
+        self.base_path = base_path
+        self.snapshot = snapshot
+
+    @classmethod
+    def load(cls, user_id):
+        """Korpus user, atau None jika belum ada file yang diarsipkan."""
+        base_path = Config.get_user_corpus_path(user_id)
+        pull_store("embeddings", base_path + INDEX_SUFFIX)
+        try:
+            snapshot = load_embedding_store(base_path)
+        except FileNotFoundError:
+            return None
+        if not snapshot.files:
+            return None
+        return cls(base_path, snapshot)
+
+    @property
+    def snapshot_id(self):
+        return self.snapshot.snapshot_id
+
+    @property
+    def model_tag(self):
+        return self.snapshot.metadata.get("model_tag")
+
+    def __len__(self):
+        return len(self.snapshot.files)
+
+    def labels(self):
+        """Jumlah file per label arsip."""
+        counts = {}
+        for record in self.snapshot.files:
+            counts[record.get("label")] = counts.get(record.get("label"), 0) + 1
+        return counts
+
+    def display_names(self, ids):
+        names = self.snapshot.file_names
+        return [CORPUS_PREFIX + names[int(i)] for i in ids]
+
+    def content_hashes(self, ids):
+        files = self.snapshot.files
+        return [files[int(i)].get("content_hash") for i in ids]
+
+    def _index(self, transform, metric, space, n_probe):
+        """
+        Index IVF atas vektor korpus di ruang scoring (`space` = model + engine).
+        Dibangun sekali per snapshot korpus dan ruang, lalu dibaca dari disk.
+        Index ini hanya cache turunan, jadi tidak ikut di-publish ke storage bersama.
+        """
+        digest = hashlib.sha256(f"{space}\0{metric}".encode("utf-8")).hexdigest()[:16]
+        path = f"{self.base_path}.{self.snapshot_id}.{digest}.ivf.npz"
+        try:
+            with open(path, "rb") as f:
+                index = IVFIndex.load(f)
+            index.n_probe = n_probe
+            return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with timed("corpus_index_build"):
+            vectors = transform(np.asarray(self.snapshot.matrix, dtype=np.float32))
+            index = IVFIndex(n_probe=n_probe, metric=metric).fit(vectors)
+        atomic_write(path, index.save)
+        for stale in glob.glob(glob.escape(self.base_path) + ".*.ivf.npz"):
+            if stale != path and not stale.startswith(f"{self.base_path}.{self.snapshot_id}."):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        return index
+
+    @timed("corpus_candidates")
+    def candidates(self, queries, transform, metric, space, k=20, n_probe=8):
+        """
+        k tetangga korpus terdekat untuk setiap query (vektor submission baru,
+        sudah di ruang `space`). Returns (corpus_ids, left, right): corpus_ids =
+        indeks file korpus yang terlibat (unik, naik), left = indeks query,
+        right = posisi di corpus_ids.
+        """
+        index = self._index(transform, metric, space, n_probe)
+        k = min(k, len(self))
+        neighbours, _ = index.search(queries, k)
+        rows = np.repeat(np.arange(queries.shape[0], dtype=np.int32), k)
+        cols = neighbours.reshape(-1)
+        valid = cols >= 0
+        corpus_ids, right = np.unique(cols[valid], return_inverse=True)
+        return corpus_ids, rows[valid], right.astype(np.int32)
+
+
+def _save_corpus(user_id, base_path, entries, model_tag):
+    if not entries:
+        delete_embedding_store(base_path)
+        delete_store("embeddings", base_path + INDEX_SUFFIX)
+        return
+    metadata = {
+        "user_id": user_id,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "file_count": len(entries),
+        "model_tag": model_tag,
+    }
+    save_embedding_store(
+        base_path, entries, metadata, dtype=current_app.config.get("EMBEDDING_STORE_DTYPE", "float32")
+    )
+    publish_store("embeddings", base_path + INDEX_SUFFIX)
+
+
+def _entries_without(corpus, label):
+    """Entry korpus (untuk disimpan ulang) kecuali yang berlabel `label`."""
+    if corpus is None:
+        return {}
+    return {
+        record["file_name"]: {**record, "embedding": corpus.snapshot.matrix[i]}
+        for i, record in enumerate(corpus.snapshot.files)
+        if record.get("label") != label
+    }
+
+
+def _drop_label_sources(user_id, label):
+    folder = os.path.join(Config.get_user_corpus_folder(user_id), label)
+    shutil.rmtree(folder, ignore_errors=True)
+    storage = get_storage("uploads")
+    if storage.is_remote:
+        storage.delete_prefix(storage.key(folder) + "/")
+
+
+@timed("corpus_archive")
+def archive_snapshot(user_id, label, embeddings_path):
+    """
+    Arsipkan snapshot embedding user saat ini ke korpus dengan `label`.
+    Arsip dengan label yang sama diganti; source file ikut disalin agar
+    detail dan laporan pasangan korpus tetap bisa dibuka. Returns jumlah file.
+    """
+    label = corpus_label(label)
+    snapshot = load_embedding_store(embeddings_path)
+    base_path = Config.get_user_corpus_path(user_id)
+    corpus = Corpus.load(user_id)
+    model_tag = snapshot.metadata.get("model_tag")
+    if corpus is not None and corpus.model_tag != model_tag:
+        raise ValueError("The corpus was embedded with a different model; clear it before archiving")
+
+    entries = _entries_without(corpus, label)
+    _drop_label_sources(user_id, label)
+    target_folder = os.path.join(Config.get_user_corpus_folder(user_id), label)
+    os.makedirs(target_folder, exist_ok=True)
+    user_folder = Config.get_user_folder(user_id)
+    for i, record in enumerate(snapshot.files):
+        name = f"{label}/{record['file_name']}"
+        entries[name] = {
+            "embedding": snapshot.matrix[i],
+            "file_name": name,
+            "content_hash": record.get("content_hash"),
+            "label": label,
+        }
+        source = os.path.join(user_folder, record["file_name"])
+        target = os.path.join(target_folder, record["file_name"])
+        pull_file("uploads", source)
+        shutil.copyfile(source, target)
+        publish_file("uploads", target)
+
+    _save_corpus(user_id, base_path, entries, model_tag)
+    return len(snapshot.files)
+
+
+def remove_label(user_id, label):
+    """Hapus satu arsip dari korpus. Returns jumlah file yang dihapus."""
+    label = corpus_label(label)
+    corpus = Corpus.load(user_id)
+    if corpus is None:
+        return 0
+    entries = _entries_without(corpus, label)
+    removed = len(corpus) - len(entries)
+    if removed:
+        _save_corpus(user_id, corpus.base_path, entries, corpus.model_tag)
+        _drop_label_sources(user_id, label)
+    return removed
@@ -0,0 +1,348 @@
+import os
+import html
+import hashlib
+import tempfile
+from itertools import zip_longest
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.utils.corpus import source_path
+from app.utils.embedding import embedding_model_tag
+from app.utils.embedding_cache import content_hash
+from app.utils.matching import find_matching_blocks
+from app.utils.metrics import timed
+from app.utils.storage import pull_file
+
+# Naikkan jika layout laporan berubah agar entry cache lama tidak dipakai lagi
+REPORT_LAYOUT_VERSION = "1"
+REPORT_FORMATS = {"pdf": "application/pdf", "html": "text/html"}
+
+# Warna blok yang cocok; blok ke-n memakai warna yang sama di kedua sisi
+BLOCK_COLORS = ("#fde2a7", "#c9e7f8", "#d7f5c6", "#f6cfe0", "#e0d4f7", "#fbd5c0")
+PDF_CODE_COLUMN_CHARS = 78
+
+
+def read_source(path):
+    """Isi file dengan fallback encoding (sama seperti tampilan detail di UI)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    for encoding in ("utf-8", "latin1"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def report_cache_key(row, content_1, content_2, model_version, fmt):
+    """
+    Key = hash konten kedua file + versi model + skor yang ditampilkan (+ nama
+    file, format, versi layout). Upload ulang file yang sama atau check ulang
+    dengan model yang sama memakai laporan yang sudah dirender, walau file
+    lain di kohort berubah.
+    """
+    scores = [
+        f"{row[name]:.2f}" if name in row else ""
+        for name in ("similarity", "fingerprint_similarity", "structural_similarity")
+    ]
+    parts = [
+        REPORT_LAYOUT_VERSION, fmt, model_version or "",
+        row["file_1"], row["file_2"], content_hash(content_1), content_hash(content_2), *scores,
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    Cache laporan detail yang sudah dirender di disk, content-addressed seperti
+    EmbeddingCache: `<key[:2]>/<key>.<format>`, hit menyentuh mtime dan prune()
+    membuang entry yang paling lama tidak dipakai di atas `max_entries`.
+    """
+
+    def __init__(self, root, max_entries=0):
+        self.root = root
+        self.max_entries = max_entries
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key, fmt):
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, fmt):
+        path = self.path(key, fmt)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, fmt, write):
+        """Render lewat write(file) ke file sementara lalu rename; returns path entry."""
+        path = self.path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def prune(self):
+        """Hapus entry LRU di atas `max_entries`; 0 = tanpa batas."""
+        if not self.max_entries:
+            return 0
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".tmp"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        removed = 0
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def get_report_cache(config):
+    return ReportCache(config["REPORT_CACHE_FOLDER"], max_entries=config.get("REPORT_CACHE_MAX_ENTRIES", 0))
+
+
+def report_model_version(result_set, config):
+    """
+    Versi model untuk key cache: `<path>:<mtime>` model Siamese dari signature
+    result set + tag model embedding. Bagian strategi/fingerprint/korpus dari
+    signature tidak ikut karena berubah setiap kali kohort berubah.
+    """
+    signature = result_set.info.get("model_signature") or ""
+    return f"{signature.split('|', 1)[0]}|{embedding_model_tag(config)}"
+
+
+def model_label(model_signature):
+    """Nama file model dari signature result set (`<path>:<mtime>|<strategi>`) untuk ditampilkan."""
+    if not model_signature:
+        return None
+    path = model_signature.split("|", 1)[0].rsplit(":", 1)[0]
+    return os.path.basename(path)
+
+
+def _line_colors(blocks, side):
+    """Indeks baris (0-based) -> warna blok untuk file 1 (side=1) atau file 2 (side=2)."""
+    colors = {}
+    for n, block in enumerate(blocks):
+        color = BLOCK_COLORS[n % len(BLOCK_COLORS)]
+        start = block["file1_line"] if side == 1 else block["file2_line"]
+        length = block["length"] if side == 1 else block["file2_length"]
+        for line in range(start, start + length):
+            colors[line] = color
+    return colors
+
+
+def _similarity_lines(row):
+    lines = [f"Similarity: {row['similarity']:.2f}%"]
+    if "fingerprint_similarity" in row:
+        lines.append(f"Token overlap: {row['fingerprint_similarity']:.2f}%")
+    if "structural_similarity" in row:
+        lines.append(f"Structural similarity: {row['structural_similarity']:.2f}%")
+    return lines
+
+
+def _block_ranges(blocks):
+    return [
+        (n + 1, f"{b['file1_line'] + 1}-{b['file1_line'] + b['length']}",
+         f"{b['file2_line'] + 1}-{b['file2_line'] + b['file2_length']}", b["length"])
+        for n, b in enumerate(blocks)
+    ]
+
+
+def render_html(output, row, content_1, content_2, blocks, model_version):
+    """Laporan HTML mandiri (CSS inline): kedua file berdampingan, blok cocok diwarnai."""
+    def code_cells(content, side):
+        colors = _line_colors(blocks, side)
+        cells = []
+        for number, line in enumerate(content.split("\n")):
+            style = f' style="background:{colors[number]}"' if number in colors else ""
+            cells.append(f'<tr{style}><td class="ln">{number + 1}</td><td class="code">{html.escape(line)}</td></tr>')
+        return "\n".join(cells)
+
+    block_rows = "\n".join(
+        f'<tr style="background:{BLOCK_COLORS[(n - 1) % len(BLOCK_COLORS)]}"><td>{n}</td><td>{lines_1}</td>'
+        f'<td>{lines_2}</td><td>{length}</td></tr>'
+        for n, lines_1, lines_2, length in _block_ranges(blocks)
+    )
+    file_1, file_2 = html.escape(row["file_1"]), html.escape(row["file_2"])
+    document = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{file_1} vs {file_2}</title>
+<style>
+body {{ font-family: sans-serif; margin: 24px; }}
+.sides {{ display: flex; gap: 16px; align-items: flex-start; }}
+.side {{ flex: 1; min-width: 0; overflow-x: auto; }}
+table.src {{ border-collapse: collapse; width: 100%; font-family: monospace; font-size: 12px; }}
+td.ln {{ color: #888; text-align: right; padding-right: 8px; user-select: none; width: 1%; }}
+td.code {{ white-space: pre; }}
+table.blocks {{ border-collapse: collapse; margin-bottom: 16px; }}
+table.blocks td, table.blocks th {{ border: 1px solid #999; padding: 2px 8px; }}
+</style></head><body>
+<h1>CodeScan Detailed Comparison</h1>
+<p><b>{file_1}</b> vs <b>{file_2}</b><br>{"<br>".join(_similarity_lines(row))}<br>
+Model: {html.escape(model_version or "-")}</p>
+<h2>Matching blocks ({len(blocks)})</h2>
+<table class="blocks"><tr><th>#</th><th>{file_1} lines</th><th>{file_2} lines</th><th>Length</th></tr>
+{block_rows}
+</table>
+<div class="sides">
+<div class="side"><h3>{file_1}</h3><table class="src">
+{code_cells(content_1, 1)}
+</table></div>
+<div class="side"><h3>{file_2}</h3><table class="src">
+{code_cells(content_2, 2)}
+</table></div>
+</div>
+</body></html>
+"""
+    output.write(document.encode("utf-8"))
+
+
+def _wrapped_lines(content, colors, width):
+    """(nomor baris atau '', potongan teks, warna) per baris tampilan; baris panjang dipecah."""
+    rows = []
+    for number, line in enumerate(content.split("\n")):
+        line = line.expandtabs(4)
+        pieces = [line[i:i + width] for i in range(0, len(line), width)] or [""]
+        for n, piece in enumerate(pieces):
+            rows.append((str(number + 1) if n == 0 else "", piece, colors.get(number)))
+    return rows
+
+
+def render_pdf(output, row, content_1, content_2, blocks, model_version, chunk_rows=200):
+    """
+    Laporan PDF landscape: ringkasan, daftar blok cocok, lalu kedua file
+    berdampingan per tabel `chunk_rows` baris dengan blok cocok diwarnai.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+
+    doc = SimpleDocTemplate(
+        output, pagesize=landscape(A4), leftMargin=0.5 * inch, rightMargin=0.5 * inch,
+        topMargin=0.5 * inch, bottomMargin=0.5 * inch
+    )
+    styles = getSampleStyleSheet()
+    file_1, file_2 = html.escape(row["file_1"]), html.escape(row["file_2"])
+    story = [
+        Paragraph("CodeScan Detailed Comparison", styles["Heading1"]),
+        Paragraph(
+            f"<b>{file_1}</b> vs <b>{file_2}</b><br/>" + "<br/>".join(_similarity_lines(row))
+            + f"<br/>Model: {html.escape(model_version or '-')}", styles["Normal"]
+        ),
+        Spacer(1, 12),
+        Paragraph(f"Matching blocks ({len(blocks)})", styles["Heading2"]),
+    ]
+    grid = [
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+    ]
+    if blocks:
+        block_data = [["#", f"{row['file_1'][:40]} lines", f"{row['file_2'][:40]} lines", "Length"]]
+        commands = list(grid)
+        for n, lines_1, lines_2, length in _block_ranges(blocks):
+            block_data.append([str(n), lines_1, lines_2, str(length)])
+            color = colors.HexColor(BLOCK_COLORS[(n - 1) % len(BLOCK_COLORS)])
+            commands.append(("BACKGROUND", (0, n), (-1, n), color))
+        table = Table(block_data, colWidths=[0.5 * inch, 2.5 * inch, 2.5 * inch, 0.8 * inch], repeatRows=1)
+        table.setStyle(TableStyle(commands))
+        story.append(table)
+    story.append(Spacer(1, 12))
+
+    left = _wrapped_lines(content_1, _line_colors(blocks, 1), PDF_CODE_COLUMN_CHARS)
+    right = _wrapped_lines(content_2, _line_colors(blocks, 2), PDF_CODE_COLUMN_CHARS)
+    pairs = list(zip_longest(left, right, fillvalue=("", "", None)))
+    header = ["", row["file_1"][:PDF_CODE_COLUMN_CHARS], "", row["file_2"][:PDF_CODE_COLUMN_CHARS]]
+    code_style = grid[1:] + [
+        ("FONTNAME", (0, 1), (-1, -1), "Courier"),
+        ("FONTSIZE", (0, 1), (-1, -1), 7),
+        ("TEXTCOLOR", (0, 1), (0, -1), colors.grey),
+        ("TEXTCOLOR", (2, 1), (2, -1), colors.grey),
+        ("ALIGN", (0, 0), (0, -1), "RIGHT"),
+        ("ALIGN", (2, 0), (2, -1), "RIGHT"),
+        ("LINEAFTER", (1, 0), (1, -1), 1, colors.black),
+        ("TOPPADDING", (0, 1), (-1, -1), 0),
+        ("BOTTOMPADDING", (0, 1), (-1, -1), 0),
+    ]
+    for start in range(0, len(pairs), chunk_rows):
+        chunk = pairs[start:start + chunk_rows]
+        table_data = [header]
+        commands = list(code_style)
+        for i, (left_row, right_row) in enumerate(chunk, 1):
+            table_data.append([left_row[0], left_row[1], right_row[0], right_row[1]])
+            for column, color in ((0, left_row[2]), (2, right_row[2])):
+                if color:
+                    commands.append(("BACKGROUND", (column, i), (column + 1, i), colors.HexColor(color)))
+        table = Table(table_data, colWidths=[0.4 * inch, 4.95 * inch, 0.4 * inch, 4.95 * inch], repeatRows=1)
+        table.setStyle(TableStyle(commands))
+        story.append(table)
+
+    doc.build(story)
+
+
+RENDERERS = {"pdf": render_pdf, "html": render_html}
+
+
+@timed("detailed_report")
+def get_pair_report(cache, row, content_1, content_2, model_version, fmt, prune=True):
+    """Path laporan di cache; blok cocok dicari dan laporan dirender hanya saat miss."""
+    key = report_cache_key(row, content_1, content_2, model_version, fmt)
+    path = cache.get(key, fmt)
+    if path is not None:
+        return path
+    blocks = find_matching_blocks(content_1, content_2)
+    label = model_label(model_version)
+    path = cache.put(key, fmt, lambda f: RENDERERS[fmt](f, row, content_1, content_2, blocks, label))
+    if prune:
+        cache.prune()
+    return path
+
+
+def render_user_pair(cache, user_id, result_set, index, fmt, prune=True):
+    """Laporan detail pasangan ke-`index` dari result set user (file diambil dari storage)."""
+    row = result_set.row(index)
+    contents = []
+    for name in (row["file_1"], row["file_2"]):
+        path = source_path(user_id, name)
+        pull_file("uploads", path)
+        contents.append(read_source(path))
+    model_version = report_model_version(result_set, current_app.config)
+    return get_pair_report(cache, row, contents[0], contents[1], model_version, fmt, prune=prune)
+
+
+def render_user_pairs(app, cache, user_id, result_set, indices, fmt, workers=4):
+    """
+    Render banyak laporan dengan worker pool berukuran tetap. Yield (index, path)
+    sesuai urutan `indices`; hanya path yang ditahan, isi laporan tetap di disk.
+    Cache baru di-prune setelah semua laporan dipakai agar tidak ada path yang
+    terhapus sebelum dibaca pemanggil.
+    """
+    def render(index):
+        with app.app_context():
+            return render_user_pair(cache, user_id, result_set, index, fmt, prune=False)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="codescan-report") as executor:
+        yield from zip(indices, executor.map(render, indices))
+    cache.prune()
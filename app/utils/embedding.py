@@ -1,9 +1,25 @@
 import os
-import json
+import time
 import datetime
 from pathlib import Path
 import numpy as np
 from flask import current_app
+from app.utils.embedding_store import save_embedding_store, read_snapshot_id, store_base_path, INDEX_SUFFIX
+from app.utils.embedding_cache import EmbeddingCache, normalize_source, content_hash, cache_key
+from app.utils.storage import pull_store, publish_store
+from app.utils.metrics import timed, FILES_EMBEDDED
+
+# Tag versi model/pooling; ubah jika cara menghasilkan embedding berubah
+EMBEDDING_MODEL_TAG = "microsoft/codebert-base:cls-l2:v1"
+
+def embedding_model_tag(config) -> str:
+    """Tag efektif; mode chunked menghasilkan vektor berbeda sehingga cache-nya terpisah."""
+    if not config.get("EMBEDDING_CHUNKING", False):
+        return EMBEDDING_MODEL_TAG
+    return (
+        f"{EMBEDDING_MODEL_TAG}:chunked-w{config.get('EMBEDDING_CHUNK_TOKENS', 510)}"
+        f"-o{config.get('EMBEDDING_CHUNK_OVERLAP', 128)}"
+    )
 
 # Lazy globals
 _tokenizer = None
@@ -25,6 +41,12 @@ def _initialize_model():
     except Exception as e:
         raise RuntimeError(f"Failed to initialize model: {e}")
 
+def get_embedding_cache() -> EmbeddingCache:
+    return EmbeddingCache(
+        current_app.config["EMBEDDING_CACHE_FOLDER"],
+        max_entries=current_app.config.get("EMBEDDING_CACHE_MAX_ENTRIES", 0),
+    )
+
 def _iter_python_files(root_dir: str):
     """Iterasi semua .py, skip AppleDouble/hidden files, dan subfolder."""
     for p in Path(root_dir).rglob("*.py"):
@@ -43,6 +65,7 @@ def _read_text_robust(path: Path) -> str:
             continue
     return data.decode("utf-8", errors="ignore")
 
+@timed("get_embedding_from_code")
 def get_embedding_from_code(code_string: str):
     try:
         _initialize_model()
@@ -76,9 +99,284 @@ def get_embedding_from_code(code_string: str):
         current_app.logger.error(f"Embedding error: {e}")
         raise
 
-def extract_and_save_embeddings(folder_path: str, output_json_path: str, user_id: str | None = None):
+def _make_token_batches(lengths: list[int], max_batch_tokens: int) -> list[list[int]]:
+    """
+    Kelompokkan indeks file (urut panjang token) ke batch dengan padding dinamis.
+    Biaya batch = panjang terpanjang x jumlah file, dijaga <= max_batch_tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch, batch_max = [], [], 0
+    for i in order:
+        new_max = max(batch_max, lengths[i])
+        if batch and new_max * (len(batch) + 1) > max_batch_tokens:
+            batches.append(batch)
+            batch, new_max = [], lengths[i]
+        batch.append(i)
+        batch_max = new_max
+    if batch:
+        batches.append(batch)
+    return batches
+
+def _embed_texts_batched(texts: list[str], max_batch_tokens: int, num_threads: int | None, progress=None):
     """
-    Extract code embeddings from Python files and save them to a JSON file.
+    Inti batching: vektor CLS ter-normalisasi (np.ndarray) atau None per teks.
+    `progress(fraction)` dipanggil setelah setiap batch (opsional).
+    """
+    _initialize_model()
+    import torch
+
+    if num_threads and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+    results = [None] * len(texts)
+    valid = [i for i, c in enumerate(texts) if c and isinstance(c, str)]
+    if not valid:
+        return results
+
+    encoded = _tokenizer(
+        [texts[i] for i in valid],
+        truncation=True,
+        padding=False,
+        max_length=512,
+    )
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+
+    batches = _make_token_batches(lengths, max_batch_tokens)
+    done = 0
+    for batch in batches:
+        inputs = _tokenizer.pad(
+            {
+                "input_ids": [encoded["input_ids"][k] for k in batch],
+                "attention_mask": [encoded["attention_mask"][k] for k in batch],
+            },
+            return_tensors="pt",
+        )
+        with torch.inference_mode():
+            outputs = _model(**inputs)
+            # ambil CLS (token pertama)
+            vecs = outputs.last_hidden_state[:, 0, :].numpy()
+
+        norms = np.linalg.norm(vecs, axis=1)
+        for k, vec, norm in zip(batch, vecs, norms):
+            if norm > 0:
+                results[valid[k]] = vec / norm
+
+        done += len(batch)
+        if progress is not None:
+            progress(done / len(valid))
+
+    return results
+
+@timed("embed_batched")
+def get_embeddings_batched(
+    code_strings: list[str],
+    max_batch_tokens: int = 8192,
+    num_threads: int | None = None,
+    progress=None,
+):
+    """
+    Versi batch dari get_embedding_from_code untuk banyak file sekaligus.
+
+    File diurutkan berdasarkan panjang token lalu dipadding per batch
+    (bukan ke 512), dijalankan di bawah torch.inference_mode(). Hasilnya
+    vektor CLS ter-normalisasi L2 yang sama, dengan urutan sesuai input;
+    input kosong/invalid atau embedding nol menghasilkan None.
+    """
+    vectors = _embed_texts_batched(code_strings, max_batch_tokens, num_threads, progress)
+    return [vec.tolist() if vec is not None else None for vec in vectors]
+
+def _split_windows(code: str, window_tokens: int, overlap_tokens: int) -> list[tuple[int, int]]:
+    """
+    Bagi file menjadi jendela baris [start, end) yang masing-masing muat
+    dalam `window_tokens` token, dengan tumpang tindih kira-kira `overlap_tokens`.
+    Jendela berbasis baris agar chunk bisa dipetakan balik ke nomor baris.
+    """
+    lines = code.split("\n")
+    # +1 untuk token newline yang hilang saat baris ditokenisasi terpisah
+    counts = [len(ids) + 1 for ids in _tokenizer(lines, add_special_tokens=False)["input_ids"]]
+
+    windows = []
+    start = 0
+    while start < len(lines):
+        end, total = start, 0
+        while end < len(lines) and (end == start or total + counts[end] <= window_tokens):
+            total += counts[end]
+            end += 1
+        windows.append((start, end))
+        if end >= len(lines):
+            break
+        # Mundur beberapa baris untuk overlap, tapi selalu maju minimal satu baris
+        back, kept = end, 0
+        while back - 1 > start and kept + counts[back - 1] <= overlap_tokens:
+            back -= 1
+            kept += counts[back]
+        start = back
+    return windows
+
+@timed("embed_chunked")
+def get_embeddings_chunked(
+    code_strings: list[str],
+    window_tokens: int = 510,
+    overlap_tokens: int = 128,
+    max_batch_tokens: int = 8192,
+    num_threads: int | None = None,
+    progress=None,
+):
+    """
+    Embedding untuk file panjang: setiap file dipecah menjadi jendela yang
+    tumpang tindih, semua jendela dari semua file di-embed dalam satu pass
+    batch, lalu di-mean-pool (dan dinormalisasi ulang) menjadi vektor per file.
+
+    Returns per input: None atau dict {"embedding": [...], "chunks": [
+    {"start_line", "end_line", "embedding"}, ...]} (end_line eksklusif,
+    0-based). File yang muat dalam satu jendela menghasilkan vektor yang
+    sama dengan get_embeddings_batched.
+    """
+    _initialize_model()
+
+    results = [None] * len(code_strings)
+    texts, owners = [], []
+    for i, code in enumerate(code_strings):
+        if not code or not isinstance(code, str):
+            continue
+        lines = code.split("\n")
+        for start, end in _split_windows(code, window_tokens, overlap_tokens):
+            texts.append("\n".join(lines[start:end]))
+            owners.append((i, start, end))
+
+    vectors = _embed_texts_batched(texts, max_batch_tokens, num_threads, progress)
+
+    chunks_by_file: dict[int, list] = {}
+    for (i, start, end), vec in zip(owners, vectors):
+        if vec is not None:
+            chunks_by_file.setdefault(i, []).append((start, end, vec))
+
+    for i, chunks in chunks_by_file.items():
+        pooled = np.mean([vec for _, _, vec in chunks], axis=0)
+        norm = np.linalg.norm(pooled)
+        if norm == 0:
+            continue
+        results[i] = {
+            "embedding": (pooled / norm).tolist(),
+            "chunks": [
+                {"start_line": start, "end_line": end, "embedding": vec.tolist()}
+                for start, end, vec in chunks
+            ],
+        }
+    return results
+
+@timed("embed_files")
+def embed_files(files, progress=None, user_context: str = ""):
+    """
+    Hash files, reuse cached embeddings, and embed only new/changed ones into the
+    content-addressed cache. Returns (entries with a valid embedding, model_tag).
+    Also used right after an upload to warm the cache before the first check.
+    """
+    cache = get_embedding_cache()
+    config = current_app.config
+    chunking = config.get("EMBEDDING_CHUNKING", False)
+    model_tag = embedding_model_tag(config)
+    hits = misses = 0
+
+    # PROSES FILE: hanya file baru/berubah yang masuk ke transformer
+    entries: dict[str, dict] = {}
+    pending = []
+    for n, p in enumerate(files, 1):
+        if progress is not None and n % 50 == 0:
+            progress(0.1 * n / len(files))
+        try:
+            code = normalize_source(_read_text_robust(p))
+            source_hash = content_hash(code)
+            key = cache_key(source_hash, model_tag)
+
+            entries[p.name] = {
+                "embedding": None,
+                "file_path": str(p),
+                "file_name": p.name,
+                "content_hash": source_hash,
+            }
+            emb = cache.get(key)
+            cached_chunks = cache.get_chunks(key) if chunking and emb is not None else None
+            if emb is not None and (not chunking or cached_chunks is not None):
+                entries[p.name]["embedding"] = emb.tolist()
+                if cached_chunks is not None:
+                    vectors, spans = cached_chunks
+                    entries[p.name]["chunks"] = [
+                        {"start_line": int(a), "end_line": int(b), "embedding": v.tolist()}
+                        for (a, b), v in zip(spans, vectors)
+                    ]
+                hits += 1
+            else:
+                pending.append((p.name, code, key))
+        except Exception as e:
+            current_app.logger.error(f"Failed to process {p.name} {user_context}: {e}")
+            continue
+
+    batch_kwargs = {
+        "max_batch_tokens": config.get("EMBEDDING_MAX_BATCH_TOKENS", 8192),
+        "num_threads": config.get("TORCH_NUM_THREADS") or None,
+        "progress": (lambda f: progress(0.1 + 0.9 * f)) if progress is not None else None,
+    }
+    started = time.perf_counter()
+    if pending and chunking:
+        outputs = get_embeddings_chunked(
+            [code for _, code, _ in pending],
+            window_tokens=config.get("EMBEDDING_CHUNK_TOKENS", 510),
+            overlap_tokens=config.get("EMBEDDING_CHUNK_OVERLAP", 128),
+            **batch_kwargs,
+        )
+    elif pending and config.get("EMBEDDING_BATCH_MODE", True):
+        outputs = get_embeddings_batched([code for _, code, _ in pending], **batch_kwargs)
+    else:
+        outputs = []
+        for n, (name, code, _) in enumerate(pending, 1):
+            if progress is not None:
+                progress(0.1 + 0.9 * n / len(pending))
+            try:
+                outputs.append(get_embedding_from_code(code))
+            except Exception:
+                outputs.append(None)
+
+    chunk_count = 0
+    for (name, _, key), output in zip(pending, outputs):
+        if output is None:
+            current_app.logger.error(f"Failed to process {name} {user_context}: no valid embedding")
+            continue
+        if chunking:
+            chunks = output["chunks"]
+            cache.put_chunks(
+                key,
+                [c["embedding"] for c in chunks],
+                [(c["start_line"], c["end_line"]) for c in chunks],
+            )
+            entries[name]["chunks"] = chunks
+            chunk_count += len(chunks)
+            output = output["embedding"]
+        cache.put(key, output)
+        entries[name]["embedding"] = output
+        misses += 1
+
+    if pending:
+        mode = f"chunked ({chunk_count} windows)" if chunking else "single-window"
+        current_app.logger.info(
+            f"Embedded {misses} files {user_context} in {time.perf_counter() - started:.2f}s, mode {mode}"
+        )
+
+    embeddings_dict = {name: e for name, e in entries.items() if e["embedding"] is not None}
+
+    current_app.logger.info(f"Embedding cache {user_context}: {hits} hits, {misses} computed")
+    FILES_EMBEDDED.inc(hits, source="cache")
+    FILES_EMBEDDED.inc(misses, source="model")
+    if misses:
+        cache.prune()
+    return embeddings_dict, model_tag
+
+@timed("extract_and_save_embeddings")
+def extract_and_save_embeddings(folder_path: str, output_path: str, user_id: str | None = None, progress=None):
+    """
+    Extract code embeddings from Python files and save them to the binary embedding store.
+    `progress(fraction)` (optional) is called as files are hashed and embedded;
+    it may raise to abort the extraction (e.g. job cancellation).
     """
     user_context = f"for user {user_id}" if user_id else ""  # definisikan di luar try agar aman di except
 
@@ -88,46 +386,39 @@ def extract_and_save_embeddings(folder_path: str, output_json_path: str, user_id
         if not os.path.exists(folder_path):
             raise FileNotFoundError(f"Folder not found: {folder_path}")
 
-        embeddings_dict: dict[str, dict] = {}
-
         files = list(_iter_python_files(folder_path))
         if not files:
             raise ValueError(f"No Python files found in the folder {user_context}")
 
         current_app.logger.info(f"Processing {len(files)} Python files {user_context}")
 
-        # PROSES FILE
-        for p in files:
-            try:
-                code = _read_text_robust(p)
-                emb = get_embedding_from_code(code)
-                if emb is not None:
-                    embeddings_dict[p.name] = {
-                        "embedding": emb,
-                        "file_path": str(p),
-                        "file_name": p.name,
-                    }
-            except Exception as e:
-                current_app.logger.error(f"Failed to process {p.name} {user_context}: {e}")
-                continue
+        config = current_app.config
+        embeddings_dict, model_tag = embed_files(files, progress=progress, user_context=user_context)
 
         if not embeddings_dict:
             raise ValueError(f"No valid embeddings generated {user_context}")
 
-        # Simpan JSON
-        os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
-        output_data = {
-            "metadata": {
-                "user_id": user_id,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "file_count": len(embeddings_dict),
-            },
-            "embeddings": embeddings_dict,
+        # Simpan ke store biner (.npy + index JSON kecil)
+        metadata = {
+            "user_id": user_id,
+            "timestamp": datetime.datetime.now().isoformat(),
+            "file_count": len(embeddings_dict),
+            "model_tag": model_tag,
         }
-        with open(output_json_path, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        # Snapshot terbaru dari storage bersama (host lain mungkin sudah menyimpannya)
+        index_path = store_base_path(output_path) + INDEX_SUFFIX
+        pull_store("embeddings", index_path)
+        previous_id = read_snapshot_id(output_path)
+        snapshot_id = save_embedding_store(
+            output_path,
+            embeddings_dict,
+            metadata,
+            dtype=config.get("EMBEDDING_STORE_DTYPE", "float32"),
+        )
+        if snapshot_id != previous_id:
+            publish_store("embeddings", index_path)
 
-        current_app.logger.info(f"Successfully saved {len(embeddings_dict)} embeddings to {output_json_path}")
+        current_app.logger.info(f"Successfully saved {len(embeddings_dict)} embeddings to {output_path}")
         return embeddings_dict
 
     except Exception as e:
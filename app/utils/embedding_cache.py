@@ -0,0 +1,115 @@
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+
+def normalize_source(code: str) -> str:
+    """Normalisasi ringan: BOM, line ending, dan trailing whitespace per baris."""
+    code = code.lstrip("\ufeff").replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in code.split("\n")).strip("\n")
+
+
+def content_hash(normalized_code: str) -> str:
+    """SHA-256 dari source yang sudah dinormalisasi (independen dari model)."""
+    return hashlib.sha256(normalized_code.encode("utf-8")).hexdigest()
+
+
+def cache_key(source_hash: str, model_tag: str) -> str:
+    """Key cache = hash konten + tag versi model, agar ganti model = cache baru."""
+    return hashlib.sha256(f"{model_tag}\0{source_hash}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache embedding content-addressed di disk, dipakai bersama semua user.
+
+    Setiap entry disimpan sebagai `<key[:2]>/<key>.npy`. Hit akan menyentuh
+    mtime file sehingga prune() bisa membuang entry yang paling lama tidak
+    dipakai ketika jumlahnya melebihi `max_entries`.
+    """
+
+    def __init__(self, root: str, max_entries: int = 0):
+        self.root = root
+        self.max_entries = max_entries
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.npy")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            vec = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return vec
+
+    def _write_atomic(self, path: str, write) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Tulis ke file sementara lalu rename agar pembaca tidak melihat file setengah jadi
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, key: str, vec, dtype=np.float32) -> None:
+        self._write_atomic(
+            self._path(key),
+            lambda f: np.save(f, np.asarray(vec, dtype=dtype), allow_pickle=False),
+        )
+
+    def get_chunks(self, key: str):
+        """Vektor per-chunk (k x dim) dan span baris (k x 2), atau None."""
+        try:
+            with np.load(self._path(key)[:-4] + ".chunks.npz", allow_pickle=False) as data:
+                return data["vectors"], data["spans"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put_chunks(self, key: str, vectors, spans) -> None:
+        self._write_atomic(
+            self._path(key)[:-4] + ".chunks.npz",
+            lambda f: np.savez(
+                f,
+                vectors=np.asarray(vectors, dtype=np.float32),
+                spans=np.asarray(spans, dtype=np.int32),
+            ),
+        )
+
+    def prune(self) -> int:
+        """Hapus entry LRU di atas `max_entries`; 0 = tanpa batas."""
+        if not self.max_entries:
+            return 0
+        entries = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".npy"):
+                    entries.append((entry.stat().st_mtime, entry.path))
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        removed = 0
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+            chunks_path = path[:-4] + ".chunks.npz"
+            if os.path.exists(chunks_path):
+                os.remove(chunks_path)
+        return removed
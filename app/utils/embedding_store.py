@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import hashlib
+import glob
+import tempfile
+
+import numpy as np
+
+from app.utils.metrics import timed
+
+INDEX_SUFFIX = ".index.json"
+LEGACY_SUFFIX = ".json"
+STORE_FORMAT = 1
+
+
+def store_base_path(path: str) -> str:
+    """Terima base path, path index, atau path JSON lama; kembalikan base path."""
+    for suffix in (INDEX_SUFFIX, ".npy", LEGACY_SUFFIX):
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def atomic_write(path: str, write, mode: str = "wb") -> None:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class EmbeddingSnapshot:
+    """Satu snapshot embedding user: matriks (N x dim) + metadata per file."""
+
+    def __init__(self, matrix, files, metadata, snapshot_id, chunk_matrix=None):
+        self.matrix = matrix
+        self.files = files
+        self.metadata = metadata
+        self.snapshot_id = snapshot_id
+        self.chunk_matrix = chunk_matrix
+
+    @property
+    def file_names(self):
+        return [f["file_name"] for f in self.files]
+
+    def chunks_for(self, i):
+        """Vektor chunk dan span baris untuk file ke-i (None jika mode chunked mati)."""
+        info = self.files[i].get("chunks")
+        if info is None or self.chunk_matrix is None:
+            return None
+        start = info["offset"]
+        return self.chunk_matrix[start:start + len(info["spans"])], info["spans"]
+
+
+@timed("save_embedding_store")
+def save_embedding_store(base_path: str, embeddings_dict: dict, metadata: dict, dtype: str = "float32") -> str:
+    """
+    Simpan embedding sebagai matriks .npy + sidecar index JSON kecil.
+
+    File data diberi nama unik per snapshot dan index ditulis terakhir
+    (atomic rename), sehingga pembaca selalu melihat snapshot lama atau
+    baru secara utuh. File data snapshot lama dihapus setelah index diganti.
+    snapshot_id adalah fingerprint isi (nama file + content_hash + tag
+    model), jadi menyimpan isi yang sama tidak menulis ulang apa pun.
+    Returns snapshot_id.
+    """
+    base_path = store_base_path(base_path)
+    names = list(embeddings_dict.keys())
+    snapshot_id = snapshot_fingerprint(embeddings_dict, metadata, dtype)
+    if snapshot_id is not None and read_snapshot_id(base_path) == snapshot_id:
+        # Isi tidak berubah: snapshot lama tetap berlaku (dan hasil yang terikat padanya)
+        return snapshot_id
+    snapshot_id = snapshot_id or uuid.uuid4().hex[:16]
+
+    matrix = np.asarray([embeddings_dict[n]["embedding"] for n in names], dtype=dtype)
+    data_path = f"{base_path}.{snapshot_id}.npy"
+    atomic_write(data_path, lambda f: np.save(f, matrix, allow_pickle=False))
+
+    files = []
+    chunk_rows = []
+    for n in names:
+        entry = embeddings_dict[n]
+        record = {k: v for k, v in entry.items() if k not in ("embedding", "chunks")}
+        record["file_name"] = entry.get("file_name", n)
+        chunks = entry.get("chunks")
+        if chunks:
+            record["chunks"] = {
+                "offset": len(chunk_rows),
+                "spans": [[c["start_line"], c["end_line"]] for c in chunks],
+            }
+            chunk_rows.extend(c["embedding"] for c in chunks)
+        files.append(record)
+
+    chunks_file = None
+    if chunk_rows:
+        chunks_file = f"{os.path.basename(base_path)}.{snapshot_id}.chunks.npy"
+        chunk_matrix = np.asarray(chunk_rows, dtype=dtype)
+        atomic_write(
+            os.path.join(os.path.dirname(base_path), chunks_file),
+            lambda f: np.save(f, chunk_matrix, allow_pickle=False),
+        )
+
+    index = {
+        "format": STORE_FORMAT,
+        "snapshot_id": snapshot_id,
+        "dtype": dtype,
+        "shape": list(matrix.shape),
+        "data_file": os.path.basename(data_path),
+        "chunks_file": chunks_file,
+        "metadata": metadata,
+        "files": files,
+    }
+    atomic_write(
+        base_path + INDEX_SUFFIX,
+        lambda f: json.dump(index, f, ensure_ascii=False),
+        mode="w",
+    )
+    _remove_stale_data_files(base_path, keep={index["data_file"], chunks_file})
+    return snapshot_id
+
+
+def snapshot_fingerprint(embeddings_dict: dict, metadata: dict, dtype: str):
+    """Hash deterministik isi snapshot; None jika ada entry tanpa content_hash."""
+    digest = hashlib.sha256(f"{metadata.get('model_tag')}\0{dtype}".encode("utf-8"))
+    for name, entry in embeddings_dict.items():
+        source_hash = entry.get("content_hash")
+        if not source_hash:
+            return None
+        digest.update(f"\0{name}\0{source_hash}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def read_snapshot_id(path: str):
+    """snapshot_id dari index tanpa memuat matriks; None jika belum ada store."""
+    try:
+        with open(store_base_path(path) + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            return json.load(f).get("snapshot_id")
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale_data_files(base_path: str, keep: set) -> None:
+    pattern = glob.escape(base_path) + ".*.npy"
+    for path in glob.glob(pattern):
+        if os.path.basename(path) not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _load_legacy_json(path: str):
+    """Baca format JSON lama (dengan atau tanpa metadata) ke embeddings_dict."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    metadata = data.get("metadata", {}) if "embeddings" in data else {}
+    embeddings_data = data["embeddings"] if "embeddings" in data else data
+
+    embeddings_dict = {}
+    for name, value in embeddings_data.items():
+        if isinstance(value, dict) and "embedding" in value:
+            embeddings_dict[name] = {"file_name": name, **value}
+        else:
+            embeddings_dict[name] = {"embedding": value, "file_name": name}
+    return embeddings_dict, metadata
+
+
+def migrate_legacy_json(base_path: str, dtype: str = "float32") -> bool:
+    """Konversi sekali jalan embeddings_<uid>.json ke format biner, lalu hapus JSON-nya."""
+    base_path = store_base_path(base_path)
+    legacy_path = base_path + LEGACY_SUFFIX
+    if not os.path.exists(legacy_path) or os.path.exists(base_path + INDEX_SUFFIX):
+        return False
+    embeddings_dict, metadata = _load_legacy_json(legacy_path)
+    metadata = {**metadata, "migrated_from": os.path.basename(legacy_path)}
+    save_embedding_store(base_path, embeddings_dict, metadata, dtype=dtype)
+    os.remove(legacy_path)
+    return True
+
+
+@timed("load_embeddings")
+def load_embedding_store(path: str, mmap: bool = True) -> EmbeddingSnapshot:
+    """
+    Muat snapshot embedding. Matriks dibuka memory-mapped (read-only) secara
+    default; format JSON lama dimigrasikan otomatis pada akses pertama.
+    """
+    base_path = store_base_path(path)
+    index_path = base_path + INDEX_SUFFIX
+
+    if not os.path.exists(index_path):
+        if not migrate_legacy_json(base_path):
+            # JSON di path lain (bukan pola base + .json): baca langsung tanpa migrasi
+            if path.endswith(LEGACY_SUFFIX) and os.path.exists(path):
+                embeddings_dict, metadata = _load_legacy_json(path)
+                names = list(embeddings_dict.keys())
+                matrix = np.asarray([embeddings_dict[n]["embedding"] for n in names], dtype=np.float32)
+                files = [{k: v for k, v in embeddings_dict[n].items() if k != "embedding"} for n in names]
+                return EmbeddingSnapshot(matrix, files, metadata, snapshot_id=None)
+            raise FileNotFoundError(f"Embeddings not found: {base_path}")
+
+    directory = os.path.dirname(base_path)
+    mmap_mode = "r" if mmap else None
+    for attempt in range(2):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        try:
+            matrix = np.load(os.path.join(directory, index["data_file"]), mmap_mode=mmap_mode, allow_pickle=False)
+            chunk_matrix = None
+            if index.get("chunks_file"):
+                chunk_matrix = np.load(
+                    os.path.join(directory, index["chunks_file"]), mmap_mode=mmap_mode, allow_pickle=False
+                )
+            break
+        except FileNotFoundError:
+            # Snapshot diganti writer lain di antara baca index dan baca data; coba lagi
+            if attempt:
+                raise
+
+    if list(matrix.shape) != index["shape"]:
+        raise ValueError(f"Embedding store is inconsistent: {base_path}")
+
+    return EmbeddingSnapshot(matrix, index["files"], index.get("metadata", {}), index["snapshot_id"], chunk_matrix)
+
+
+def delete_embedding_store(path: str) -> None:
+    base_path = store_base_path(path)
+    for candidate in (base_path + INDEX_SUFFIX, base_path + LEGACY_SUFFIX):
+        if os.path.exists(candidate):
+            os.remove(candidate)
+    _remove_stale_data_files(base_path, keep=set())
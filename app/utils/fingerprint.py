@@ -0,0 +1,252 @@
+import io
+import hashlib
+import keyword
+import tokenize
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.embedding_cache import content_hash, normalize_source
+from app.utils.embedding_store import atomic_write
+from app.utils.metrics import timed
+
+# Token yang tidak ikut fingerprint (tata letak dan komentar)
+_SKIPPED_TOKENS = {
+    tokenize.COMMENT, tokenize.NL, tokenize.INDENT, tokenize.DEDENT,
+    tokenize.ENCODING, tokenize.ENDMARKER,
+}
+# Python 3.12+ memecah f-string menjadi beberapa token
+_STRING_TOKENS = {tokenize.STRING} | {
+    getattr(tokenize, name) for name in ('FSTRING_START', 'FSTRING_MIDDLE', 'FSTRING_END')
+    if hasattr(tokenize, name)
+}
+
+_HASH_BASE = np.uint64(1000003)
+
+
+def normalize_tokens(source):
+    """
+    Token Python ter-normalisasi: identifier -> 'V', angka -> 'N', string -> 'S';
+    keyword, operator dan akhir statement dipertahankan. Rename variabel dan
+    ganti literal tidak mengubah hasilnya. File yang gagal di-tokenize
+    menghasilkan token sampai titik error.
+    """
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+            kind = tok.type
+            if kind in _SKIPPED_TOKENS:
+                continue
+            if kind == tokenize.NAME:
+                tokens.append(tok.string if keyword.iskeyword(tok.string) else 'V')
+            elif kind == tokenize.NUMBER:
+                tokens.append('N')
+            elif kind in _STRING_TOKENS:
+                # Satu f-string cukup satu token 'S'
+                if not tokens or tokens[-1] != 'S':
+                    tokens.append('S')
+            elif kind == tokenize.NEWLINE:
+                tokens.append(';')
+            elif tok.string.strip():
+                tokens.append(tok.string)
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return tokens
+
+
+def kgram_hashes(tokens, k):
+    """Hash polinomial (uint64) untuk setiap k-gram token berurutan."""
+    if len(tokens) < k:
+        return np.empty(0, dtype=np.uint64)
+    ids = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in tokens), dtype=np.uint64, count=len(tokens))
+    n = len(tokens) - k + 1
+    hashes = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(k):
+            hashes = hashes * _HASH_BASE + ids[offset:offset + n]
+    return hashes
+
+
+def winnow(hashes, window):
+    """
+    Fingerprint hasil winnowing: minimum (paling kanan) di setiap jendela
+    `window` hash berurutan. Returns array hash unik yang terurut.
+    """
+    if hashes.size == 0:
+        return hashes
+    if hashes.size <= window:
+        return np.unique(hashes[[int(np.argmin(hashes))]])
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+    # argmin pada jendela terbalik = posisi minimum paling kanan
+    rightmost = window - 1 - np.argmin(windows[:, ::-1], axis=1)
+    positions = np.unique(np.arange(windows.shape[0]) + rightmost)
+    return np.unique(hashes[positions])
+
+
+def fingerprint_source(source, k=12, window=8):
+    return winnow(kgram_hashes(normalize_tokens(source), k), window)
+
+
+def set_overlaps(sets, max_df=0.5):
+    """
+    Overlap eksak |A n B| / min(|A|, |B|) untuk setiap pasangan (i < j) yang
+    berbagi minimal satu hash, lewat index terbalik hash -> indeks set.
+    `sets` = array hash unik per item (None/kosong = dilewati).
+
+    Hash yang muncul di lebih dari `max_df` bagian item (template tugas,
+    boilerplate) tidak dipakai untuk membentuk pasangan.
+    Returns (left, right, overlap) terurut menurut (left, right).
+    """
+    n = len(sets)
+    empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+    sizes = np.zeros(n, dtype=np.int64)
+    parts_values, parts_docs = [], []
+    for i, values in enumerate(sets):
+        if values is None or values.size == 0:
+            continue
+        sizes[i] = values.size
+        parts_values.append(values)
+        parts_docs.append(np.full(values.size, i, dtype=np.int64))
+    if len(parts_values) < 2:
+        return empty
+
+    values = np.concatenate(parts_values)
+    docs = np.concatenate(parts_docs)
+    order = np.argsort(values, kind='stable')
+    values, docs = values[order], docs[order]
+
+    # Posting list per hash: [starts[g], starts[g] + counts[g])
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    counts = np.diff(np.append(starts, values.size))
+    max_count = max(2, int(max_df * n))
+    keep = (counts >= 2) & (counts <= max_count)
+
+    keys = []
+    # Posting list dengan panjang sama diproses sekaligus sebagai matriks
+    for size in np.unique(counts[keep]):
+        group_starts = starts[keep & (counts == size)]
+        members = docs[group_starts[:, None] + np.arange(size)[None, :]]
+        a, b = np.triu_indices(size, k=1)
+        left, right = members[:, a].reshape(-1), members[:, b].reshape(-1)
+        keys.append(np.minimum(left, right) * n + np.maximum(left, right))
+    if not keys:
+        return empty
+
+    keys, shared = np.unique(np.concatenate(keys), return_counts=True)
+    left, right = keys // n, keys % n
+    overlap = shared / np.minimum(sizes[left], sizes[right])
+    return left.astype(np.int32), right.astype(np.int32), overlap.astype(np.float32)
+
+
+class FingerprintSet:
+    """
+    Fingerprint winnowing semua file milik satu user.
+
+    Disimpan sebagai satu .npz: nama file, content hash, array fingerprint
+    yang digabung (values) dan offset per file. Index terbalik fingerprint ->
+    file dibangun saat dibutuhkan oleh pair_overlaps().
+    """
+
+    def __init__(self, names, hashes, values, offsets, k, window):
+        self.names = list(names)
+        self.hashes = list(hashes)
+        self.values = values
+        self.offsets = offsets
+        self.k = k
+        self.window = window
+        self._rows = {name: i for i, name in enumerate(self.names)}
+
+    @property
+    def snapshot_id(self):
+        digest = hashlib.sha256(f"k{self.k}:w{self.window}".encode('utf-8'))
+        for name, file_hash in zip(self.names, self.hashes):
+            digest.update(f"\0{name}\0{file_hash}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def fingerprints(self, name):
+        row = self._rows.get(name)
+        if row is None:
+            return None
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    def pair_overlaps(self, file_names, max_df=0.5):
+        """
+        Pasangan file (indeks di `file_names`, left < right) yang berbagi
+        fingerprint, beserta overlap eksak; lihat set_overlaps().
+        """
+        return set_overlaps([self.fingerprints(name) for name in file_names], max_df=max_df)
+
+    def save(self, path):
+        def write(f):
+            np.savez(
+                f,
+                names=np.array(self.names, dtype=str),
+                hashes=np.array(self.hashes, dtype=str),
+                values=self.values,
+                offsets=self.offsets,
+                params=np.array([self.k, self.window], dtype=np.int64),
+            )
+        atomic_write(path, write)
+
+    @classmethod
+    def load(cls, path):
+        """FingerprintSet tersimpan, atau None jika belum ada / rusak."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                k, window = (int(v) for v in data['params'])
+                return cls(data['names'].tolist(), data['hashes'].tolist(),
+                           data['values'], data['offsets'], k, window)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+@timed('build_fingerprints')
+def build_fingerprints(folder_path, output_path, k=12, window=8, progress=None):
+    """
+    Fingerprint semua file .py di folder user dan simpan ke `output_path`.
+    File yang content hash-nya sama dengan set tersimpan tidak di-tokenize ulang.
+    """
+    from app.utils.embedding import _iter_python_files, _read_text_robust
+
+    previous = FingerprintSet.load(output_path)
+    if previous is not None and (previous.k, previous.window) != (k, window):
+        previous = None
+    reusable = {}
+    if previous is not None:
+        for name, file_hash in zip(previous.names, previous.hashes):
+            reusable[file_hash] = previous.fingerprints(name)
+
+    paths = sorted(_iter_python_files(folder_path), key=lambda p: p.name)
+    names, hashes, parts = [], [], []
+    for i, path in enumerate(paths):
+        source = normalize_source(_read_text_robust(Path(path)))
+        file_hash = content_hash(source)
+        values = reusable.get(file_hash)
+        if values is None:
+            values = fingerprint_source(source, k=k, window=window)
+        names.append(path.name)
+        hashes.append(file_hash)
+        parts.append(values)
+        if progress is not None:
+            progress((i + 1) / len(paths))
+
+    offsets = np.concatenate(([0], np.cumsum([p.size for p in parts]))).astype(np.int64)
+    values = np.concatenate(parts).astype(np.uint64) if parts else np.empty(0, dtype=np.uint64)
+    fingerprint_set = FingerprintSet(names, hashes, values, offsets, k, window)
+    if previous is None or previous.snapshot_id != fingerprint_set.snapshot_id:
+        fingerprint_set.save(output_path)
+    return fingerprint_set
+
+
+def lookup_overlaps(left, right, n, overlap_left, overlap_right, overlap):
+    """Overlap fingerprint untuk setiap pasangan (left, right); 0 jika tidak berbagi fingerprint."""
+    result = np.zeros(len(left), dtype=np.float32)
+    if len(overlap) == 0 or len(left) == 0:
+        return result
+    known = overlap_left.astype(np.int64) * n + overlap_right
+    wanted = np.asarray(left, dtype=np.int64) * n + right
+    positions = np.clip(np.searchsorted(known, wanted), 0, known.size - 1)
+    found = known[positions] == wanted
+    result[found] = overlap[positions[found]]
+    return result
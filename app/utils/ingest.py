@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import fcntl
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+from werkzeug.utils import secure_filename
+
+from app.utils.embedding_cache import content_hash, normalize_source
+from app.utils.embedding_store import atomic_write
+
+_COPY_CHUNK = 64 * 1024
+# name_3.py -> ('name', '3', '.py')
+_SUFFIXED = re.compile(r'^(.*)_(\d+)(\.py)$')
+
+
+class ZipLimitError(ValueError):
+    """Arsip melebihi batas jumlah member / ukuran (indikasi zip bomb)."""
+
+
+def python_member_name(info):
+    """Nama file tujuan untuk member .py, atau None jika member dilewati."""
+    if info.is_dir():
+        return None
+    parts = info.filename.replace('\\', '/').split('/')
+    name = parts[-1]
+    # Metadata macOS (__MACOSX/, ._file) dan file tersembunyi tidak ikut
+    if '__MACOSX' in parts or name.startswith('.') or not name.endswith('.py'):
+        return None
+    return secure_filename(name) or None
+
+
+def _seekable(stream, spool_bytes):
+    """ZipFile butuh stream yang bisa di-seek; stream lain di-spool (memori, lalu disk)."""
+    try:
+        if stream.seekable():
+            stream.seek(0)
+            return stream, None
+    except (AttributeError, OSError):
+        pass
+    spooled = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    shutil.copyfileobj(stream, spooled, _COPY_CHUNK)
+    spooled.seek(0)
+    return spooled, spooled
+
+
+def read_zip_members(stream, max_members=5000, max_total_bytes=100 * 1024 * 1024,
+                     max_ratio=100, spool_bytes=16 * 1024 * 1024):
+    """
+    Yield (nama file, bytes) untuk setiap member .py dari arsip ZIP.
+
+    Arsip dibaca dari stream upload (atau salinan spool jika stream tidak bisa
+    di-seek); member lain tidak pernah di-dekompresi. Batas zip bomb: jumlah
+    member, total ukuran tak terkompresi, dan rasio kompresi per member.
+    Ukuran yang dideklarasikan header dicek dulu, lalu byte yang benar-benar
+    di-dekompresi dihitung saat membaca. Melempar ZipLimitError jika batas
+    terlampaui.
+    """
+    stream, spooled = _seekable(stream, spool_bytes)
+    try:
+        with zipfile.ZipFile(stream) as archive:
+            infos = archive.infolist()
+            if len(infos) > max_members:
+                raise ZipLimitError(f"ZIP has {len(infos)} entries (limit {max_members})")
+
+            members = [(info, python_member_name(info)) for info in infos]
+            members = [(info, name) for info, name in members if name]
+            declared = sum(info.file_size for info, _ in members)
+            if declared > max_total_bytes:
+                raise ZipLimitError(f"Python files in ZIP expand to {declared} bytes (limit {max_total_bytes})")
+
+            total = 0
+            for info, name in members:
+                if info.compress_size and info.file_size / info.compress_size > max_ratio:
+                    raise ZipLimitError(f"{info.filename} has a suspicious compression ratio")
+                chunks = []
+                size = 0
+                with archive.open(info) as source:
+                    while True:
+                        chunk = source.read(_COPY_CHUNK)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        total += len(chunk)
+                        # Header bisa berbohong: hitung byte hasil dekompresi yang sebenarnya
+                        if size > info.file_size or total > max_total_bytes:
+                            raise ZipLimitError(f"{info.filename} expands beyond its declared size or the ZIP limit")
+                        chunks.append(chunk)
+                yield name, b''.join(chunks)
+    finally:
+        if spooled is not None:
+            spooled.close()
+
+
+def ingest_zip(stream, index, on_duplicate='skip', **limits):
+    """
+    Simpan member .py dari arsip ZIP lewat UploadIndex, sekali per file.
+    Jika arsip ditolak di tengah jalan, file yang sudah tersimpan dari arsip
+    ini dihapus lagi. Returns list entry manifest (lihat UploadIndex.add).
+    """
+    manifest = []
+    try:
+        for name, data in read_zip_members(stream, **limits):
+            manifest.append(index.add(name, data, on_duplicate=on_duplicate))
+        return manifest
+    except Exception:
+        for entry in manifest:
+            # Juga duplikat yang ikut ditulis dengan on_duplicate='keep'
+            if entry['stored_name']:
+                index.remove(entry['stored_name'])
+        raise
+
+
+def decode_source(data):
+    """Decode bytes file dengan fallback encoding yang sama seperti pipeline embedding."""
+    for enc in ("utf-8", "utf-8-sig", "latin-1"):
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="ignore")
+
+
+class UploadIndex:
+    """
+    Index nama + content hash file upload milik satu user.
+
+    Disimpan di `<user_folder>/.upload_index.json` dan dibaca/ditulis di bawah
+    file lock (aman lintas worker gunicorn). Isinya:
+      files        nama tersimpan -> content hash
+      hashes       content hash -> nama tersimpan pertama (deteksi duplikat)
+      next_suffix  nama asli -> counter _N berikutnya
+    Sehingga nama bentrok diselesaikan dalam O(1), bukan loop os.path.exists.
+    Index yang belum ada dibangun sekali dari isi folder.
+    """
+
+    FILE_NAME = '.upload_index.json'
+
+    def __init__(self, folder, data):
+        self.folder = folder
+        self.files = data.get('files', {})
+        self.hashes = data.get('hashes', {})
+        self.next_suffix = data.get('next_suffix', {})
+
+    @classmethod
+    @contextmanager
+    def open(cls, folder):
+        """Index terkunci untuk folder user; perubahan disimpan saat keluar dari blok."""
+        path = os.path.join(folder, cls.FILE_NAME)
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        index = cls(folder, json.load(f))
+                except (OSError, ValueError):
+                    index = cls.rebuild(folder)
+                try:
+                    yield index
+                finally:
+                    # Juga setelah error: file yang sudah ditulis tetap tercatat
+                    atomic_write(path, lambda f: json.dump(index.to_dict(), f, ensure_ascii=False), mode='w')
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @classmethod
+    def rebuild(cls, folder):
+        index = cls(folder, {})
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not name.endswith('.py') or name.startswith('.') or not os.path.isfile(path):
+                continue
+            with open(path, 'rb') as f:
+                file_hash = content_hash(normalize_source(decode_source(f.read())))
+            index.files[name] = file_hash
+            index.hashes.setdefault(file_hash, name)
+            match = _SUFFIXED.match(name)
+            if match:
+                base = match.group(1) + match.group(3)
+                index.next_suffix[base] = max(index.next_suffix.get(base, 1), int(match.group(2)) + 1)
+        return index
+
+    def to_dict(self):
+        return {'files': self.files, 'hashes': self.hashes, 'next_suffix': self.next_suffix}
+
+    def _taken(self, name):
+        return name in self.files or os.path.exists(os.path.join(self.folder, name))
+
+    def allocate(self, filename):
+        """Nama bebas berikutnya untuk `filename` (name.py, name_1.py, ...)."""
+        if not self._taken(filename):
+            return filename
+        stem, ext = os.path.splitext(filename)
+        counter = self.next_suffix.get(filename, 1)
+        # Biasanya langsung bebas; hanya melompati nama _N yang diupload manual
+        while self._taken(f"{stem}_{counter}{ext}"):
+            counter += 1
+        self.next_suffix[filename] = counter + 1
+        return f"{stem}_{counter}{ext}"
+
+    def add(self, filename, data, on_duplicate='skip'):
+        """
+        Simpan satu file. Konten yang sama (setelah normalisasi whitespace)
+        dengan file yang sudah ada ditandai duplicate; dengan
+        on_duplicate='skip' file tersebut tidak ditulis.
+        Returns entry manifest {original_name, stored_name, content_hash, size, status, duplicate_of}.
+        """
+        file_hash = content_hash(normalize_source(decode_source(data)))
+        entry = {
+            'original_name': filename,
+            'stored_name': None,
+            'content_hash': file_hash,
+            'size': len(data),
+            'status': 'stored',
+            'duplicate_of': self.hashes.get(file_hash),
+        }
+        if entry['duplicate_of'] is not None:
+            entry['status'] = 'duplicate'
+            if on_duplicate == 'skip':
+                return entry
+
+        stored_name = self.allocate(filename)
+        with open(os.path.join(self.folder, stored_name), 'xb') as f:
+            f.write(data)
+        self.files[stored_name] = file_hash
+        self.hashes.setdefault(file_hash, stored_name)
+        entry['stored_name'] = stored_name
+        return entry
+
+    def remove(self, stored_name):
+        path = os.path.join(self.folder, stored_name)
+        if os.path.exists(path):
+            os.remove(path)
+        file_hash = self.files.pop(stored_name, None)
+        if file_hash is not None and self.hashes.get(file_hash) == stored_name:
+            # Pindahkan penanda duplikat ke salinan lain jika masih ada
+            others = [name for name, h in self.files.items() if h == file_hash]
+            if others:
+                self.hashes[file_hash] = others[0]
+            else:
+                del self.hashes[file_hash]
@@ -0,0 +1,254 @@
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Dilempar dari JobContext.progress() saat job diminta dibatalkan."""
+
+
+class MemoryJobBackend:
+    """
+    State job di memori proses (cukup untuk satu worker gunicorn). Job yang
+    sudah selesai dibuang setelah `ttl_seconds` (seperti TTL key di Redis)
+    dan paling banyak `max_jobs` job disimpan; dicek saat claim dan get.
+    """
+
+    def __init__(self, ttl_seconds=3600, max_jobs=1000):
+        self._jobs = {}
+        self._active = {}
+        self._cancel = set()
+        self._lock = threading.Lock()
+        self._ttl = ttl_seconds
+        self._max_jobs = max_jobs
+
+    def _evict(self):
+        """Buang job selesai yang kedaluwarsa, lalu yang tertua jika melebihi max_jobs (lock dipegang)."""
+        expire_before = time.time() - self._ttl
+        finished = [job for job in self._jobs.values() if job["status"] not in ACTIVE_STATUSES]
+        expired = [job for job in finished if job.get("updated_at", job["created_at"]) < expire_before]
+        excess = len(self._jobs) - len(expired) - self._max_jobs
+        if excess > 0:
+            remaining = [job for job in finished if job.get("updated_at", job["created_at"]) >= expire_before]
+            remaining.sort(key=lambda job: job.get("updated_at", job["created_at"]))
+            expired += remaining[:excess]
+        for job in expired:
+            del self._jobs[job["id"]]
+            self._cancel.discard(job["id"])
+
+    def claim(self, job):
+        """Simpan job baru kecuali user sudah punya job aktif; kembalikan job yang berlaku."""
+        with self._lock:
+            active_id = self._active.get((job["user_id"], job["kind"]))
+            active = self._jobs.get(active_id)
+            if active is not None and active["status"] in ACTIVE_STATUSES:
+                return active, False
+            self._jobs[job["id"]] = dict(job)
+            self._active[(job["user_id"], job["kind"])] = job["id"]
+            self._evict()
+            return dict(job), True
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def release(self, job):
+        with self._lock:
+            key = (job["user_id"], job["kind"])
+            if self._active.get(key) == job["id"]:
+                del self._active[key]
+            self._cancel.discard(job["id"])
+
+    def request_cancel(self, job_id):
+        with self._lock:
+            self._cancel.add(job_id)
+
+    def is_cancel_requested(self, job_id):
+        return job_id in self._cancel
+
+
+class RedisJobBackend:
+    """
+    State job di Redis sehingga status/result bisa dibaca dari worker
+    gunicorn mana pun. Job tetap dieksekusi oleh thread pool lokal.
+    """
+
+    def __init__(self, url, ttl_seconds=3600, prefix="codescan:job"):
+        # Dependency opsional: hanya dibutuhkan dengan JOB_BACKEND=redis (pip install redis)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._ttl = ttl_seconds
+        self._prefix = prefix
+
+    def _job_key(self, job_id):
+        return f"{self._prefix}:{job_id}"
+
+    def _active_key(self, user_id, kind):
+        return f"{self._prefix}:active:{kind}:{user_id}"
+
+    def claim(self, job):
+        active_key = self._active_key(job["user_id"], job["kind"])
+        # SET NX = dedup atomik lintas proses
+        if not self._redis.set(active_key, job["id"], nx=True, ex=self._ttl):
+            active_id = self._redis.get(active_key)
+            active = self.get(active_id.decode()) if active_id else None
+            if active is not None and active["status"] in ACTIVE_STATUSES:
+                return active, False
+            self._redis.set(active_key, job["id"], ex=self._ttl)
+        self._redis.set(self._job_key(job["id"]), json.dumps(job), ex=self._ttl)
+        return dict(job), True
+
+    def get(self, job_id):
+        raw = self._redis.get(self._job_key(job_id))
+        return json.loads(raw) if raw else None
+
+    def update(self, job_id, **fields):
+        job = self.get(job_id)
+        if job is not None:
+            job.update(fields, updated_at=time.time())
+            self._redis.set(self._job_key(job_id), json.dumps(job), ex=self._ttl)
+
+    def release(self, job):
+        active_key = self._active_key(job["user_id"], job["kind"])
+        active_id = self._redis.get(active_key)
+        if active_id and active_id.decode() == job["id"]:
+            self._redis.delete(active_key)
+        self._redis.delete(f"{self._job_key(job['id'])}:cancel")
+
+    def request_cancel(self, job_id):
+        self._redis.set(f"{self._job_key(job_id)}:cancel", 1, ex=self._ttl)
+
+    def is_cancel_requested(self, job_id):
+        return bool(self._redis.exists(f"{self._job_key(job_id)}:cancel"))
+
+
+class JobContext:
+    """Handle yang diterima fungsi job untuk melapor progress dan cek pembatalan."""
+
+    def __init__(self, backend, job_id):
+        self._backend = backend
+        self.job_id = job_id
+        self._last_update = 0.0
+
+    def progress(self, fraction, stage=None):
+        if self._backend.is_cancel_requested(self.job_id):
+            raise JobCancelled()
+        now = time.monotonic()
+        # Batasi frekuensi tulis ke backend (loop scoring bisa sangat rapat)
+        if now - self._last_update >= 0.2 or fraction >= 1.0:
+            fields = {"progress": round(min(max(fraction, 0.0), 1.0), 4)}
+            if stage:
+                fields["stage"] = stage
+            self._backend.update(self.job_id, **fields)
+            self._last_update = now
+
+
+class JobManager:
+    """Antrian job lokal berbasis thread pool dengan dedup per user dan pembatalan."""
+
+    def __init__(self, backend, max_workers=2):
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="codescan-job")
+
+    def submit(self, user_id, kind, fn, *args, **kwargs):
+        """
+        Jalankan fn(job_context, *args, **kwargs) di background.
+        Returns (job, created); created=False berarti job aktif user dipakai ulang.
+        """
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "kind": kind,
+            "status": "queued",
+            "progress": 0.0,
+            "stage": "queued",
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        job, created = self.backend.claim(job)
+        if created:
+            app = current_app._get_current_object()
+            self._executor.submit(self._run, app, job, fn, args, kwargs)
+        return job, created
+
+    def _run(self, app, job, fn, args, kwargs):
+        job_id = job["id"]
+        try:
+            with app.app_context():
+                if self.backend.is_cancel_requested(job_id):
+                    raise JobCancelled()
+                self.backend.update(job_id, status="running", started_at=time.time())
+                result = fn(JobContext(self.backend, job_id), *args, **kwargs)
+                self.backend.update(
+                    job_id, status="finished", progress=1.0, stage="done",
+                    result=result, finished_at=time.time()
+                )
+        except JobCancelled:
+            self.backend.update(job_id, status="cancelled", stage="cancelled", finished_at=time.time())
+        except Exception as e:
+            app.logger.error(f"Job {job_id} ({job['kind']}) failed: {e}")
+            self.backend.update(job_id, status="failed", error=str(e), finished_at=time.time())
+        finally:
+            self.backend.release(job)
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.backend.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        self.backend.request_cancel(job_id)
+        if job["status"] == "queued":
+            # Belum jalan: tandai langsung; _run akan melihat flag cancel dan berhenti
+            self.backend.update(job_id, status="cancelled", stage="cancelled")
+        return self.backend.get(job_id)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """JobManager per proses, dibuat dari config app saat pertama dipakai."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                config = current_app.config
+                if config.get("JOB_BACKEND", "memory") == "redis":
+                    backend = RedisJobBackend(config["REDIS_URL"], ttl_seconds=config.get("JOB_TTL_SECONDS", 3600))
+                else:
+                    backend = MemoryJobBackend(
+                        ttl_seconds=config.get("JOB_TTL_SECONDS", 3600),
+                        max_jobs=config.get("JOB_MAX_KEPT", 1000)
+                    )
+                _manager = JobManager(backend, max_workers=config.get("JOB_WORKERS", 2))
+    return _manager
+
+
+def public_job(job, include_result=False):
+    """Representasi job untuk response API."""
+    fields = ("id", "kind", "status", "progress", "stage", "error", "created_at", "updated_at")
+    data = {k: job.get(k) for k in fields}
+    if include_result:
+        data["result"] = job.get("result")
+    return data
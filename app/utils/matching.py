@@ -0,0 +1,121 @@
+import heapq
+import re
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_line(line):
+    """Baris untuk perbandingan: tanpa indentasi/whitespace berlebih; '' untuk baris kosong/komentar."""
+    stripped = _WHITESPACE.sub(' ', line.strip())
+    if not stripped or stripped.startswith('#'):
+        return ''
+    return stripped
+
+
+def _significant_lines(lines, vocabulary):
+    """(id baris ter-normalisasi, indeks baris asli) untuk baris yang bukan kosong/komentar."""
+    ids, positions = [], []
+    for index, line in enumerate(lines):
+        normalized = normalize_line(line)
+        if normalized:
+            ids.append(vocabulary.setdefault(normalized, len(vocabulary)))
+            positions.append(index)
+    return ids, positions
+
+
+def find_matching_blocks(content_1, content_2, min_line_chars=6, max_occurrences=16):
+    """
+    Blok baris identik (setelah normalisasi) yang maksimal dan tidak tumpang tindih.
+
+    Baris file 2 di-hash ke index id -> posisi; setiap kemunculan bersama yang
+    merupakan awal diagonal diperpanjang selama baris berikutnya sama. Blok
+    diterima dari yang terpanjang; blok yang bertabrakan dengan blok yang sudah
+    diterima dipotong ke bagian yang masih bebas (mirip greedy string tiling).
+    Baris kosong/komentar dilewati sehingga blok bisa melintasinya.
+
+    Blok satu baris hanya dihitung jika barisnya minimal `min_line_chars`
+    karakter, dan baris yang muncul lebih dari `max_occurrences` kali di file 2
+    (mis. `else:`) tidak dipakai sebagai awal blok, agar baris trivial tidak
+    meledakkan jumlah kandidat; baris seperti itu tetap ikut di dalam blok,
+    juga di awalnya.
+
+    Returns list dict {file1_line, file2_line, length, file2_length, content}
+    (indeks baris 0-based, `length` = jumlah baris file 1 yang dicakup),
+    urut menurut file1_line.
+    """
+    lines_1 = content_1.split('\n')
+    lines_2 = content_2.split('\n')
+    vocabulary = {}
+    ids_1, pos_1 = _significant_lines(lines_1, vocabulary)
+    ids_2, pos_2 = _significant_lines(lines_2, vocabulary)
+    if not ids_1 or not ids_2:
+        return []
+
+    postings = {}
+    for j, line_id in enumerate(ids_2):
+        postings.setdefault(line_id, []).append(j)
+    short_ids = {line_id for line, line_id in vocabulary.items() if len(line) < min_line_chars}
+
+    def frequent(line_id):
+        return len(postings[line_id]) > max_occurrences
+
+    # Kandidat: diagonal maksimal (i, j, panjang) dalam urutan baris signifikan
+    heap = []
+    for i, line_id in enumerate(ids_1):
+        hits = postings.get(line_id)
+        if not hits or len(hits) > max_occurrences:
+            continue
+        for j in hits:
+            # Mundur melewati baris sama yang terlalu sering (bukan awal kandidat) agar
+            # blok yang diawali baris umum tetap utuh; jika bertemu baris sama yang
+            # bukan baris umum, diagonal ini sudah dibuat dari awal yang lebih dulu
+            start_1, start_2 = i, j
+            while (start_1 > 0 and start_2 > 0 and ids_1[start_1 - 1] == ids_2[start_2 - 1]
+                   and frequent(ids_1[start_1 - 1])):
+                start_1 -= 1
+                start_2 -= 1
+            if start_1 > 0 and start_2 > 0 and ids_1[start_1 - 1] == ids_2[start_2 - 1]:
+                continue
+            length = i - start_1 + 1
+            while (start_1 + length < len(ids_1) and start_2 + length < len(ids_2)
+                   and ids_1[start_1 + length] == ids_2[start_2 + length]):
+                length += 1
+            heapq.heappush(heap, (-length, start_1, start_2))
+
+    used_1 = [False] * len(ids_1)
+    used_2 = [False] * len(ids_2)
+    accepted = []
+    while heap:
+        negative_length, i, j = heapq.heappop(heap)
+        length = -negative_length
+        if length == 1 and ids_1[i] in short_ids:
+            continue
+        free = [not used_1[i + k] and not used_2[j + k] for k in range(length)]
+        if all(free):
+            for k in range(length):
+                used_1[i + k] = used_2[j + k] = True
+            accepted.append((i, j, length))
+            continue
+        # Tabrakan: masukkan kembali potongan-potongan yang masih bebas
+        k = 0
+        while k < length:
+            if not free[k]:
+                k += 1
+                continue
+            start = k
+            while k < length and free[k]:
+                k += 1
+            heapq.heappush(heap, (-(k - start), i + start, j + start))
+
+    blocks = []
+    for i, j, length in sorted(accepted):
+        start_1, end_1 = pos_1[i], pos_1[i + length - 1]
+        start_2, end_2 = pos_2[j], pos_2[j + length - 1]
+        blocks.append({
+            'file1_line': start_1,
+            'file2_line': start_2,
+            'length': end_1 - start_1 + 1,
+            'file2_length': end_2 - start_2 + 1,
+            'content': '\n'.join(line.strip() for line in lines_1[start_1:end_1 + 1] if normalize_line(line)),
+        })
+    return blocks
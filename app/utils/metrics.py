@@ -0,0 +1,169 @@
+import time
+import bisect
+import threading
+from functools import wraps
+
+# Batas bucket histogram (detik): dari satu file kecil sampai check kohort besar
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Dinyalakan lewat configure(); saat mati setiap instrumentasi hanya satu cek boolean
+_enabled = False
+_metrics = []
+
+
+def configure(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Counter monoton per kombinasi label (format eksposisi Prometheus)."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        if not _enabled:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Histogram kumulatif per kombinasi label: _bucket{le=...}, _sum dan _count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        if not _enabled:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        # Indeks bucket pertama dengan batas >= value (bucket terakhir = +Inf)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+STAGE_SECONDS = Histogram(
+    'codescan_stage_seconds', 'Time spent per processing stage.', ['stage']
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'codescan_http_request_seconds', 'HTTP request latency per route.', ['endpoint', 'method', 'status']
+)
+FILES_EMBEDDED = Counter(
+    'codescan_files_embedded_total', 'Files embedded, by source of the vector (cache or model).', ['source']
+)
+FILES_UPLOADED = Counter('codescan_files_uploaded_total', 'Python files stored by uploads.')
+PAIRS_SCORED = Counter('codescan_pairs_scored_total', 'File pairs scored by the Siamese model.')
+
+
+class timed:
+    """
+    Catat durasi ke codescan_stage_seconds{stage=...}. Bisa dipakai sebagai
+    decorator (`@timed('stage')`) atau context manager (`with timed('stage'):`).
+    Saat metrics mati, decorator langsung memanggil fungsi aslinya.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.stage)
+        return False
+
+    def __call__(self, fn):
+        stage = self.stage
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+
+
+def observe_stage(stage, seconds):
+    """Untuk durasi yang sudah diukur sendiri (mis. load model di ModelRegistry)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def render_metrics():
+    """Semua metric dalam format eksposisi teks Prometheus (v0.0.4)."""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
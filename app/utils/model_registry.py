@@ -0,0 +1,169 @@
+import os
+import time
+import threading
+
+from flask import current_app
+
+from app.utils.metrics import observe_stage
+
+
+def _current_rss_bytes():
+    """Resident set size proses saat ini (Linux /proc, fallback ke peak RSS)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss dalam KB di Linux; ini peak, bukan RSS saat ini
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _load_keras_model(path):
+    # Import lokal: TensorFlow hanya dimuat saat model benar-benar dibutuhkan
+    import tensorflow as tf
+    from app.utils.compare import get_euclidean_distance
+
+    return tf.keras.models.load_model(
+        path,
+        custom_objects={
+            'euclidean_distance': get_euclidean_distance(),
+            'InputLayer': tf.keras.layers.InputLayer
+        },
+        compile=False,
+        safe_mode=False
+    )
+
+
+class ModelRegistry:
+    """
+    Cache model per proses (per worker gunicorn).
+
+    Model dimuat sekali per path dan hanya dimuat ulang jika mtime file
+    berubah. Waktu load dan selisih RSS dicatat untuk setiap load.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+
+        entry = self._entries.get(path)
+        if entry is not None and entry['mtime'] == mtime:
+            entry['hits'] += 1
+            return entry['model']
+
+        with self._lock:
+            # Cek ulang: thread lain mungkin sudah memuat model ini
+            entry = self._entries.get(path)
+            if entry is not None and entry['mtime'] == mtime:
+                entry['hits'] += 1
+                return entry['model']
+
+            rss_before = _current_rss_bytes()
+            start = time.perf_counter()
+            model = self._loader(path)
+            load_seconds = time.perf_counter() - start
+            rss_after = _current_rss_bytes()
+            observe_stage('model_load', load_seconds)
+
+            self._entries[path] = {
+                'model': model,
+                'mtime': mtime,
+                'loaded_at': time.time(),
+                'load_seconds': load_seconds,
+                'rss_delta_bytes': max(rss_after - rss_before, 0),
+                'reloads': entry['reloads'] + 1 if entry is not None else 0,
+                'hits': 0,
+            }
+            return model
+
+    def is_loaded(self, path):
+        return os.path.abspath(path) in self._entries
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'rss_bytes': _current_rss_bytes(),
+            'models': {
+                path: {k: v for k, v in entry.items() if k != 'model'}
+                for path, entry in self._entries.items()
+            },
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _load_numpy_model(path):
+    from app.utils.siamese_numpy import NumpySiameseModel
+    return NumpySiameseModel.from_h5(path)
+
+
+registry = ModelRegistry(_load_keras_model)
+numpy_registry = ModelRegistry(_load_numpy_model)
+
+
+def resolve_model_path(version=None, config=None):
+    """Path model untuk `version` (key MODEL_VERSIONS) atau MODEL_PATH default."""
+    config = config if config is not None else current_app.config
+    if not version:
+        return config['MODEL_PATH']
+    versions = config.get('MODEL_VERSIONS', {})
+    if version not in versions:
+        raise ValueError(f"Unknown model version: {version}")
+    return versions[version]
+
+
+def get_model(version=None, engine='keras'):
+    """Model Keras, atau engine NumPy (engine='numpy') dari file .h5 yang sama."""
+    target = numpy_registry if engine == 'numpy' else registry
+    return target.get(resolve_model_path(version))
+
+
+def model_signature(version=None):
+    """Identitas model (path + mtime) untuk mengikat hasil scoring ke versi model."""
+    path = os.path.abspath(resolve_model_path(version))
+    return f"{path}:{os.stat(path).st_mtime_ns}"
+
+
+def model_ready(config):
+    """True jika model default untuk engine yang dipakai sudah dimuat di proses ini."""
+    target = numpy_registry if config.get('SCORING_ENGINE') == 'numpy' else registry
+    return target.is_loaded(resolve_model_path(None, config))
+
+
+def warm_up(app, versions=None, embedding=None):
+    """
+    Muat model default (dan versi tambahan) sebelum request pertama masuk.
+    Dipanggil dari hook gunicorn; error hanya dicatat agar worker tetap boot.
+    `embedding=True` ikut memuat CodeBERT (default: EMBEDDING_WARMUP).
+    """
+    versions = versions if versions is not None else app.config.get('MODEL_WARMUP_VERSIONS', [])
+    embedding = embedding if embedding is not None else app.config.get('EMBEDDING_WARMUP', False)
+    target = numpy_registry if app.config.get('SCORING_ENGINE') == 'numpy' else registry
+    for version in [None, *versions]:
+        try:
+            path = resolve_model_path(version, app.config)
+            target.get(path)
+            entry = target.stats()['models'][os.path.abspath(path)]
+            app.logger.info(
+                f"Model warm-up {version or 'default'}: {entry['load_seconds']:.2f}s, "
+                f"+{entry['rss_delta_bytes'] / (1024 * 1024):.1f} MB RSS"
+            )
+        except Exception as e:
+            app.logger.error(f"Model warm-up failed for {version or 'default'}: {e}")
+
+    if embedding:
+        from app.utils.embedding import _initialize_model
+        start = time.perf_counter()
+        try:
+            _initialize_model()
+            app.logger.info(f"Embedding model warm-up: {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            app.logger.error(f"Embedding model warm-up failed: {e}")
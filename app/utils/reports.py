@@ -0,0 +1,246 @@
+import io
+import csv
+
+import numpy as np
+
+from app.utils.metrics import timed
+
+# Batas bawah (persen) per tingkat risiko, dari tinggi ke rendah
+RISK_LEVELS = (('High Risk', 75.0), ('Medium Risk', 50.0), ('Low Risk', 0.0))
+CSV_HEADER = ['File 1', 'File 2', 'Similarity (%)', 'Risk Level', 'Export Date']
+CLUSTER_CSV_HEADER = [
+    'Cluster', 'Cluster Size', 'File', 'Exact Duplicate Group', 'Max Similarity (%)', 'Mean Similarity (%)',
+    'Export Date',
+]
+
+
+def risk_level(similarity):
+    """Tingkat risiko untuk similarity dalam persen."""
+    for label, lower in RISK_LEVELS:
+        if similarity >= lower:
+            return label
+    return RISK_LEVELS[-1][0]
+
+
+def risk_summary(similarities):
+    """Jumlah pasangan per tingkat risiko dalam satu pass (np.digitize + bincount)."""
+    similarities = np.asarray(similarities, dtype=np.float64)
+    # bins naik: [50, 75] -> 0 = low, 1 = medium, 2 = high
+    bins = [lower for _, lower in reversed(RISK_LEVELS[:-1])]
+    counts = np.bincount(np.digitize(similarities, bins), minlength=len(RISK_LEVELS))
+    return {label: int(counts[len(RISK_LEVELS) - 1 - i]) for i, (label, _) in enumerate(RISK_LEVELS)}
+
+
+class ExportRows:
+    """
+    Sumber baris export yang terurut menurun menurut similarity: result set
+    tersimpan (dibaca per potongan dari array memory-mapped) atau list JSON
+    dari client lama. `similarities` = array persen untuk semua baris.
+    """
+
+    def __init__(self, similarities, fetch):
+        self.similarities = similarities
+        self._fetch = fetch
+
+    @classmethod
+    def from_result_set(cls, result_set):
+        return cls((result_set.pairs['score'] * 100).astype(np.float64), result_set.rows)
+
+    @classmethod
+    def from_list(cls, results):
+        rows = sorted(results, key=lambda r: float(r.get('similarity', 0)), reverse=True)
+        similarities = np.array([float(r.get('similarity', 0)) for r in rows], dtype=np.float64)
+        return cls(similarities, lambda start, stop: rows[start:stop])
+
+    def __len__(self):
+        return int(self.similarities.shape[0])
+
+    def select(self, top_n=None, threshold=None):
+        """Jumlah baris teratas yang lolos filter (karena terurut, selalu berupa prefix)."""
+        stop = len(self)
+        if threshold is not None:
+            stop = int(np.count_nonzero(self.similarities >= threshold))
+        if top_n:
+            stop = min(stop, int(top_n))
+        return stop
+
+    def chunks(self, stop, chunk_size=1000):
+        """Yield list baris (dict row ResultSet) per potongan sampai baris ke-`stop`."""
+        for start in range(0, stop, chunk_size):
+            yield self._fetch(start, min(start + chunk_size, stop))
+
+
+def iter_csv(rows, stop, export_date, chunk_size=1000):
+    """Generator CSV: header lalu satu string per potongan baris (memori konstan)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.getvalue()
+    for chunk in rows.chunks(stop, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        for row in chunk:
+            similarity = float(row.get('similarity', 0))
+            writer.writerow([
+                row.get('file_1', ''),
+                row.get('file_2', ''),
+                f"{similarity:.2f}",
+                risk_level(similarity),
+                export_date,
+            ])
+        yield buffer.getvalue()
+
+
+def iter_clusters_csv(clusters, export_date):
+    """Generator CSV cluster duplikat: satu baris per file anggota cluster."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CLUSTER_CSV_HEADER)
+    yield buffer.getvalue()
+    for cluster in clusters:
+        buffer.seek(0)
+        buffer.truncate()
+        # Nomor grup file identik di dalam cluster (kosong jika isinya unik)
+        groups = {name: n for n, group in enumerate(cluster['exact_duplicates'], 1) for name in group}
+        for name in cluster['files']:
+            writer.writerow([
+                cluster['id'],
+                cluster['size'],
+                name,
+                groups.get(name, ''),
+                f"{cluster['max_similarity']:.2f}",
+                f"{cluster['mean_similarity']:.2f}",
+                export_date,
+            ])
+        yield buffer.getvalue()
+
+
+def _cluster_files(cluster, limit=8):
+    """Daftar file cluster untuk sel tabel PDF; file identik ditandai grupnya."""
+    groups = {name: n for n, group in enumerate(cluster['exact_duplicates'], 1) for name in group}
+    names = [
+        _short(name) + (f" [={groups[name]}]" if name in groups else '') for name in cluster['files'][:limit]
+    ]
+    if cluster['size'] > limit:
+        names.append(f"+{cluster['size'] - limit} more")
+    return ', '.join(names)
+
+
+def _short(name, limit=30):
+    return name[:limit] + ('...' if len(name) > limit else '')
+
+
+@timed('pdf_build')
+def build_results_pdf(output, rows, stop, export_date, filter_text=None, chunk_rows=200, clusters=None,
+                      cluster_threshold=None):
+    """
+    Tulis laporan PDF hasil check ke file-like `output`.
+    `clusters` (hasil find_clusters, opsional) ditulis sebagai bagian
+    tersendiri sebelum tabel pasangan.
+
+    Ringkasan risiko dihitung dari semua baris; tabel detail hanya memuat
+    `stop` baris teratas dan dibagi menjadi tabel per `chunk_rows` baris
+    (header diulang di setiap halaman) sehingga layout tidak memecah satu
+    tabel raksasa berulang kali. Style tiap tabel dibangun dalam satu pass.
+    """
+    # reportlab hanya dibutuhkan saat export PDF; jangan ikut dimuat saat startup
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
+    total = len(rows)
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=1  # Center alignment
+    )
+
+    story = [Paragraph("CodeScan Plagiarism Detection Report", title_style), Spacer(1, 20)]
+    info = f"Generated on: {export_date}<br/>Total Comparisons: {total}"
+    if stop < total:
+        info += f"<br/>Detailed results: top {stop} of {total}"
+        if filter_text:
+            info += f" ({filter_text})"
+    story.append(Paragraph(info, styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    summary = risk_summary(rows.similarities)
+    labels = {'High Risk': 'High Risk (≥75%)', 'Medium Risk': 'Medium Risk (50-74%)', 'Low Risk': 'Low Risk (<50%)'}
+    summary_data = [['Risk Level', 'Count', 'Percentage']] + [
+        [labels[label], str(count), f"{(count / total * 100) if total else 0:.1f}%"]
+        for label, count in summary.items()
+    ]
+    header_style = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]
+    summary_table = Table(summary_data, colWidths=[2 * inch, 1 * inch, 1.5 * inch])
+    summary_table.setStyle(TableStyle(header_style + [
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ]))
+    story += [Paragraph("Summary", styles['Heading2']), summary_table, Spacer(1, 20)]
+
+    if clusters:
+        story.append(Paragraph("Duplicate Clusters", styles['Heading2']))
+        clustered = sum(cluster['size'] for cluster in clusters)
+        story.append(Paragraph(
+            f"{len(clusters)} clusters covering {clustered} files "
+            f"(linked by similarity ≥ {cluster_threshold:g}% or identical content; "
+            f"[=n] marks files with identical content)", styles['Normal']
+        ))
+        story.append(Spacer(1, 10))
+        cell_style = ParagraphStyle('ClusterFiles', parent=styles['Normal'], fontSize=7, leading=9)
+        cluster_style = header_style + [
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+        ]
+        for start in range(0, len(clusters), chunk_rows):
+            table_data = [['#', 'Files', 'Size', 'Max (%)', 'Mean (%)']] + [
+                [
+                    str(cluster['id']), Paragraph(_cluster_files(cluster), cell_style), str(cluster['size']),
+                    f"{cluster['max_similarity']:.1f}", f"{cluster['mean_similarity']:.1f}",
+                ]
+                for cluster in clusters[start:start + chunk_rows]
+            ]
+            table = Table(table_data, colWidths=[0.4 * inch, 4 * inch, 0.6 * inch, 0.8 * inch, 0.8 * inch],
+                          repeatRows=1)
+            table.setStyle(TableStyle(cluster_style))
+            story.append(table)
+        story.append(Spacer(1, 20))
+
+    story += [Paragraph("Detailed Results", styles['Heading2']), Spacer(1, 10)]
+    row_colors = {'High Risk': colors.lightcoral, 'Medium Risk': colors.lightyellow, 'Low Risk': colors.lightgreen}
+    detail_style = header_style + [
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]
+    header = ['File 1', 'File 2', 'Similarity (%)', 'Risk Level']
+    for chunk in rows.chunks(stop, chunk_rows):
+        table_data = [header]
+        commands = list(detail_style)
+        for i, row in enumerate(chunk, 1):
+            similarity = float(row.get('similarity', 0))
+            level = risk_level(similarity)
+            table_data.append([
+                _short(row.get('file_1', '')), _short(row.get('file_2', '')), f"{similarity:.2f}%", level
+            ])
+            commands.append(('BACKGROUND', (0, i), (-1, i), row_colors[level]))
+        table = Table(table_data, colWidths=[2 * inch, 2 * inch, 1 * inch, 1 * inch], repeatRows=1)
+        table.setStyle(TableStyle(commands))
+        story.append(table)
+
+    doc.build(story)
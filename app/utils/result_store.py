@@ -0,0 +1,220 @@
+import os
+import json
+import glob
+import time
+
+import numpy as np
+
+from app.utils.embedding_store import atomic_write
+from app.utils.metrics import timed
+
+INDEX_SUFFIX = ".index.json"
+
+# Satu baris per pasangan, sudah terurut berdasarkan similarity (descending);
+# overlap = skor fingerprint token, structure = skor subtree AST
+# (NaN jika tidak dihitung atau file tidak bisa di-parse)
+PAIR_DTYPE = np.dtype([
+    ("left", "<i4"), ("right", "<i4"), ("score", "<f4"), ("overlap", "<f4"), ("structure", "<f4"),
+])
+
+
+def build_file_index(left, right, n_files):
+    """
+    Index urutan per file dalam format CSR: satu array int32 berisi
+    `offsets` (n_files + 1) disusul `ranks` (2 x jumlah pasangan).
+    ranks[offsets[f]:offsets[f + 1]] = rank (posisi di array pasangan terurut)
+    semua pasangan yang melibatkan file f, naik = similarity menurun.
+    """
+    # Entry 2k dan 2k+1 = pasangan rank k; sort stabil per file menjaga urutan rank.
+    # Dengan <= 65536 file, owner uint16 membuat NumPy memakai radix sort (O(n))
+    owners = np.stack([left, right], axis=1).ravel()
+    owners = owners.astype(np.uint16 if n_files <= 1 << 16 else np.int32)
+    order = np.argsort(owners, kind='stable')
+    offsets = np.zeros(n_files + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=n_files), out=offsets[1:])
+    return np.concatenate([offsets, order >> 1]).astype(np.int32)
+
+
+class ResultSet:
+    """
+    Hasil check yang tersimpan: pasangan terurut (memory-mapped) + nama file.
+    Baris ke-k (urutan yang tampil di UI) dibaca dalam O(1) tanpa scoring ulang;
+    pasangan per file dibaca dari index CSR (lihat build_file_index).
+    """
+
+    def __init__(self, pairs, file_names, info, file_index=None):
+        self.pairs = pairs
+        self.file_names = file_names
+        self.info = info
+        self._file_index = file_index
+        self._file_positions = None
+
+    @classmethod
+    def from_arrays(cls, file_names, left, right, scores, info=None, overlaps=None, structure=None):
+        """Bangun ResultSet di memori dari array pasangan yang belum terurut."""
+        # argsort stabil agar urutan skor yang sama identik dengan sorted(..., reverse=True)
+        order = np.argsort(-scores, kind='stable')
+        pairs = np.empty(order.shape[0], dtype=PAIR_DTYPE)
+        pairs["left"] = left[order]
+        pairs["right"] = right[order]
+        pairs["score"] = scores[order]
+        pairs["overlap"] = overlaps[order] if overlaps is not None else np.nan
+        pairs["structure"] = structure[order] if structure is not None else np.nan
+        return cls(pairs, list(file_names), info or {"result_id": None})
+
+    @property
+    def result_id(self):
+        return self.info["result_id"]
+
+    def __len__(self):
+        return int(self.pairs.shape[0])
+
+    def row(self, k):
+        pair = self.pairs[k]
+        row = {
+            'file_1': self.file_names[int(pair["left"])],
+            'file_2': self.file_names[int(pair["right"])],
+            'similarity': float(pair["score"] * 100)
+        }
+        # Result set lama (tanpa kolom overlap/structure) tetap bisa dibaca
+        names = self.pairs.dtype.names
+        if "overlap" in names and not np.isnan(pair["overlap"]):
+            row['fingerprint_similarity'] = float(pair["overlap"] * 100)
+        if "structure" in names and not np.isnan(pair["structure"]):
+            row['structural_similarity'] = float(pair["structure"] * 100)
+        return row
+
+    def rows(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [self.row(k) for k in range(start, stop)]
+
+    def to_list(self):
+        return self.rows()
+
+    @property
+    def file_index(self):
+        # Result set lama tanpa index tersimpan: bangun sekali di memori
+        if self._file_index is None:
+            self._file_index = build_file_index(self.pairs["left"], self.pairs["right"], len(self.file_names))
+        return self._file_index
+
+    def file_position(self, name):
+        """Indeks file di file_names, atau None."""
+        if self._file_positions is None:
+            self._file_positions = {file_name: i for i, file_name in enumerate(self.file_names)}
+        return self._file_positions.get(name)
+
+    def count_at_least(self, similarity):
+        """Jumlah pasangan teratas dengan similarity (persen, seperti row()) >= `similarity`."""
+        scores = self.pairs["score"]
+        # Binary search di array terurut menurun; hanya O(log n) elemen mmap yang dibaca
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if float(scores[mid] * np.float32(100)) >= similarity:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def file_ranks(self, file_position):
+        """Rank semua pasangan yang melibatkan file ini, urut similarity menurun."""
+        n = len(self.file_names)
+        offsets = self.file_index[:n + 1]
+        start, stop = int(offsets[file_position]), int(offsets[file_position + 1])
+        return self.file_index[n + 1 + start:n + 1 + stop]
+
+    def top_k_ranks(self, k):
+        """Gabungan k pasangan teratas setiap file (tanpa duplikat), urut similarity menurun."""
+        n = len(self.file_names)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.int32)
+        offsets = self.file_index[:n + 1].astype(np.int64)
+        positions = offsets[:-1, None] + np.arange(k)
+        positions = positions[positions < offsets[1:, None]]
+        return np.unique(self.file_index[n + 1 + positions])
+
+    def is_current(self, embedding_snapshot_id, model_signature):
+        return (
+            embedding_snapshot_id is not None
+            and self.info.get("embedding_snapshot_id") == embedding_snapshot_id
+            and self.info.get("model_signature") == model_signature
+        )
+
+
+@timed("save_result_set")
+def save_result_set(base_path, file_names, left, right, scores, embedding_snapshot_id, model_signature,
+                    overlaps=None, structure=None, exact_duplicates=None):
+    """
+    Simpan hasil scoring sebagai array pasangan terurut (.npy) + index JSON.
+    Pola tulisnya sama dengan embedding store: data unik per result_id,
+    index diganti terakhir secara atomik, file lama dibersihkan.
+    `exact_duplicates` = grup indeks file berisi identik (disimpan di index).
+    """
+    pairs = ResultSet.from_arrays(file_names, left, right, scores, overlaps=overlaps, structure=structure).pairs
+    file_index = build_file_index(pairs["left"], pairs["right"], len(file_names))
+
+    result_id = f"{embedding_snapshot_id or 'adhoc'}-{int(time.time() * 1000):x}"
+    data_file = f"{os.path.basename(base_path)}.{result_id}.pairs.npy"
+    file_index_file = f"{os.path.basename(base_path)}.{result_id}.files.npy"
+    atomic_write(os.path.join(os.path.dirname(base_path), data_file),
+                 lambda f: np.save(f, pairs, allow_pickle=False))
+    atomic_write(os.path.join(os.path.dirname(base_path), file_index_file),
+                 lambda f: np.save(f, file_index, allow_pickle=False))
+
+    info = {
+        "result_id": result_id,
+        "embedding_snapshot_id": embedding_snapshot_id,
+        "model_signature": model_signature,
+        "created_at": time.time(),
+        "pair_count": int(pairs.shape[0]),
+        "data_file": data_file,
+        "file_index_file": file_index_file,
+        "file_names": list(file_names),
+        "exact_duplicates": exact_duplicates or [],
+    }
+    atomic_write(base_path + INDEX_SUFFIX, lambda f: json.dump(info, f, ensure_ascii=False), mode="w")
+    _remove_stale_files(base_path, keep={data_file, file_index_file})
+    return ResultSet(pairs, list(file_names), info, file_index=file_index)
+
+
+@timed("load_result_set")
+def load_result_set(base_path, mmap=True):
+    """ResultSet tersimpan, atau None jika belum ada / sudah diinvalidasi."""
+    index_path = base_path + INDEX_SUFFIX
+    for attempt in range(2):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            directory = os.path.dirname(base_path)
+            pairs = np.load(os.path.join(directory, info["data_file"]), mmap_mode="r" if mmap else None,
+                            allow_pickle=False)
+            file_index = None
+            if info.get("file_index_file"):
+                file_index = np.load(os.path.join(directory, info["file_index_file"]),
+                                     mmap_mode="r" if mmap else None, allow_pickle=False)
+            return ResultSet(pairs, info["file_names"], info, file_index=file_index)
+        except FileNotFoundError:
+            # Result set diganti di antara baca index dan baca data; coba lagi
+            if attempt:
+                return None
+    return None
+
+
+def _remove_stale_files(base_path, keep):
+    for path in glob.glob(glob.escape(base_path) + ".*.npy"):
+        if os.path.basename(path) not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def delete_result_set(base_path):
+    """Invalidasi hasil tersimpan (dipanggil saat upload/reset mengubah file user)."""
+    if os.path.exists(base_path + INDEX_SUFFIX):
+        os.remove(base_path + INDEX_SUFFIX)
+    _remove_stale_files(base_path, keep=set())
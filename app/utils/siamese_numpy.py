@@ -0,0 +1,185 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _sigmoid(x):
+    # Bentuk stabil: tidak overflow untuk x sangat negatif
+    return np.exp(-np.logaddexp(0.0, -x))
+
+
+_ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0.0),
+    'sigmoid': _sigmoid,
+    'tanh': np.tanh,
+    'linear': lambda x: x,
+    None: lambda x: x,
+}
+
+
+def _layer_weights(group, layer_name):
+    """Dataset bobot sebuah layer di file .h5 Keras, dipetakan nama pendek -> array."""
+    # Keras 3 menyimpan sebagai <layer>/<layer>/<weight>; Keras 2 dengan suffix ':0'
+    node = group[layer_name]
+    while len(node.keys()) == 1 and layer_name in node:
+        node = node[layer_name]
+    weights = {}
+    node.visititems(
+        lambda name, obj: weights.__setitem__(name.split('/')[-1].split(':')[0], np.asarray(obj, dtype=np.float32))
+        if hasattr(obj, 'shape') else None
+    )
+    return weights
+
+
+class NumpySiameseModel:
+    """
+    Siamese head dari file .h5 yang dijalankan dengan NumPy murni.
+
+    Tower bersama (Dense + BatchNormalization, Dropout diabaikan saat
+    inferensi) dihitung sekali per file, bukan sekali per pasangan. Skor
+    pasangan = sigmoid(w * (1 - mean|t_i - t_j|) + b), sama dengan graph
+    Keras: Lambda euclidean_distance -> Lambda (1 - x) -> Dense(1, sigmoid).
+    """
+
+    def __init__(self, tower_layers, head_kernel, head_bias, head_activation='sigmoid'):
+        self.tower_layers = tower_layers
+        self.head_kernel = float(head_kernel)
+        self.head_bias = float(head_bias)
+        self.head_activation = _ACTIVATIONS[head_activation]
+
+    @classmethod
+    def from_h5(cls, path):
+        import h5py
+
+        with h5py.File(path, 'r') as f:
+            config = json.loads(f.attrs['model_config'])
+            weights_root = f['model_weights'] if 'model_weights' in f else f
+            layers = config['config']['layers']
+
+            tower_config = next(l for l in layers if l['class_name'] == 'Sequential')
+            tower_name = tower_config['config']['name']
+            tower_group = weights_root[tower_name]
+            if tower_name in tower_group:
+                tower_group = tower_group[tower_name]
+
+            tower_layers = []
+            for layer in tower_config['config']['layers']:
+                kind, cfg = layer['class_name'], layer['config']
+                if kind == 'Dense':
+                    w = _layer_weights(tower_group, cfg['name'])
+                    tower_layers.append(('dense', w['kernel'], w.get('bias'), cfg.get('activation')))
+                elif kind == 'BatchNormalization':
+                    w = _layer_weights(tower_group, cfg['name'])
+                    # Lipat BN (moving stats) menjadi transformasi affine x * scale + shift
+                    scale = w.get('gamma', 1.0) / np.sqrt(w['moving_variance'] + cfg.get('epsilon', 1e-3))
+                    shift = w.get('beta', 0.0) - w['moving_mean'] * scale
+                    tower_layers.append(('affine', scale.astype(np.float32), shift.astype(np.float32)))
+                elif kind in ('InputLayer', 'Dropout'):
+                    continue
+                else:
+                    raise ValueError(f"Unsupported tower layer for NumPy engine: {kind}")
+
+            head_config = [l for l in layers if l['class_name'] == 'Dense'][-1]
+            head = _layer_weights(weights_root, head_config['config']['name'])
+
+        return cls(
+            tower_layers,
+            head['kernel'].reshape(-1)[0],
+            head['bias'].reshape(-1)[0] if 'bias' in head else 0.0,
+            head_config['config'].get('activation', 'sigmoid'),
+        )
+
+    def tower(self, embeddings):
+        x = np.asarray(embeddings, dtype=np.float32)
+        for layer in self.tower_layers:
+            if layer[0] == 'dense':
+                _, kernel, bias, activation = layer
+                x = x @ kernel
+                if bias is not None:
+                    x = x + bias
+                x = _ACTIVATIONS[activation](x)
+            else:
+                _, scale, shift = layer
+                x = x * scale + shift
+        return x.astype(np.float32, copy=False)
+
+    def _head(self, distance):
+        return self.head_activation(self.head_kernel * (1.0 - distance) + self.head_bias).astype(np.float32)
+
+    def score_pairs(self, embeddings, left, right, block=65536, progress=None):
+        """Skor pasangan tertentu (indeks left[k], right[k]), per blok `block` pasangan."""
+        towers = self.tower(embeddings)
+        scores = np.empty(len(left), dtype=np.float32)
+        for start in range(0, len(left), block):
+            stop = min(start + block, len(left))
+            distance = np.abs(towers[left[start:stop]] - towers[right[start:stop]]).mean(axis=1)
+            scores[start:stop] = self._head(distance)
+            if progress is not None:
+                progress(stop / len(left))
+        return scores
+
+    def score_all_pairs(self, embeddings, max_block_bytes=64 * 1024 * 1024, threads=1, progress=None):
+        """
+        Skor semua pasangan i < j. Urutan output sama dengan np.triu_indices
+        (indeks int32) sehingga bisa langsung menggantikan compare.score_pairs.
+
+        Jarak L1 dihitung per blok baris: intermediate (rows x N x dim) dibatasi
+        `max_block_bytes`, dan blok dapat dijalankan paralel di `threads` thread
+        (operasi NumPy besar melepas GIL).
+        """
+        towers = self.tower(embeddings)
+        n, dim = towers.shape
+        total = n * (n - 1) // 2
+        # Indeks int32 (bukan int64 dari np.triu_indices) agar N besar tetap hemat memori
+        left = np.empty(total, dtype=np.int32)
+        right = np.empty(total, dtype=np.int32)
+        scores = np.empty(total, dtype=np.float32)
+        if n < 2:
+            return left, right, scores
+
+        block_rows = max(1, int(max_block_bytes // max(n * dim * 4, 1)))
+        blocks = [(start, min(start + block_rows, n - 1)) for start in range(0, n - 1, block_rows)]
+        # Offset baris i di array condensed: jumlah pasangan dari baris sebelum i
+        row_offsets = np.concatenate(([0], np.cumsum(np.arange(n - 1, 0, -1))))
+        done = [0]
+        lock = threading.Lock()
+
+        def run_block(block):
+            start, stop = block
+            rows = towers[start:stop]
+            cols = towers[start + 1:]
+            distance = np.abs(rows[:, None, :] - cols[None, :, :]).mean(axis=2)
+            block_scores = self._head(distance)
+            for r, i in enumerate(range(start, stop)):
+                # Kolom j > i pada baris r dimulai dari (i - start)
+                segment = slice(row_offsets[i], row_offsets[i + 1])
+                scores[segment] = block_scores[r, i - start:]
+                left[segment] = i
+                right[segment] = np.arange(i + 1, n, dtype=np.int32)
+            if progress is not None:
+                with lock:
+                    done[0] += stop - start
+                    fraction = done[0] / (n - 1)
+                progress(fraction)
+
+        if threads and threads > 1 and len(blocks) > 1:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(run_block, blocks))
+        else:
+            for block in blocks:
+                run_block(block)
+
+        return left, right, scores
+
+
+def verify_against_keras(numpy_model, keras_model, embeddings, atol=1e-5):
+    """Bandingkan skor NumPy dengan output Keras; kembalikan selisih absolut maksimum."""
+    left, right, scores = numpy_model.score_all_pairs(embeddings)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    expected = np.asarray(keras_model([matrix[left], matrix[right]], training=False)).reshape(-1)
+    max_error = float(np.max(np.abs(scores - expected))) if scores.size else 0.0
+    if max_error > atol:
+        raise RuntimeError(f"NumPy engine deviates from Keras by {max_error:.2e} (atol {atol:.0e})")
+    return max_error
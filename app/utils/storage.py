@@ -0,0 +1,408 @@
+import os
+import json
+import shutil
+import threading
+from collections import namedtuple
+
+from flask import current_app
+
+from app.utils.embedding_store import atomic_write
+
+_COPY_CHUNK = 1024 * 1024
+# Metadata sinkronisasi per folder (key -> etag objek yang sedang ada di lokal)
+STATE_FILE = '.storage_etags.json'
+# File yang hanya berarti di host ini dan tidak pernah di-upload
+_LOCAL_ONLY_SUFFIXES = ('.lock', '.tmp', STATE_FILE)
+
+StoredObject = namedtuple('StoredObject', ['key', 'size', 'etag'])
+
+
+class LocalStorage:
+    """
+    Storage di filesystem lokal: key = path relatif terhadap `root`.
+    Folder lokal sekaligus sumber kebenaran, jadi fetch/publish/sync no-op.
+    """
+
+    is_remote = False
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        """Path lokal untuk key (untuk backend remote: lokasi cache)."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def key(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def open(self, key):
+        """Stream baca (file-like, read(n)) isi objek."""
+        return open(self.path(key), 'rb')
+
+    def write(self, key, stream):
+        """Tulis isi stream ke key tanpa memuat seluruhnya ke memori."""
+        atomic_write(self.path(key), lambda f: shutil.copyfileobj(stream, f, _COPY_CHUNK))
+
+    def list(self, prefix='', batch_size=1000):
+        """Yield list StoredObject (maks. `batch_size` per batch) untuk key berawalan `prefix`."""
+        directory, _, name_prefix = prefix.rpartition('/')
+        batch = []
+        try:
+            entries = os.scandir(self.path(directory) if directory else self.root)
+        except FileNotFoundError:
+            return
+        with entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.startswith(name_prefix):
+                    continue
+                stat = entry.stat()
+                key = f"{directory}/{entry.name}" if directory else entry.name
+                batch.append(StoredObject(key, stat.st_size, f"{stat.st_mtime_ns:x}-{stat.st_size:x}"))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix):
+        for batch in self.list(prefix):
+            for obj in batch:
+                self.delete(obj.key)
+
+    def fetch(self, key):
+        """Path lokal berisi versi terbaru objek, atau None jika objek tidak ada."""
+        path = self.path(key)
+        return path if os.path.isfile(path) else None
+
+    def publish(self, key):
+        """Upload salinan lokal key ke storage bersama."""
+
+    def sync(self, prefix):
+        """Samakan salinan lokal semua key berawalan `prefix` dengan storage bersama."""
+
+
+class S3Storage(LocalStorage):
+    """
+    Storage S3-compatible (AWS S3, MinIO, ...) dengan read-through cache lokal.
+
+    Objek disimpan di `<bucket>/<prefix><key>`; salinan lokal ada di `cache_dir`
+    dengan layout yang sama seperti LocalStorage, sehingga kode yang bekerja
+    pada path (embedding, fingerprint, scoring) tetap membaca disk lokal.
+    Etag objek yang sedang di-cache dicatat per folder di `.storage_etags.json`;
+    fetch() hanya melakukan HEAD jika etag masih sama, dan file data yang
+    namanya memuat snapshot id (immutable) tidak pernah di-download dua kali.
+    boto3 baru di-import saat backend ini dibuat.
+    """
+
+    is_remote = True
+
+    def __init__(self, bucket, cache_dir, prefix='', endpoint_url=None, region=None, client=None):
+        super().__init__(cache_dir)
+        self.bucket = bucket
+        self.prefix = prefix
+        if client is None:
+            # Dependency opsional: hanya dibutuhkan dengan STORAGE_BACKEND=s3 (pip install boto3)
+            import boto3
+
+            client = boto3.client('s3', endpoint_url=endpoint_url or None, region_name=region or None)
+        self.client = client
+        self._lock = threading.Lock()
+
+    def _object_key(self, key):
+        return self.prefix + key
+
+    # --- etag cache per folder -------------------------------------------------
+
+    def _state_path(self, key):
+        return os.path.join(os.path.dirname(self.path(key)), STATE_FILE)
+
+    def _read_state(self, key):
+        try:
+            with open(self._state_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_state(self, key, changes):
+        """changes: key -> etag (None = hapus). Satu tulis per folder."""
+        with self._lock:
+            state = self._read_state(key)
+            for changed_key, etag in changes.items():
+                if etag is None:
+                    state.pop(changed_key, None)
+                else:
+                    state[changed_key] = etag
+            atomic_write(self._state_path(key), lambda f: json.dump(state, f), mode='w')
+
+    # --- operasi objek ---------------------------------------------------------
+
+    @staticmethod
+    def _missing(error):
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+
+    def write(self, key, stream):
+        # upload_fileobj memakai multipart upload untuk stream besar
+        self.client.upload_fileobj(stream, self.bucket, self._object_key(key))
+
+    def list(self, prefix='', batch_size=1000):
+        paginator = self.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.bucket, Prefix=self._object_key(prefix),
+            PaginationConfig={'PageSize': batch_size},
+        )
+        for page in pages:
+            batch = [
+                StoredObject(item['Key'][len(self.prefix):], item['Size'], item['ETag'].strip('"'))
+                for item in page.get('Contents', [])
+            ]
+            if batch:
+                yield batch
+
+    def _head(self, key):
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._missing(e):
+                return None
+            raise
+        return response['ETag'].strip('"')
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self._drop_local(key)
+
+    def delete_prefix(self, prefix):
+        for batch in self.list(prefix):
+            # delete_objects menerima maks. 1000 key per request
+            for start in range(0, len(batch), 1000):
+                chunk = batch[start:start + 1000]
+                self.client.delete_objects(
+                    Bucket=self.bucket,
+                    Delete={'Objects': [{'Key': self._object_key(obj.key)} for obj in chunk], 'Quiet': True},
+                )
+            for obj in batch:
+                self._drop_local(obj.key)
+
+    def _drop_local(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+        self._update_state(key, {key: None})
+
+    def _download(self, key):
+        """Download objek ke cache lokal (streaming, atomic); returns etag atau None jika hilang."""
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._missing(e):
+                return None
+            raise
+        body = response['Body']
+        atomic_write(self.path(key), lambda f: shutil.copyfileobj(body, f, _COPY_CHUNK))
+        return response['ETag'].strip('"')
+
+    def fetch(self, key, etag=None):
+        """
+        Read-through: path lokal berisi versi terbaru objek, atau None jika
+        objek tidak ada. `etag` dari listing (jika ada) menghemat satu HEAD.
+        """
+        path = self.path(key)
+        cached = self._read_state(key).get(key)
+        if etag is None and cached is not None and os.path.isfile(path):
+            etag = self._head(key)
+            if etag is None:
+                self._drop_local(key)
+                return None
+        if etag is not None and etag == cached and os.path.isfile(path):
+            return path
+        etag = self._download(key)
+        if etag is None:
+            self._drop_local(key)
+            return None
+        self._update_state(key, {key: etag})
+        return path
+
+    def fetch_immutable(self, key):
+        """Seperti fetch(), tetapi salinan lokal yang sudah ada langsung dipakai (nama memuat versi)."""
+        path = self.path(key)
+        return path if os.path.isfile(path) else self.fetch(key)
+
+    def publish(self, key):
+        path = self.path(key)
+        with open(path, 'rb') as f:
+            self.write(key, f)
+        self._update_state(key, {key: self._head(key)})
+
+    def sync(self, prefix):
+        """
+        Mirror satu prefix lewat listing batch: objek baru/berubah di-download,
+        salinan lokal dari objek yang sudah dihapus di host lain ikut dihapus.
+        File lokal yang belum pernah di-publish tidak disentuh.
+        """
+        remote = {}
+        for batch in self.list(prefix):
+            remote.update((obj.key, obj.etag) for obj in batch)
+
+        # Prefix selalu satu folder, jadi state etag-nya satu file
+        probe = prefix + '_'
+        state = self._read_state(probe)
+        changes = {}
+        for key, etag in remote.items():
+            if key.endswith(_LOCAL_ONLY_SUFFIXES):
+                continue
+            if state.get(key) == etag and os.path.isfile(self.path(key)):
+                continue
+            changes[key] = self._download(key)
+
+        for key in state:
+            if key.startswith(prefix) and key not in remote:
+                try:
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+                changes[key] = None
+        if changes:
+            self._update_state(probe, changes)
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+# Area storage -> setting folder lokal (untuk S3: folder cache)
+AREAS = {
+    'uploads': 'UPLOAD_FOLDER',
+    'embeddings': 'EMBEDDINGS_FOLDER',
+    'results': 'RESULTS_FOLDER',
+}
+
+
+def get_storage(area):
+    """Backend storage per area ('uploads', 'embeddings', 'results'), dibuat dari config app."""
+    storage = _storages.get(area)
+    if storage is None:
+        with _storages_lock:
+            storage = _storages.get(area)
+            if storage is None:
+                config = current_app.config
+                root = config[AREAS[area]]
+                if config.get('STORAGE_BACKEND', 'local') == 's3':
+                    storage = S3Storage(
+                        config['STORAGE_S3_BUCKET'], root,
+                        prefix=f"{config.get('STORAGE_S3_PREFIX', '')}{area}/",
+                        endpoint_url=config.get('STORAGE_S3_ENDPOINT_URL'),
+                        region=config.get('STORAGE_S3_REGION'),
+                    )
+                else:
+                    storage = LocalStorage(root)
+                _storages[area] = storage
+    return storage
+
+
+def user_uploads_prefix(user_id):
+    return f"user_{user_id}/"
+
+
+def sync_user_uploads(user_id):
+    """Pastikan folder upload lokal user sama dengan storage bersama (no-op untuk local)."""
+    storage = get_storage('uploads')
+    if storage.is_remote:
+        storage.sync(user_uploads_prefix(user_id))
+    return storage
+
+
+def publish_uploads(user_id, names):
+    """Publish file yang baru ditulis di folder upload lokal user."""
+    storage = get_storage('uploads')
+    if not storage.is_remote:
+        return
+    for name in names:
+        if not name.endswith(_LOCAL_ONLY_SUFFIXES):
+            storage.publish(user_uploads_prefix(user_id) + name)
+
+
+def _store_files(storage, index_key):
+    """Key file data yang dirujuk index embedding store / result set (data_file, chunks_file, file_index_file)."""
+    try:
+        with open(storage.path(index_key), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return []
+    directory = index_key.rpartition('/')[0]
+    names = [index.get('data_file'), index.get('chunks_file'), index.get('file_index_file')]
+    return [f"{directory}/{name}" if directory else name for name in names if name]
+
+
+def pull_store(area, index_path):
+    """
+    Read-through untuk store berbasis index (embedding store, result set):
+    index (kecil, mutable) divalidasi dengan etag, file data yang namanya
+    memuat snapshot id diambil sekali lalu dipakai dari disk lokal.
+    """
+    storage = get_storage(area)
+    if not storage.is_remote:
+        return
+    index_key = storage.key(index_path)
+    if storage.fetch(index_key) is None:
+        return
+    for key in _store_files(storage, index_key):
+        storage.fetch_immutable(key)
+
+
+def publish_store(area, index_path):
+    """Publish file data dulu, index terakhir, agar host lain tidak melihat index tanpa data."""
+    storage = get_storage(area)
+    if not storage.is_remote or not os.path.exists(index_path):
+        return
+    index_key = storage.key(index_path)
+    data_keys = _store_files(storage, index_key)
+    for key in data_keys:
+        storage.publish(key)
+    storage.publish(index_key)
+    # Snapshot lama tidak lagi dirujuk index mana pun
+    base_prefix = index_key[:-len('.index.json')] + '.'
+    for batch in storage.list(base_prefix):
+        for obj in batch:
+            if obj.key.endswith('.npy') and obj.key not in data_keys:
+                storage.delete(obj.key)
+
+
+def pull_file(area, path):
+    storage = get_storage(area)
+    if storage.is_remote:
+        storage.fetch(storage.key(path))
+
+
+def publish_file(area, path):
+    storage = get_storage(area)
+    if storage.is_remote and os.path.exists(path):
+        storage.publish(storage.key(path))
+
+
+def delete_file(area, path):
+    """Hapus dari storage bersama (salinan lokal dihapus oleh pemanggil)."""
+    storage = get_storage(area)
+    if storage.is_remote:
+        storage.delete(storage.key(path))
+
+
+def delete_store(area, index_path):
+    storage = get_storage(area)
+    if storage.is_remote:
+        storage.delete_prefix(storage.key(index_path)[:-len('.index.json')] + '.')
@@ -0,0 +1,146 @@
+import ast
+import zlib
+import hashlib
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.embedding_cache import EmbeddingCache, cache_key, content_hash, normalize_source
+from app.utils.fingerprint import set_overlaps
+from app.utils.metrics import timed
+
+# Versi normalisasi; ganti jika aturan hashing berubah agar cache lama tidak dipakai
+STRUCTURE_TAG = "ast-subtree:v1"
+
+_MASK = (1 << 64) - 1
+_PRIME = 1099511628211
+# Context Load/Store/Del tidak membawa struktur; identifier dan docstring diabaikan
+_IGNORED_NODES = (ast.expr_context,)
+_LABELS = {}
+
+
+def _label(name):
+    label = _LABELS.get(name)
+    if label is None:
+        label = _LABELS[name] = zlib.crc32(name.encode('utf-8'))
+    return label
+
+
+def _node_label(node):
+    """Label node setelah anonimisasi: tipe node, tanpa nama identifier atau nilai literal."""
+    if isinstance(node, ast.Constant):
+        return _label(f"Constant:{type(node.value).__name__}")
+    return _label(type(node).__name__)
+
+
+def tree_signature(source, min_nodes=4):
+    """
+    Signature struktur: himpunan hash subtree AST (uint64, unik, terurut).
+
+    Nama variabel/fungsi/atribut dan nilai literal dianonimkan, sehingga
+    rename tidak mengubah hash; urutan helper tidak berpengaruh karena yang
+    dibandingkan adalah himpunan subtree. Hanya subtree dengan minimal
+    `min_nodes` node yang disimpan. Returns None jika file tidak bisa di-parse.
+    """
+    try:
+        with warnings.catch_warnings():
+            # SyntaxWarning (mis. escape sequence) dari kode mahasiswa tidak relevan
+            warnings.simplefilter('ignore')
+            tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+
+    hashes = []
+    iter_children = ast.iter_child_nodes
+
+    def visit(node):
+        value = _node_label(node)
+        size = 1
+        for child in iter_children(node):
+            if isinstance(child, _IGNORED_NODES):
+                continue
+            child_hash, child_size = visit(child)
+            value = (value * _PRIME + child_hash) & _MASK
+            size += child_size
+        if size >= min_nodes:
+            hashes.append(value)
+        return value, size
+
+    try:
+        visit(tree)
+    except RecursionError:
+        return None
+    return np.unique(np.array(hashes, dtype=np.uint64))
+
+
+def get_structure_cache(config):
+    return EmbeddingCache(config['STRUCTURE_CACHE_FOLDER'], max_entries=config.get('STRUCTURE_CACHE_MAX_ENTRIES', 0))
+
+
+class StructureSet:
+    """Signature struktur per file (None = gagal di-parse) milik satu user."""
+
+    def __init__(self, names, hashes, signatures):
+        self.names = list(names)
+        self.hashes = list(hashes)
+        self.signatures = list(signatures)
+        self._rows = {name: i for i, name in enumerate(self.names)}
+
+    @property
+    def snapshot_id(self):
+        digest = hashlib.sha256(STRUCTURE_TAG.encode('utf-8'))
+        for name, file_hash in zip(self.names, self.hashes):
+            digest.update(f"\0{name}\0{file_hash}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def signature(self, name):
+        row = self._rows.get(name)
+        return self.signatures[row] if row is not None else None
+
+    def parsed(self, file_names):
+        """Mask file yang berhasil di-parse (pasangan lain tidak punya skor struktur)."""
+        return np.array([self.signature(name) is not None for name in file_names], dtype=bool)
+
+    def pair_overlaps(self, file_names, max_df=0.5):
+        """Overlap himpunan subtree-hash per pasangan; lihat fingerprint.set_overlaps()."""
+        return set_overlaps([self.signature(name) for name in file_names], max_df=max_df)
+
+
+@timed('build_structures')
+def build_structures(folder_path, config, progress=None):
+    """
+    Parse semua file .py di folder user sekali dan kembalikan StructureSet.
+    Signature di-cache di disk berdasarkan content hash (dipakai bersama semua
+    user); file yang tidak bisa di-parse dicatat sebagai array kosong di cache.
+    """
+    from app.utils.embedding import _iter_python_files, _read_text_robust
+
+    min_nodes = config.get('STRUCTURE_MIN_NODES', 4)
+    tag = f"{STRUCTURE_TAG}:min{min_nodes}"
+    cache = get_structure_cache(config)
+
+    paths = sorted(_iter_python_files(folder_path), key=lambda p: p.name)
+    names, hashes, signatures = [], [], []
+    misses = 0
+    for i, path in enumerate(paths):
+        source = normalize_source(_read_text_robust(Path(path)))
+        file_hash = content_hash(source)
+        key = cache_key(file_hash, tag)
+        signature = cache.get(key)
+        if signature is None:
+            misses += 1
+            signature = tree_signature(source, min_nodes=min_nodes)
+            cache.put(key, signature if signature is not None else np.empty(0, dtype=np.uint64), dtype=np.uint64)
+        if signature is not None and signature.size == 0:
+            signature = None
+        names.append(path.name)
+        hashes.append(file_hash)
+        signatures.append(signature)
+        if progress is not None:
+            progress((i + 1) / len(paths))
+
+    # Cache hanya bertambah saat ada miss; tanpa miss tidak perlu scan direktori
+    if misses:
+        cache.prune()
+    return StructureSet(names, hashes, signatures)
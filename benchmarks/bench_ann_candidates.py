@@ -0,0 +1,95 @@
+"""
+Benchmark: scoring exhaustive (semua pasangan) vs kandidat ANN (IVF, top-k).
+
+Usage:
+    python benchmarks/bench_ann_candidates.py
+    python benchmarks/bench_ann_candidates.py --sizes 1000 3000 --top-k 10 20 40 --n-probe 8
+
+Korpus sintetis: kelompok tugas (cluster) berisi beberapa grup near-duplicate
+(file hasil salin-ubah). Recall dihitung terhadap pasangan exhaustive dengan
+skor >= --threshold, pasangan teratas exhaustive (--top-pairs per file) dan
+pasangan near-duplicate yang ditanam. Index dibangun di ruang output tower
+(metric l2), sama seperti score_embeddings dengan engine NumPy.
+Waktu ANN = tower + build index + search + scoring kandidat.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config  # noqa: E402
+from app.utils.ann_index import candidate_pairs  # noqa: E402
+from app.utils.siamese_numpy import NumpySiameseModel  # noqa: E402
+
+
+def clustered_embeddings(n, dim=768, assignments=20, group_size=4, noise=0.15, seed=0):
+    """Embedding per tugas + grup near-duplicate; kembalikan (vektor, pasangan duplikat tertanam)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((assignments, dim))
+    vectors = centers[rng.integers(0, assignments, n)] + rng.standard_normal((n, dim))
+    planted = set()
+    order = rng.permutation(n)
+    for start in range(0, n // 4, group_size):
+        group = order[start:start + group_size]
+        base = vectors[group[0]]
+        for i in group:
+            vectors[i] = base + noise * rng.standard_normal(dim)
+        planted.update((int(min(a, b)), int(max(a, b))) for a in group for b in group if a != b)
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), planted
+
+
+def pair_keys(left, right, n):
+    return set((left.astype(np.int64) * n + right).tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1000, 3000])
+    parser.add_argument('--top-k', type=int, nargs='+', default=[Config.ANN_TOP_K])
+    parser.add_argument('--n-probe', type=int, default=Config.ANN_NPROBE)
+    parser.add_argument('--threshold', type=float, default=0.5, help='skor minimum pasangan "mirip"')
+    parser.add_argument('--top-pairs', type=int, default=5, help='pasangan teratas per file untuk recall')
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    args = parser.parse_args()
+
+    model = NumpySiameseModel.from_h5(args.model)
+    print(f"{'files':>6} {'k':>4} {'exhaustive':>11} {'ann':>9} {'speedup':>8} "
+          f"{'pairs scored':>17} {'recall >=thr':>13} {'recall top':>11} {'recall dup':>11}")
+    for n in args.sizes:
+        vectors, planted = clustered_embeddings(n)
+
+        start = time.perf_counter()
+        left, right, scores = model.score_all_pairs(
+            vectors, max_block_bytes=Config.SCORING_MAX_BLOCK_BYTES, threads=args.threads
+        )
+        exhaustive_seconds = time.perf_counter() - start
+
+        top = np.argsort(-scores, kind='stable')[:args.top_pairs * n]
+        expected_top = pair_keys(left[top], right[top], n)
+        expected_dup = {a * n + b for a, b in planted}
+        above = scores >= args.threshold
+        expected_above = pair_keys(left[above], right[above], n)
+
+        for k in args.top_k:
+            start = time.perf_counter()
+            ann_left, ann_right = candidate_pairs(model.tower(vectors), k=k, n_probe=args.n_probe, metric='l2')
+            model.score_pairs(vectors, ann_left, ann_right)
+            ann_seconds = time.perf_counter() - start
+
+            found = pair_keys(ann_left, ann_right, n)
+            recall_above = len(found & expected_above) / max(len(expected_above), 1)
+            recall_top = len(found & expected_top) / max(len(expected_top), 1)
+            recall_dup = len(found & expected_dup) / max(len(expected_dup), 1)
+            print(f"{n:>6} {k:>4} {exhaustive_seconds * 1000:>9.0f}ms {ann_seconds * 1000:>7.0f}ms "
+                  f"{exhaustive_seconds / ann_seconds:>7.1f}x {len(ann_left):>8}/{len(scores):<8} "
+                  f"{recall_above:>12.1%} {recall_top:>10.1%} {recall_dup:>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: submission baru x korpus referensi (mode korpus, lihat app/utils/corpus.py).
+
+Usage:
+    python benchmarks/bench_corpus.py
+    python benchmarks/bench_corpus.py --new 100 --corpus 5000 20000 --top-k 20 --n-probe 8
+
+Korpus sintetis: embedding per tugas (cluster) ditambah noise; sebagian
+submission baru adalah salinan-ubah file korpus (pasangan tertanam).
+Untuk setiap ukuran korpus diukur:
+  cold      = build index IVF korpus + cari kandidat + scoring (check pertama)
+  warm      = index dibaca dari disk + cari kandidat + scoring (check berikutnya)
+  exhaustive = scoring semua pasangan baru x korpus (pembanding)
+Recall dihitung terhadap pasangan tertanam dan top pasangan exhaustive per file baru.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config  # noqa: E402
+from app.utils.compare import score_corpus_edges  # noqa: E402
+from app.utils.corpus import Corpus  # noqa: E402
+from app.utils.embedding_store import load_embedding_store, save_embedding_store  # noqa: E402
+from app.utils.model_registry import get_model  # noqa: E402
+
+
+def synthetic_vectors(n_new, n_corpus, dim=768, assignments=50, copy_ratio=0.2, noise=0.15, seed=0):
+    """(vektor baru, vektor korpus, {indeks baru: indeks korpus yang disalin})."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((assignments, dim))
+    corpus = centers[rng.integers(0, assignments, n_corpus)] + rng.standard_normal((n_corpus, dim))
+    new = centers[rng.integers(0, assignments, n_new)] + rng.standard_normal((n_new, dim))
+    copied = rng.choice(n_corpus, int(n_new * copy_ratio), replace=False)
+    planted = {}
+    for i, source in enumerate(copied):
+        new[i] = corpus[source] + noise * rng.standard_normal(dim)
+        planted[i] = int(source)
+
+    def normalize(vectors):
+        vectors = vectors.astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return normalize(new), normalize(corpus), planted
+
+
+def build_corpus(folder, vectors):
+    base_path = os.path.join(folder, 'corpus_bench')
+    entries = {
+        f"bench/{i:06d}.py": {
+            "embedding": vector, "file_name": f"bench/{i:06d}.py", "content_hash": str(i), "label": "bench",
+        }
+        for i, vector in enumerate(vectors)
+    }
+    save_embedding_store(base_path, entries, {"model_tag": "bench", "file_count": len(entries)})
+    return Corpus(base_path, load_embedding_store(base_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--new', type=int, default=100)
+    parser.add_argument('--corpus', type=int, nargs='+', default=[5000, 20000])
+    parser.add_argument('--top-k', type=int, default=Config.CORPUS_TOP_K)
+    parser.add_argument('--n-probe', type=int, default=Config.CORPUS_NPROBE)
+    parser.add_argument('--top-pairs', type=int, default=5, help='pasangan exhaustive teratas per file untuk recall')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(SCORING_ENGINE='numpy', CORPUS_TOP_K=args.top_k, CORPUS_NPROBE=args.n_probe)
+
+    print(f"{'new':>5} {'corpus':>7} {'cold':>9} {'warm':>9} {'exhaustive':>11} "
+          f"{'pairs scored':>20} {'recall dup':>11} {'recall top':>11}")
+    with app.app_context():
+        model = get_model(engine='numpy')
+        for n_corpus in args.corpus:
+            new, corpus_vectors, planted = synthetic_vectors(args.new, n_corpus)
+            folder = tempfile.mkdtemp(prefix='codescan-corpus-')
+            try:
+                corpus = build_corpus(folder, corpus_vectors)
+                timings = []
+                for _ in range(2):
+                    start = time.perf_counter()
+                    ids, left, right, _ = score_corpus_edges(new, corpus, None, app.config)
+                    timings.append(time.perf_counter() - start)
+                found = set((left.astype(np.int64) * n_corpus + ids[right]).tolist())
+
+                start = time.perf_counter()
+                all_left = np.repeat(np.arange(args.new, dtype=np.int32), n_corpus)
+                all_right = np.tile(np.arange(n_corpus, dtype=np.int32), args.new) + args.new
+                scores = model.score_pairs(np.concatenate([new, corpus_vectors]), all_left, all_right)
+                exhaustive_seconds = time.perf_counter() - start
+
+                top = np.argsort(-scores.reshape(args.new, n_corpus), axis=1)[:, :args.top_pairs]
+                expected_top = set((np.arange(args.new)[:, None] * n_corpus + top).reshape(-1).tolist())
+                expected_dup = {i * n_corpus + source for i, source in planted.items()}
+                recall_dup = len(found & expected_dup) / max(len(expected_dup), 1)
+                recall_top = len(found & expected_top) / max(len(expected_top), 1)
+                print(f"{args.new:>5} {n_corpus:>7} {timings[0] * 1000:>7.0f}ms {timings[1] * 1000:>7.0f}ms "
+                      f"{exhaustive_seconds * 1000:>9.0f}ms {len(left):>9}/{len(scores):<10} "
+                      f"{recall_dup:>10.1%} {recall_top:>10.1%}")
+            finally:
+                shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
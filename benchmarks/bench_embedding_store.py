@@ -0,0 +1,87 @@
+"""
+Benchmark: JSON embedding lama (indent=2) vs store biner .npy + index.
+
+Usage:
+    python benchmarks/bench_embedding_store.py
+    python benchmarks/bench_embedding_store.py --files 50 300 1000 --dtype float16
+
+Mengukur ukuran di disk dan waktu load (sampai matriks siap dipakai)
+untuk kedua format.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.embedding_store import load_embedding_store, save_embedding_store  # noqa: E402
+
+
+def legacy_load(path):
+    """Salinan load_embeddings lama: json.load lalu np.array per entry."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    embeddings_data = data["embeddings"]
+    return [np.array(embeddings_data[n]["embedding"]) for n in embeddings_data]
+
+
+def directory_size(directory, prefix):
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.startswith(prefix)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, nargs='+', default=[50, 300, 1000])
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float16'])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'files':>6} {'json size':>12} {'store size':>12} {'json load':>11} {'store load':>11}")
+    for n in args.files:
+        vectors = rng.standard_normal((n, 768)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        embeddings_dict = {
+            f"Mahasiswa_{i:04d}.py": {
+                "embedding": vectors[i].tolist(),
+                "file_path": f"/uploads/user_x/Mahasiswa_{i:04d}.py",
+                "file_name": f"Mahasiswa_{i:04d}.py",
+            }
+            for i in range(n)
+        }
+        metadata = {"user_id": "bench", "timestamp": datetime.datetime.now().isoformat(), "file_count": n}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "legacy_bench.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"metadata": metadata, "embeddings": embeddings_dict}, f, indent=2, ensure_ascii=False)
+            store_base = os.path.join(tmp, "store_bench")
+            save_embedding_store(store_base, embeddings_dict, metadata, dtype=args.dtype)
+
+            start = time.perf_counter()
+            np.asarray(legacy_load(json_path), dtype=np.float32)
+            json_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            np.asarray(load_embedding_store(store_base).matrix, dtype=np.float32)
+            store_seconds = time.perf_counter() - start
+
+            json_size = os.path.getsize(json_path)
+            store_size = directory_size(tmp, "store_bench")
+
+        print(f"{n:>6} {json_size / 1024:>10.0f}KB {store_size / 1024:>10.0f}KB "
+              f"{json_seconds * 1000:>9.1f}ms {store_seconds * 1000:>9.1f}ms "
+              f"({json_size / store_size:.0f}x smaller, {json_seconds / store_seconds:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
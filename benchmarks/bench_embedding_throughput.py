@@ -0,0 +1,106 @@
+"""
+Benchmark CPU: loop per-file get_embedding_from_code vs get_embeddings_batched.
+
+Usage:
+    python benchmarks/bench_embedding_throughput.py
+    python benchmarks/bench_embedding_throughput.py --files 200 --max-batch-tokens 16384 --threads 4
+    python benchmarks/bench_embedding_throughput.py --chunked --max-lines 600
+
+Korpus sintetis berisi file Python dengan panjang bervariasi sehingga
+efek sort-by-length dan padding dinamis ikut terukur. Hasil kedua jalur
+juga dibandingkan (cosine similarity minimum) untuk memastikan vektornya sama.
+Dengan --chunked, biaya mode sliding-window (EMBEDDING_CHUNKING) ikut
+diukur agar bisa diputuskan per workload apakah mode itu layak diaktifkan.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from app.utils.embedding import (  # noqa: E402
+    get_embedding_from_code,
+    get_embeddings_batched,
+    get_embeddings_chunked,
+)
+
+
+def synthetic_sources(count, max_lines=120, seed=0):
+    rng = random.Random(seed)
+    sources = []
+    for n in range(count):
+        lines = [f"def tugas_{n}(data):"]
+        for k in range(rng.randint(3, max_lines)):
+            lines.append(f"    nilai_{k} = data[{k} % len(data)] * {rng.randint(1, 99)}")
+            if k % 7 == 0:
+                lines.append(f"    if nilai_{k} > {rng.randint(0, 500)}:")
+                lines.append(f"        print('nilai', nilai_{k})")
+        lines.append("    return data")
+        sources.append("\n".join(lines))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--max-batch-tokens', type=int, default=8192)
+    parser.add_argument('--threads', type=int, default=0)
+    parser.add_argument('--max-lines', type=int, default=120)
+    parser.add_argument('--chunked', action='store_true')
+    parser.add_argument('--chunk-tokens', type=int, default=510)
+    parser.add_argument('--chunk-overlap', type=int, default=128)
+    args = parser.parse_args()
+
+    sources = synthetic_sources(args.files, max_lines=args.max_lines)
+    app = Flask(__name__)
+
+    with app.app_context():
+        # Warm-up: load tokenizer/model di luar pengukuran
+        get_embedding_from_code(sources[0])
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+
+        start = time.perf_counter()
+        per_file = [get_embedding_from_code(src) for src in sources]
+        per_file_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched = get_embeddings_batched(
+            sources,
+            max_batch_tokens=args.max_batch_tokens,
+            num_threads=args.threads or None,
+        )
+        batched_seconds = time.perf_counter() - start
+
+        if args.chunked:
+            start = time.perf_counter()
+            chunked = get_embeddings_chunked(
+                sources,
+                window_tokens=args.chunk_tokens,
+                overlap_tokens=args.chunk_overlap,
+                max_batch_tokens=args.max_batch_tokens,
+                num_threads=args.threads or None,
+            )
+            chunked_seconds = time.perf_counter() - start
+
+    cosine = np.sum(np.asarray(per_file) * np.asarray(batched), axis=1)
+    print(f"files: {args.files}, max_batch_tokens: {args.max_batch_tokens}, threads: {args.threads or 'default'}")
+    print(f"per-file loop : {per_file_seconds:8.2f}s  {args.files / per_file_seconds:8.2f} files/sec")
+    print(f"batched       : {batched_seconds:8.2f}s  {args.files / batched_seconds:8.2f} files/sec")
+    print(f"speedup       : {per_file_seconds / batched_seconds:8.2f}x")
+    print(f"min cosine(per-file, batched): {cosine.min():.6f}")
+    if args.chunked:
+        windows = sum(len(out["chunks"]) for out in chunked if out)
+        print(f"chunked       : {chunked_seconds:8.2f}s  {args.files / chunked_seconds:8.2f} files/sec  "
+              f"({windows} windows, {windows / args.files:.2f}/file, "
+              f"{chunked_seconds / batched_seconds:.2f}x cost vs batched)")
+
+
+if __name__ == '__main__':
+    main()
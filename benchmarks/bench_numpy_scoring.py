@@ -0,0 +1,72 @@
+"""
+Benchmark + verifikasi: engine NumPy vs Keras batched untuk semua pasangan.
+
+Usage:
+    python benchmarks/bench_numpy_scoring.py
+    python benchmarks/bench_numpy_scoring.py --sizes 200 1000 3000 --threads 8 --skip-keras-above 1000
+
+Sebelum timing, skor NumPy dibandingkan dengan output Keras pada sampel
+kecil untuk setiap model (default + v1..v3) dengan toleransi --atol.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config  # noqa: E402
+from app.utils.model_registry import _load_keras_model  # noqa: E402
+from app.utils.compare import score_pairs  # noqa: E402
+from app.utils.siamese_numpy import NumpySiameseModel, verify_against_keras  # noqa: E402
+
+
+def random_embeddings(n, dim=768, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000, 3000])
+    parser.add_argument('--threads', type=int, default=os.cpu_count())
+    parser.add_argument('--max-block-bytes', type=int, default=Config.SCORING_MAX_BLOCK_BYTES)
+    parser.add_argument('--batch-size', type=int, default=Config.SCORING_BATCH_SIZE)
+    parser.add_argument('--atol', type=float, default=1e-5)
+    parser.add_argument('--skip-keras-above', type=int, default=1000)
+    args = parser.parse_args()
+
+    for path in [Config.MODEL_PATH, *Config.MODEL_VERSIONS.values()]:
+        error = verify_against_keras(
+            NumpySiameseModel.from_h5(path), _load_keras_model(path), random_embeddings(64, seed=1), atol=args.atol
+        )
+        print(f"verified {os.path.relpath(path, Config.BASE_DIR)}: max |numpy - keras| = {error:.2e}")
+
+    keras_model = _load_keras_model(Config.MODEL_PATH)
+    numpy_model = NumpySiameseModel.from_h5(Config.MODEL_PATH)
+    score_pairs(keras_model, random_embeddings(4), batch_size=args.batch_size)
+
+    print(f"\n{'files':>6} {'pairs':>10} {'keras (s)':>10} {'numpy (s)':>10} {'speedup':>8}")
+    for n in args.sizes:
+        embeddings = random_embeddings(n)
+
+        keras_seconds = None
+        if n <= args.skip_keras_above:
+            start = time.perf_counter()
+            score_pairs(keras_model, embeddings, batch_size=args.batch_size)
+            keras_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        numpy_model.score_all_pairs(embeddings, max_block_bytes=args.max_block_bytes, threads=args.threads)
+        numpy_seconds = time.perf_counter() - start
+
+        keras_text = f"{keras_seconds:>10.3f}" if keras_seconds is not None else f"{'-':>10}"
+        speedup = f"{keras_seconds / numpy_seconds:>7.1f}x" if keras_seconds is not None else f"{'-':>8}"
+        print(f"{n:>6} {n * (n - 1) // 2:>10} {keras_text} {numpy_seconds:>10.3f} {speedup}")
+
+
+if __name__ == '__main__':
+    main()
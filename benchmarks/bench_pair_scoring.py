@@ -0,0 +1,92 @@
+"""
+Benchmark: skor pasangan per-pair (predict batch_size=1) vs batched score_pairs.
+
+Usage:
+    python benchmarks/bench_pair_scoring.py
+    python benchmarks/bench_pair_scoring.py --sizes 50 200 1000 --batch-size 8192
+
+Jalur lama pada 1000 file berarti ~500k panggilan predict, jadi jumlah
+pasangan yang benar-benar dijalankan dibatasi --legacy-max-pairs lalu
+waktunya diekstrapolasi ke semua pasangan.
+"""
+import argparse
+import os
+import sys
+import time
+from itertools import combinations, islice
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.utils.compare import get_euclidean_distance, score_pairs  # noqa: E402
+
+
+def load_model(path):
+    return tf.keras.models.load_model(
+        path,
+        custom_objects={
+            'euclidean_distance': get_euclidean_distance(),
+            'InputLayer': tf.keras.layers.InputLayer
+        },
+        compile=False,
+        safe_mode=False
+    )
+
+
+def random_embeddings(n, dim=768, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def legacy_scoring(model, embeddings, max_pairs):
+    """Salinan loop lama: satu model.predict per pasangan."""
+    done = 0
+    start = time.perf_counter()
+    for i, j in islice(combinations(range(len(embeddings)), 2), max_pairs):
+        model.predict(
+            [np.expand_dims(embeddings[i], axis=0), np.expand_dims(embeddings[j], axis=0)],
+            verbose=0,
+            batch_size=1
+        )
+        done += 1
+    return done, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=Config.MODEL_PATH)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--batch-size', type=int, default=Config.SCORING_BATCH_SIZE)
+    parser.add_argument('--legacy-max-pairs', type=int, default=500)
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    # Warm-up agar tracing/graph build tidak ikut terukur
+    score_pairs(model, random_embeddings(4), batch_size=args.batch_size)
+    legacy_scoring(model, random_embeddings(2), 1)
+
+    print(f"{'files':>6} {'pairs':>9} {'legacy (s)':>12} {'batched (s)':>12} {'speedup':>9}")
+    for n in args.sizes:
+        embeddings = random_embeddings(n)
+        total_pairs = n * (n - 1) // 2
+
+        done, elapsed = legacy_scoring(model, embeddings, args.legacy_max_pairs)
+        legacy_total = elapsed / max(done, 1) * total_pairs
+        estimated = '*' if done < total_pairs else ' '
+
+        start = time.perf_counter()
+        score_pairs(model, embeddings, batch_size=args.batch_size)
+        batched_total = time.perf_counter() - start
+
+        print(f"{n:>6} {total_pairs:>9} {legacy_total:>11.2f}{estimated} "
+              f"{batched_total:>12.3f} {legacy_total / batched_total:>8.1f}x")
+
+    print("* = diekstrapolasi dari --legacy-max-pairs pasangan")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""
+Benchmark end-to-end: upload -> embed -> score -> details -> export lewat Flask test client.
+
+Usage:
+    python benchmarks/bench_pipeline.py --output benchmarks/baseline_pipeline.json
+    python benchmarks/bench_pipeline.py --files 50 200 --lines 40 150 --plagiarism 0.1 0.3
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline_pipeline.json --tolerance 0.25
+    python benchmarks/bench_pipeline.py --fake-embeddings   # tanpa CodeBERT (CI / mesin tanpa torch)
+
+Korpus sintetis per skenario (jumlah file x panjang file x rasio plagiat):
+setiap mahasiswa menulis fungsi acak untuk satu tugas; sebagian file adalah
+salinan file lain dengan identifier di-rename, urutan fungsi diacak, konstanta
+diubah dan komentar ditambah. Seed tetap, jadi korpus identik antar run.
+
+Setiap skenario berjalan di proses Python baru (peak RSS per skenario) dengan
+folder sementara, Firebase auth di-stub (token = uid) dan METRICS_ENABLED=true
+sehingga waktu per stage (embedding, scoring, ...) dibaca dari /metrics.
+Hasil (median dari --repeat run) ditulis ke JSON; --compare membandingkan
+dengan baseline dan keluar dengan status 1 jika ada regresi di atas toleransi.
+"""
+import argparse
+import atexit
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Metrik throughput (makin tinggi makin baik); metrik lain makin rendah makin baik
+HIGHER_IS_BETTER = ('files_per_second', 'pairs_per_second')
+
+WORDS = ['data', 'nilai', 'hasil', 'total', 'angka', 'daftar', 'item', 'jumlah', 'rata', 'index',
+         'kata', 'teks', 'baris', 'kolom', 'skor', 'batas', 'counter', 'buffer', 'temp', 'akhir']
+
+
+# --- korpus sintetis -------------------------------------------------------------
+
+def _name(rng):
+    return f"{rng.choice(WORDS)}_{rng.choice(WORDS)}"
+
+
+def _function(rng, lines):
+    """Satu fungsi acak dengan kira-kira `lines` baris."""
+    args = [_name(rng) for _ in range(rng.randint(1, 3))]
+    body = []
+    local = list(args)
+    while len(body) < lines:
+        kind = rng.random()
+        target = _name(rng)
+        if kind < 0.35:
+            body.append(f"    {target} = {rng.choice(local)} {rng.choice('+-*')} {rng.randint(1, 99)}")
+            local.append(target)
+        elif kind < 0.55:
+            body.append(f"    for {target} in range({rng.randint(2, 50)}):")
+            body.append(f"        {rng.choice(local)} = {rng.choice(local)} + {target}")
+        elif kind < 0.75:
+            body.append(f"    if {rng.choice(local)} > {rng.randint(0, 100)}:")
+            body.append(f"        {rng.choice(local)} = {rng.choice(local)} // {rng.randint(1, 9)}")
+            body.append("    else:")
+            body.append(f"        {rng.choice(local)} -= {rng.randint(1, 9)}")
+        else:
+            body.append(f"    {target} = [{rng.choice(local)} * i for i in range({rng.randint(2, 20)})]")
+            local.append(target)
+    body.append(f"    return {rng.choice(local)}")
+    return [f"def {_name(rng)}({', '.join(args)}):", *body, ""]
+
+
+def _submission(rng, lines):
+    functions = []
+    total = 0
+    while total < lines:
+        size = rng.randint(5, 20)
+        functions.append(_function(rng, size))
+        total += size + 2
+    return functions
+
+
+def _plagiarize(rng, functions):
+    """Salin-ubah: rename identifier, acak urutan fungsi, ubah konstanta, tambah komentar."""
+    renames = {word: rng.choice(WORDS) + 'x' for word in WORDS if rng.random() < 0.5}
+    copied = []
+    for function in rng.sample(functions, len(functions)):
+        new_lines = []
+        for line in function:
+            for old, new in renames.items():
+                line = line.replace(old, new)
+            if rng.random() < 0.1:
+                line = line.replace('1', '2')
+            new_lines.append(line)
+            if rng.random() < 0.05:
+                new_lines.append("    # cek ulang")
+        copied.append(new_lines)
+    return copied
+
+
+def generate_corpus(files, lines, plagiarism, seed=0):
+    """{nama file: source}; returns juga daftar pasangan plagiat yang ditanam."""
+    rng = random.Random(seed)
+    submissions = {}
+    planted = []
+    originals = []
+    for i in range(files):
+        name = f"Mahasiswa_{i:04d}.py"
+        if originals and rng.random() < plagiarism:
+            source_name, functions = rng.choice(originals)
+            functions = _plagiarize(rng, functions)
+            planted.append((source_name, name))
+        else:
+            functions = _submission(rng, lines)
+            originals.append((name, functions))
+        submissions[name] = "\n".join(line for function in functions for line in function) + "\n"
+    return submissions, planted
+
+
+# --- worker: satu skenario di proses sendiri ------------------------------------
+
+def _install_auth_stub():
+    """Firebase Admin tidak dipanggil: token Bearer dipakai langsung sebagai uid."""
+    firebase_admin = types.ModuleType('firebase_admin')
+    auth = types.ModuleType('firebase_admin.auth')
+    auth.verify_id_token = lambda token: {'uid': token}
+    credentials = types.ModuleType('firebase_admin.credentials')
+    credentials.Certificate = lambda path: None
+    firebase_admin.auth = auth
+    firebase_admin.credentials = credentials
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    firebase_admin._apps = {}
+    sys.modules.update({
+        'firebase_admin': firebase_admin,
+        'firebase_admin.auth': auth,
+        'firebase_admin.credentials': credentials,
+    })
+
+
+def _install_fake_embedder():
+    """Embedding deterministik dari hash token (bentuk dan normalisasi sama dengan CodeBERT)."""
+    import numpy as np
+    import zlib
+    from app.utils import embedding
+
+    def fake_embed(texts, max_batch_tokens, num_threads, progress=None):
+        vectors = []
+        for n, text in enumerate(texts, 1):
+            vec = np.zeros(768, dtype=np.float32)
+            tokens = text.split()
+            for a, b in zip(tokens, tokens[1:]):
+                vec[zlib.crc32(f"{a} {b}".encode('utf-8')) % 768] += 1.0
+            norm = np.linalg.norm(vec)
+            vectors.append(vec / norm if norm else None)
+            if progress is not None:
+                progress(n / len(texts))
+        return vectors
+
+    embedding._embed_texts_batched = fake_embed
+
+
+def _rss_peak_mb():
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _stage_sums(metrics_text):
+    """{stage: detik} dari codescan_stage_seconds_sum di /metrics."""
+    sums = {}
+    for line in metrics_text.splitlines():
+        if line.startswith('codescan_stage_seconds_sum{stage="'):
+            labels, value = line.rsplit(' ', 1)
+            sums[labels.split('"')[1]] = float(value)
+    return sums
+
+
+def run_scenario(scenario, fake_embeddings):
+    workdir = tempfile.mkdtemp(prefix='codescan-bench-')
+    atexit.register(shutil.rmtree, workdir, True)
+    os.environ.update({
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'EMBEDDINGS_FOLDER': os.path.join(workdir, 'embeddings'),
+        'RESULTS_FOLDER': os.path.join(workdir, 'results'),
+        'METRICS_ENABLED': 'true',
+        'EMBED_ON_UPLOAD': 'false',
+        'JOB_BACKEND': 'memory',
+        'STORAGE_BACKEND': 'local',
+    })
+    _install_auth_stub()
+    sys.path.insert(0, ROOT)
+    from app import create_app
+
+    if fake_embeddings:
+        _install_fake_embedder()
+
+    corpus, planted = generate_corpus(
+        scenario['files'], scenario['lines'], scenario['plagiarism'], seed=scenario.get('seed', 0)
+    )
+    app = create_app()
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer bench-user'}
+    result = {'scenario': scenario, 'planted_pairs': len(planted)}
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, source in corpus.items():
+            zf.writestr(f"submissions/{name}", source)
+    archive.seek(0)
+
+    start = time.perf_counter()
+    response = client.post('/upload/bulk', headers=headers, content_type='multipart/form-data',
+                           data={'files': [(archive, 'submissions.zip')]})
+    result['upload_seconds'] = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    start = time.perf_counter()
+    job = client.post('/monitoring/check', headers=headers).get_json()['job']
+    while job['status'] in ('queued', 'running'):
+        time.sleep(0.02)
+        job = client.get(f"/monitoring/jobs/{job['id']}", headers=headers).get_json()['job']
+    result['check_seconds'] = time.perf_counter() - start
+    assert job['status'] == 'finished', job
+    summary = client.get(f"/monitoring/jobs/{job['id']}/result", headers=headers).get_json()
+    result['pairs'] = summary['pair_count']
+
+    # Satu halaman hasil: global, per file dan top-k per file
+    pages = []
+    for query in ('limit=100', 'limit=100&file=Mahasiswa_0000.py', 'limit=100&top_k=3'):
+        start = time.perf_counter()
+        response = client.get(f'/monitoring/results?{query}', headers=headers)
+        pages.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    result['results_page_seconds'] = statistics.median(pages)
+
+    details = []
+    for index in range(min(10, result['pairs'])):
+        start = time.perf_counter()
+        response = client.get(f'/monitoring/details/{index}', headers=headers)
+        details.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    result['details_seconds'] = statistics.median(details) if details else 0.0
+
+    for kind in ('csv', 'pdf'):
+        start = time.perf_counter()
+        # Export dari result set tersimpan, seperti tombol export di UI (CSV di-stream)
+        response = client.get(f'/export/{kind}', headers=headers)
+        response.get_data()
+        result[f'export_{kind}_seconds'] = time.perf_counter() - start
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    stages = _stage_sums(client.get('/metrics').get_data(as_text=True))
+    result['stages'] = stages
+    result['files_per_second'] = scenario['files'] / max(stages.get('extract_and_save_embeddings', 0.0), 1e-9)
+    # pair_scoring di proses baru ikut memuat model; throughput tanpa waktu load
+    scoring = stages.get('pair_scoring', 0.0) - stages.get('model_load', 0.0)
+    result['pairs_per_second'] = result['pairs'] / max(scoring, 1e-9)
+    result['peak_rss_mb'] = _rss_peak_mb()
+    return result
+
+
+# --- driver ------------------------------------------------------------------------
+
+def scenario_key(scenario):
+    return f"files={scenario['files']},lines={scenario['lines']},plagiarism={scenario['plagiarism']}"
+
+
+def run_in_subprocess(scenario, fake_embeddings):
+    command = [sys.executable, os.path.abspath(__file__), '--worker', json.dumps(scenario)]
+    if fake_embeddings:
+        command.append('--fake-embeddings')
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario_key(scenario)} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def median_result(runs):
+    """Median per metrik numerik (juga per stage) dari beberapa run."""
+    merged = dict(runs[0])
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            merged[key] = statistics.median(run[key] for run in runs)
+    stages = set().union(*(run['stages'] for run in runs))
+    merged['stages'] = {stage: statistics.median(run['stages'].get(stage, 0.0) for run in runs) for stage in stages}
+    return merged
+
+
+def flatten_metrics(result):
+    metrics = {key: value for key, value in result.items()
+               if key.endswith(('_seconds', '_per_second', '_mb'))}
+    metrics.update({f"stage.{stage}": seconds for stage, seconds in result.get('stages', {}).items()})
+    return metrics
+
+
+def compare(current, baseline, tolerance, min_seconds):
+    """Daftar regresi: latency/RSS naik atau throughput turun lebih dari `tolerance`."""
+    regressions = []
+    for key, result in current['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(key)
+        if reference is None:
+            continue
+        now, before = flatten_metrics(result), flatten_metrics(reference)
+        for metric, value in now.items():
+            old = before.get(metric)
+            if old is None or old <= 0:
+                continue
+            change = (value - old) / old
+            if metric.endswith(HIGHER_IS_BETTER):
+                worse = -change
+            else:
+                # Stage yang sangat singkat terlalu berisik untuk dibandingkan
+                if metric.endswith('_seconds') or metric.startswith('stage.'):
+                    if max(old, value) < min_seconds:
+                        continue
+                worse = change
+            if worse > tolerance:
+                regressions.append((key, metric, old, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--lines', type=int, nargs='+', default=[60])
+    parser.add_argument('--plagiarism', type=float, nargs='+', default=[0.2])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fake-embeddings', action='store_true',
+                        help='hash-based embeddings instead of CodeBERT (no torch/transformers needed)')
+    parser.add_argument('--output', help='write results as JSON (e.g. a new baseline)')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (0.2 = 20%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='ignore timings below this in both runs when comparing')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(json.loads(args.worker), args.fake_embeddings)))
+        return 0
+
+    scenarios = [
+        {'files': files, 'lines': lines, 'plagiarism': plagiarism, 'seed': args.seed}
+        for files in args.files for lines in args.lines for plagiarism in args.plagiarism
+    ]
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'fake_embeddings': args.fake_embeddings,
+            'repeat': args.repeat,
+        },
+        'scenarios': {},
+    }
+
+    print(f"{'scenario':<40} {'upload':>8} {'check':>8} {'embed':>8} {'score':>8} "
+          f"{'details':>8} {'pdf':>8} {'files/s':>9} {'pairs/s':>11} {'RSS MB':>8}")
+    for scenario in scenarios:
+        result = median_result([run_in_subprocess(scenario, args.fake_embeddings) for _ in range(args.repeat)])
+        key = scenario_key(scenario)
+        report['scenarios'][key] = result
+        stages = result['stages']
+        print(f"{key:<40} {result['upload_seconds']:8.3f} {result['check_seconds']:8.3f} "
+              f"{stages.get('extract_and_save_embeddings', 0):8.3f} {stages.get('pair_scoring', 0):8.3f} "
+              f"{result['details_seconds']:8.3f} {result['export_pdf_seconds']:8.3f} "
+              f"{result['files_per_second']:9.1f} {result['pairs_per_second']:11.0f} {result['peak_rss_mb']:8.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('meta', {}).get('fake_embeddings') != args.fake_embeddings:
+            print("Warning: baseline was recorded with a different embedder")
+        regressions = compare(report, baseline, args.tolerance, args.min_seconds)
+        for key, metric, old, value, change in regressions:
+            print(f"REGRESSION {key} {metric}: {old:.4g} -> {value:.4g} ({change:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
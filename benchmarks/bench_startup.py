@@ -0,0 +1,109 @@
+"""
+Benchmark: cold start aplikasi (import + create_app), probe /health dan /ready.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --gunicorn
+
+Setiap run memakai proses Python baru sehingga cache import tidak ikut
+terukur. Dicatat juga modul berat yang sudah ter-import setelah app
+siap (seharusnya TensorFlow/torch/reportlab belum dimuat). Dengan
+--gunicorn, diukur waktu dari start gunicorn (preload_app + warm-up)
+sampai /ready mengembalikan 200.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['tensorflow', 'torch', 'transformers', 'reportlab', 'sklearn', 'nltk', 'h5py']
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app()
+boot = time.perf_counter() - start
+client = app.test_client()
+start = time.perf_counter()
+health = client.get('/health')
+health_seconds = time.perf_counter() - start
+start = time.perf_counter()
+for _ in range(100):
+    client.get('/health')
+health_avg = (time.perf_counter() - start) / 100
+print(json.dumps({
+    'boot': boot,
+    'health_first': health_seconds,
+    'health_avg': health_avg,
+    'health_status': health.status_code,
+    'ready_status': client.get('/ready').status_code,
+    'loaded': [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def run_probe():
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + PROBE
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def gunicorn_ready_seconds(timeout=120):
+    port = free_port()
+    env = {**os.environ, 'PORT': str(port)}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--config', 'gunicorn.conf.py'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--gunicorn', action='store_true', help='also time gunicorn start until /ready is 200')
+    args = parser.parse_args()
+
+    probes = [run_probe() for _ in range(args.runs)]
+    print(f"import + create_app   median {statistics.median(p['boot'] for p in probes) * 1000:8.1f} ms")
+    print(f"first /health         median {statistics.median(p['health_first'] for p in probes) * 1000:8.2f} ms")
+    print(f"/health (warm)        median {statistics.median(p['health_avg'] for p in probes) * 1000:8.3f} ms")
+    print(f"/health status        {probes[-1]['health_status']}, /ready status {probes[-1]['ready_status']}")
+    print(f"heavy modules loaded  {', '.join(probes[-1]['loaded']) or '-'}")
+
+    if args.gunicorn:
+        seconds = gunicorn_ready_seconds()
+        print(f"gunicorn -> /ready    {seconds:.2f} s" if seconds is not None else "gunicorn -> /ready    timeout")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# Import the app once in the master; workers are forked from it and share
+# its memory (imports, NumPy model weights) copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def _preload_safe(app):
+    # TensorFlow starts threads that do not survive fork(); only the NumPy
+    # engine (and optionally CodeBERT) is loaded before the workers exist
+    return app.config.get('SCORING_ENGINE') == 'numpy'
+
+
+def when_ready(server):
+    """Master: load the models once before forking when the app is preloaded."""
+    if not server.cfg.preload_app:
+        return
+    app = server.app.wsgi()
+    if app.config.get('MODEL_WARMUP', True) and _preload_safe(app):
+        from app.utils.model_registry import warm_up
+        with app.app_context():
+            warm_up(app)
+
+
+def post_worker_init(worker):
+    """Muat model Siamese sekali per worker sebelum menerima request."""
+    app = worker.wsgi
+    if app.config.get('MODEL_WARMUP', True):
+        from app.utils.model_registry import warm_up
+        # Model yang sudah dimuat di master hanya tercatat sebagai hit
+        with app.app_context():
+            warm_up(app)
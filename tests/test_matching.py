@@ -0,0 +1,32 @@
+import unittest
+
+from app.utils.matching import find_matching_blocks
+
+
+class TestFindMatchingBlocks(unittest.TestCase):
+    def test_block_starting_with_frequent_line(self):
+        """A copied block whose first line is frequent in file 2 is still reported in full"""
+        copied = [
+            "    result = compute(x)",
+            "    total = result * 2",
+            "    print(total)",
+            "    return total",
+        ]
+        content_1 = "\n".join(["def f(x):"] + copied)
+        content_2 = "\n".join([copied[0]] * 19 + ["def h(x):"] + copied)
+
+        blocks = find_matching_blocks(content_1, content_2)
+
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0]['file1_line'], 1)
+        self.assertEqual(blocks[0]['file2_line'], 20)
+        self.assertEqual(blocks[0]['length'], 4)
+
+    def test_identical_files(self):
+        content = "def f(x):\n    y = x + 1\n    return y\n"
+        blocks = find_matching_blocks(content, content)
+        self.assertEqual([(b['file1_line'], b['file2_line'], b['length']) for b in blocks], [(0, 0, 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()